@@ -2,9 +2,34 @@ import os
 import logging
 import librosa
 import numpy as np
-import hashlib
+import soundfile as sf
+import xxhash
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Formats libsndfile decodes natively; everything else goes through librosa/audioread
+SNDFILE_EXTENSIONS = {'.wav', '.flac', '.ogg', '.aif', '.aiff'}
+AUDIO_EXTENSIONS = frozenset({'.wav', '.mp3', '.ogg', '.flac', '.aif', '.aiff'})
+
+def _iter_audio(root: str) -> Iterator[os.DirEntry]:
+    """
+    Recursively yield directory entries for audio files under root.
+    
+    Args:
+        root: Directory to scan
+        
+    Returns:
+        Iterator of os.DirEntry objects for audio files
+    """
+    try:
+        with os.scandir(root) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from _iter_audio(entry.path)
+                elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS:
+                    yield entry
+    except OSError as e:
+        logging.error(f"Error scanning {root}: {str(e)}")
 
 def process_audio_folder(folder_path: str) -> Dict[str, Dict]:
     """
@@ -20,28 +45,22 @@ def process_audio_folder(folder_path: str) -> Dict[str, Dict]:
     
     samples = {}
     
-    # Get all audio files in the folder
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            # Check if file is an audio file
-            if file.lower().endswith(('.wav', '.mp3', '.ogg', '.flac', '.aif', '.aiff')):
-                file_path = os.path.join(root, file)
-                
-                try:
-                    # Generate a unique ID for the sample
-                    sample_id = generate_sample_id(file_path)
-                    
-                    # Get basic sample information
-                    sample_info = {
-                        'id': sample_id,
-                        'name': os.path.basename(file_path),
-                        'path': file_path
-                    }
-                    
-                    samples[sample_id] = sample_info
-                    
-                except Exception as e:
-                    logging.error(f"Error processing {file_path}: {str(e)}")
+    for entry in _iter_audio(folder_path):
+        try:
+            # Generate a unique ID for the sample; the scan's stat result supplies the mtime
+            sample_id = generate_sample_id(entry.path, entry.stat().st_mtime)
+            
+            # Get basic sample information
+            sample_info = {
+                'id': sample_id,
+                'name': entry.name,
+                'path': entry.path
+            }
+            
+            samples[sample_id] = sample_info
+            
+        except Exception as e:
+            logging.error(f"Error processing {entry.path}: {str(e)}")
     
     logging.info(f"Found {len(samples)} audio samples")
     return samples
@@ -64,22 +83,57 @@ def get_sample_details(file_path: str) -> Tuple[float, float]:
         logging.error(f"Error getting sample details for {file_path}: {str(e)}")
         return 0.0, 0.0
 
-def generate_sample_id(file_path: str) -> str:
+def generate_sample_id(file_path: str, mtime: Optional[float] = None) -> str:
     """
     Generate a unique ID for a sample based on its file path and modification time.
     
     Args:
         file_path: Path to audio file
+        mtime: Modification time, if already known (otherwise read from disk)
         
     Returns:
         Unique ID for the sample
     """
-    file_info = f"{file_path}_{os.path.getmtime(file_path)}"
-    return hashlib.md5(file_info.encode()).hexdigest()
+    if mtime is None:
+        mtime = os.path.getmtime(file_path)
+    file_info = f"{file_path}_{mtime}"
+    # xxh3 is much cheaper per call than md5; IDs are dict keys, not security tokens
+    return xxhash.xxh3_64_hexdigest(file_info.encode())
+
+def read_audio(file_path: str, sr: Optional[int] = 22050, mono: bool = True) -> Tuple[np.ndarray, int]:
+    """
+    Decode an audio file, using soundfile directly for formats libsndfile supports.
+    
+    Args:
+        file_path: Path to audio file
+        sr: Target sample rate, or None to keep the native rate
+        mono: Whether to convert audio to mono
+        
+    Returns:
+        Tuple of (audio_data, sample_rate)
+        
+    Raises:
+        Exception: If the file cannot be decoded
+    """
+    if Path(file_path).suffix.lower() not in SNDFILE_EXTENSIONS:
+        # mp3 and friends still need the audioread backend
+        return librosa.load(file_path, sr=sr, mono=mono)
+    
+    data, native_sr = sf.read(file_path, dtype='float32', always_2d=False)
+    
+    # soundfile returns (frames, channels); librosa expects (channels, frames)
+    if data.ndim == 2:
+        data = data.mean(axis=1) if mono else data.T
+    
+    if sr is not None and sr != native_sr:
+        data = librosa.resample(data, orig_sr=native_sr, target_sr=sr)
+        return data, sr
+    
+    return data, native_sr
 
 def load_audio(file_path: str, sr: int = 22050, mono: bool = True) -> Tuple[np.ndarray, int]:
     """
-    Load audio file using librosa.
+    Load audio file, preferring soundfile over librosa's audioread fallback.
     
     Args:
         file_path: Path to audio file
@@ -90,7 +144,7 @@ def load_audio(file_path: str, sr: int = 22050, mono: bool = True) -> Tuple[np.n
         Tuple of (audio_data, sample_rate)
     """
     try:
-        y, sr = librosa.load(file_path, sr=sr, mono=mono)
+        y, sr = read_audio(file_path, sr=sr, mono=mono)
         return y, sr
     except Exception as e:
         logging.error(f"Error loading audio {file_path}: {str(e)}")
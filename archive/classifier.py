@@ -1,10 +1,12 @@
 import os
+import re
 import logging
 import numpy as np
 from typing import Dict, List, Any, Tuple
 import joblib
-from sklearn.cluster import KMeans
+from numba import njit
 from sklearn.preprocessing import StandardScaler
+from models import FEATURE_VECTOR_SLOTS, FEATURE_VECTOR_LENGTH, N_VECTOR_MFCC
 
 # Define instrument categories
 INSTRUMENT_CATEGORIES = [
@@ -14,6 +16,9 @@ INSTRUMENT_CATEGORIES = [
     "brass", "strings", "wind", "orchestral"
 ]
 
+# Rows per StandardScaler.partial_fit call when building the feature matrix
+SCALER_BATCH_SIZE = 1024
+
 # Define mood categories
 MOOD_CATEGORIES = [
     "aggressive", "energetic", "intense", "powerful",
@@ -23,6 +28,76 @@ MOOD_CATEGORIES = [
     "atmospheric", "dreamy", "spacey", "ethereal"
 ]
 
+# Filename keywords per instrument category, in priority order
+INSTRUMENT_KEYWORDS = [
+    ("vocal", ["vocal", "vox", "voc", "voice", "choir", "sing", "acapella"]),
+    ("bass", ["bass"]),
+    ("percussion", ["drum", "perc", "kick", "snare"]),
+    ("synth", ["synth", "lead", "key", "piano", "keys", "keyboard"]),
+    ("fx", ["fx", "effect"]),
+    ("guitar", ["guitar", "gtr"]),
+    ("ambient", ["pad", "ambient", "atmo"]),
+]
+
+# Filename keywords per mood, in priority order: exact mood names first, then alternative terms
+MOOD_KEYWORDS = [(mood, [mood]) for mood in MOOD_CATEGORIES] + [
+    ("intense", ["hard", "heavy", "pressure"]),
+    ("mellow", ["soft", "gentle", "chill"]),
+    ("cheerful", ["bright", "sunny", "happy"]),
+    ("mysterious", ["dark", "ominous", "deep"]),
+    ("atmospheric", ["ambient", "atmos", "space"]),
+    ("dreamy", ["dreamy", "dream", "float"]),
+]
+
+def _compile_keyword_table(table: List[Tuple[str, List[str]]]) -> Tuple[re.Pattern, Dict[str, Tuple[int, str]]]:
+    """
+    Compile a (label, keywords) priority table into a single regex and a keyword lookup.
+    
+    The pattern is a zero-width lookahead so every (possibly overlapping) keyword
+    occurrence is reported in one scan. Alternatives are ordered by priority, so at
+    any position the highest-priority keyword starting there wins.
+    
+    Args:
+        table: List of (label, keywords) pairs, highest priority first
+        
+    Returns:
+        Tuple of (compiled pattern, keyword -> (priority, label))
+    """
+    lookup = {}
+    for priority, (label, keywords) in enumerate(table):
+        for keyword in keywords:
+            lookup.setdefault(keyword, (priority, label))
+    
+    ordered = sorted(lookup, key=lambda keyword: lookup[keyword][0])
+    pattern = re.compile("(?=(" + "|".join(re.escape(keyword) for keyword in ordered) + "))")
+    return pattern, lookup
+
+INSTRUMENT_PATTERN, INSTRUMENT_LOOKUP = _compile_keyword_table(INSTRUMENT_KEYWORDS)
+MOOD_PATTERN, MOOD_LOOKUP = _compile_keyword_table(MOOD_KEYWORDS)
+
+def match_keyword_label(name: str, pattern: re.Pattern, lookup: Dict[str, Tuple[int, str]], default: str) -> str:
+    """
+    Return the label of the highest-priority keyword found anywhere in a name.
+    
+    Args:
+        name: Lowercased sample name
+        pattern: Pattern from _compile_keyword_table
+        lookup: Keyword lookup from _compile_keyword_table
+        default: Label to return when no keyword matches
+        
+    Returns:
+        Matched label, or default
+    """
+    best = None
+    for match in pattern.finditer(name):
+        entry = lookup[match.group(1)]
+        if best is None or entry[0] < best[0]:
+            best = entry
+            if best[0] == 0:
+                break
+    
+    return best[1] if best else default
+
 def classify_audio_samples(samples: Dict[str, Dict]) -> Dict[str, Dict]:
     """
     Classify audio samples by instrument type and mood.
@@ -35,27 +110,28 @@ def classify_audio_samples(samples: Dict[str, Dict]) -> Dict[str, Dict]:
     """
     logging.info("Classifying audio samples")
     
-    # Extract feature vectors for classification
-    feature_vectors = []
-    sample_ids = []
-    
-    for sample_id, sample in samples.items():
-        if 'features' in sample and sample['features']:
-            # Create feature vector for classification
-            feature_vector = create_feature_vector(sample['features'])
-            feature_vectors.append(feature_vector)
-            sample_ids.append(sample_id)
+    # Samples with usable features, in library order
+    sample_ids = [sample_id for sample_id, sample in samples.items() if sample.get('features')]
     
-    if not feature_vectors:
+    if not sample_ids:
         logging.warning("No valid feature vectors found for classification")
         return samples
     
-    # Convert to numpy array
-    X = np.array(feature_vectors)
-    
-    # Normalize features
+    # Fill a preallocated float32 matrix in batches, updating the scaler's running
+    # mean/variance as we go instead of materialising a list of lists first
+    X_scaled = np.zeros((len(sample_ids), FEATURE_VECTOR_LENGTH), dtype=np.float32)
     scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    
+    for start in range(0, len(sample_ids), SCALER_BATCH_SIZE):
+        batch = X_scaled[start:start + SCALER_BATCH_SIZE]
+        for row, sample_id in zip(batch, sample_ids[start:start + SCALER_BATCH_SIZE]):
+            # Create feature vector for classification
+            row[:] = create_feature_vector(samples[sample_id]['features'])
+        scaler.partial_fit(batch)
+    
+    # Normalize features in place
+    X_scaled -= scaler.mean_
+    X_scaled /= scaler.scale_
     
     # Classify by instrument type
     instrument_categories = classify_instrument_types(X_scaled, sample_ids, samples)
@@ -70,7 +146,7 @@ def classify_audio_samples(samples: Dict[str, Dict]) -> Dict[str, Dict]:
     
     return samples
 
-def create_feature_vector(features: Dict[str, Any]) -> List[float]:
+def create_feature_vector(features: Dict[str, Any]) -> np.ndarray:
     """
     Create a feature vector for classification from features dictionary.
     
@@ -78,25 +154,103 @@ def create_feature_vector(features: Dict[str, Any]) -> List[float]:
         features: Dictionary of audio features
         
     Returns:
-        Feature vector as list of floats
+        Feature vector as a float32 array of length FEATURE_VECTOR_LENGTH
     """
-    # Select relevant features for classification
-    feature_vector = [
-        features.get('spectral_centroid', 0.0),
-        features.get('spectral_bandwidth', 0.0),
-        features.get('spectral_rolloff', 0.0),
-        features.get('zero_crossing_rate', 0.0),
-        features.get('energy', 0.0),
-        features.get('tempo', 0.0),
-        features.get('rms', 0.0)
-    ]
+    # Packed at extraction time; nothing to rebuild
+    vector = features.get('_vec')
+    if vector is not None:
+        return vector
+    
+    # Older feature dicts (e.g. from the cache) only have the named entries
+    vector = np.zeros(FEATURE_VECTOR_LENGTH, dtype=np.float32)
+    for name, index in FEATURE_VECTOR_SLOTS.items():
+        vector[index] = features.get(name, 0.0)
     
     # Add first few MFCC coefficients
-    mfccs = features.get('mfcc', [])
-    for i in range(min(5, len(mfccs))):
-        feature_vector.append(mfccs[i])
+    mfccs = features.get('mfcc', [])[:N_VECTOR_MFCC]
+    vector[len(FEATURE_VECTOR_SLOTS):len(FEATURE_VECTOR_SLOTS) + len(mfccs)] = mfccs
+    
+    return vector
+
+def _kmeans_matmul(X: np.ndarray, k: int, n_iter: int = 20, random_state: int = 42) -> np.ndarray:
+    """
+    Spherical (cosine) k-means where each assignment step is a single matmul.
+    
+    Args:
+        X: Feature matrix
+        k: Number of clusters
+        n_iter: Maximum number of iterations
+        random_state: Seed for picking the initial centers
+        
+    Returns:
+        Cluster label for each row of X
+    """
+    X = np.asarray(X, dtype=np.float32)
+    X = X / (np.linalg.norm(X, axis=1, keepdims=True) + 1e-12)
+    
+    rng = np.random.default_rng(random_state)
+    centers = X[rng.choice(len(X), size=k, replace=False)].copy()
+    labels = np.full(len(X), -1)
+    
+    for _ in range(n_iter):
+        new_labels = np.argmax(X @ centers.T, axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        
+        # New centers are the normalized sums of their members; empty clusters keep their center
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, X)
+        norms = np.linalg.norm(sums, axis=1)
+        nonempty = norms > 0
+        centers[nonempty] = sums[nonempty] / norms[nonempty, None]
     
-    return feature_vector
+    return labels
+
+def cluster_features(X: np.ndarray, n_clusters: int) -> np.ndarray:
+    """
+    Cluster feature vectors into n_clusters groups.
+    
+    Args:
+        X: Feature matrix (scaled)
+        n_clusters: Number of clusters
+        
+    Returns:
+        Cluster label for each row of X
+    """
+    # One sample per cluster is trivially its own cluster
+    if len(X) <= n_clusters:
+        return np.arange(len(X))
+    
+    return _kmeans_matmul(X, n_clusters)
+
+# Labels produced by the numeric rule kernel; -1 means "no rule matched"
+INSTRUMENT_RULE_LABELS = ["percussion", "fx", "synth", "guitar", "bass", "drums", "ambient"]
+
+@njit(cache=True)
+def _instrument_rule_labels(X: np.ndarray) -> np.ndarray:
+    """Apply the instrument threshold rules to every row; returns INSTRUMENT_RULE_LABELS indices."""
+    labels = np.empty(X.shape[0], dtype=np.int8)
+    
+    for i in range(X.shape[0]):
+        spectral_centroid = X[i, 0]
+        zero_crossing_rate = X[i, 3]
+        energy = X[i, 4]
+        
+        if zero_crossing_rate > 1.0:  # High ZCR indicates noisy sounds
+            labels[i] = 0 if energy > 1.0 else 1  # percussion / fx
+        elif spectral_centroid > 1.0:  # High spectral centroid indicates bright sounds
+            labels[i] = 2 if energy > 1.0 else 3  # synth / guitar
+        elif spectral_centroid < -0.5:  # Low spectral centroid indicates bass sounds
+            labels[i] = 4  # bass
+        elif energy > 1.5:  # High energy might indicate drums
+            labels[i] = 5  # drums
+        elif energy < -0.5:  # Low energy might indicate ambient sounds
+            labels[i] = 6  # ambient
+        else:
+            labels[i] = -1
+    
+    return labels
 
 def classify_instrument_types(X: np.ndarray, sample_ids: List[str], samples: Dict[str, Dict]) -> List[str]:
     """
@@ -112,8 +266,7 @@ def classify_instrument_types(X: np.ndarray, sample_ids: List[str], samples: Dic
     """
     # Use KMeans clustering to group similar sounds
     n_clusters = min(len(X), 8)  # Limit number of clusters
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-    clusters = kmeans.fit_predict(X)
+    clusters = cluster_features(X, n_clusters)
     
     # Map clusters to more meaningful categories
     # This ensures we use predefined categories instead of generic groups
@@ -129,32 +282,15 @@ def classify_instrument_types(X: np.ndarray, sample_ids: List[str], samples: Dic
     }
     
     # Assign instrument categories based on feature characteristics
+    rule_labels = _instrument_rule_labels(np.ascontiguousarray(X))
     categories = []
     
     for i in range(len(X)):
-        # Get sample features
-        spectral_centroid = X[i, 0]
-        zero_crossing_rate = X[i, 3]
-        energy = X[i, 4]
         cluster = clusters[i]
         
         # Simple rule-based classification
-        if zero_crossing_rate > 1.0:  # High ZCR indicates noisy sounds
-            if energy > 1.0:
-                category = "percussion"
-            else:
-                category = "fx"
-        elif spectral_centroid > 1.0:  # High spectral centroid indicates bright sounds
-            if energy > 1.0:
-                category = "synth"
-            else:
-                category = "guitar"
-        elif spectral_centroid < -0.5:  # Low spectral centroid indicates bass sounds
-            category = "bass"
-        elif energy > 1.5:  # High energy might indicate drums
-            category = "drums"
-        elif energy < -0.5:  # Low energy might indicate ambient sounds
-            category = "ambient"
+        if rule_labels[i] >= 0:
+            category = INSTRUMENT_RULE_LABELS[rule_labels[i]]
         else:
             # Use the cluster mapping instead of generic group_X
             if cluster in cluster_categories:
@@ -165,15 +301,7 @@ def classify_instrument_types(X: np.ndarray, sample_ids: List[str], samples: Dic
                 
                 # Include the word that might appear in filename for better categorization
                 # Get the current sample name directly
-                sample_name = ""
-                if i < len(sample_ids):
-                    sample_id = sample_ids[i]
-                    # Get the actual filename from the sample id metadata
-                    for s_id, s_data in samples.items():
-                        if s_id == sample_id and 'name' in s_data:
-                            sample_name = s_data['name'].lower()
-                            logging.debug(f"Found sample name for id {sample_id}: {sample_name}")
-                            break
+                sample_name = samples.get(sample_ids[i], {}).get('name', '').lower() if i < len(sample_ids) else ""
                 
                 logging.debug(f"Analyzing sample name: {sample_name}")
                 
@@ -183,27 +311,8 @@ def classify_instrument_types(X: np.ndarray, sample_ids: List[str], samples: Dic
                 
                 # Check for specific terms in the filename
                 if sample_name:
-                    if "vocal" in sample_name or "vox" in sample_name or "voc" in sample_name or "voice" in sample_name or "choir" in sample_name or "sing" in sample_name or "acapella" in sample_name:
-                        category = "vocal"
-                        logging.debug(f"Classified as vocal: {sample_name}")
-                    elif "bass" in sample_name:
-                        category = "bass"
-                        logging.debug(f"Classified as bass: {sample_name}")
-                    elif "drum" in sample_name or "perc" in sample_name or "kick" in sample_name or "snare" in sample_name:
-                        category = "percussion"
-                        logging.debug(f"Classified as percussion: {sample_name}")
-                    elif "synth" in sample_name or "lead" in sample_name or "key" in sample_name or "piano" in sample_name or "keys" in sample_name or "keyboard" in sample_name:
-                        category = "synth"
-                        logging.debug(f"Classified as synth: {sample_name}")
-                    elif "fx" in sample_name or "effect" in sample_name:
-                        category = "fx"
-                        logging.debug(f"Classified as fx: {sample_name}")
-                    elif "guitar" in sample_name or "gtr" in sample_name:
-                        category = "guitar"
-                        logging.debug(f"Classified as guitar: {sample_name}")
-                    elif "pad" in sample_name or "ambient" in sample_name or "atmo" in sample_name:
-                        category = "ambient"
-                        logging.debug(f"Classified as ambient: {sample_name}")
+                    category = match_keyword_label(sample_name, INSTRUMENT_PATTERN, INSTRUMENT_LOOKUP, category)
+                    logging.debug(f"Classified as {category}: {sample_name}")
         
         categories.append(category)
     
@@ -222,89 +331,40 @@ def classify_moods(X: np.ndarray, sample_ids: List[str], samples: Dict[str, Dict
     Returns:
         List of mood category labels
     """
-    moods = []
-    
-    # Predefined moods to ensure we use meaningful categories
-    available_moods = [
-        "aggressive", "energetic", "intense", "powerful",
-        "chill", "relaxed", "mellow", "calm",
-        "happy", "upbeat", "bright", "cheerful",
-        "dark", "sad", "melancholic", "mysterious",
-        "atmospheric", "dreamy", "spacey", "ethereal"
+    energy = X[:, 4]
+    tempo = X[:, 5]
+    spectral_centroid = X[:, 0]
+    
+    # Simple rule-based mood classification, in priority order
+    conditions = [
+        (energy > 1.0) & (tempo > 1.0),
+        (energy > 1.0) & (spectral_centroid < -0.5),
+        (energy < -0.5) & (tempo < -0.5),
+        (energy < -0.5) & (spectral_centroid < -0.5),
+        (tempo > 0.5) & (spectral_centroid > 0.5),
+        (spectral_centroid > 1.0) & (energy < 0),
+        spectral_centroid < -1.0,
     ]
+    choices = ["energetic", "aggressive", "chill", "dark", "happy", "atmospheric", "melancholic"]
+    moods = np.select(conditions, choices, default="neutral").astype(object)
     
-    for i in range(len(X)):
-        # Get relevant features for mood classification
-        energy = X[i, 4]
-        tempo = X[i, 5]
-        spectral_centroid = X[i, 0]
+    # More intelligent mood assignment based on file name for rows no rule matched
+    for i in np.flatnonzero(moods == "neutral"):
+        # Get the current sample name directly from the samples dictionary
+        sample_name = samples.get(sample_ids[i], {}).get('name', '').lower() if i < len(sample_ids) else ""
         
-        # Simple rule-based mood classification
-        if energy > 1.0 and tempo > 1.0:
-            mood = "energetic"
-        elif energy > 1.0 and spectral_centroid < -0.5:
-            mood = "aggressive"
-        elif energy < -0.5 and tempo < -0.5:
-            mood = "chill"
-        elif energy < -0.5 and spectral_centroid < -0.5:
-            mood = "dark"
-        elif tempo > 0.5 and spectral_centroid > 0.5:
-            mood = "happy"
-        elif spectral_centroid > 1.0 and energy < 0:
-            mood = "atmospheric"
-        elif spectral_centroid < -1.0:
-            mood = "melancholic"
-        else:
-            # More intelligent mood assignment based on file name
-            mood = "neutral"
-            
-            # Get the current sample name directly from the samples dictionary
-            sample_name = ""
-            if i < len(sample_ids):
-                sample_id = sample_ids[i]
-                # Get the actual filename from the sample id metadata
-                for s_id, s_data in samples.items():
-                    if s_id == sample_id and 'name' in s_data:
-                        sample_name = s_data['name'].lower()
-                        logging.debug(f"Found sample name for mood analysis: {sample_name}")
-                        break
-            
-            # Fall back to the sample_id if name isn't available
-            if not sample_name and i < len(sample_ids):
-                sample_name = sample_ids[i].lower()
-            
-            logging.debug(f"Analyzing sample name for mood: {sample_name}")
-            
-            # Check for mood indicators in the filename
-            if sample_name:
-                for available_mood in available_moods:
-                    if available_mood in sample_name:
-                        mood = available_mood
-                        logging.debug(f"Classified mood from name match: {mood}")
-                        break
-                
-                # Alternative terms that suggest moods
-                if mood == "neutral":  # Only apply if we didn't already match a mood
-                    if "hard" in sample_name or "heavy" in sample_name or "pressure" in sample_name:
-                        mood = "intense"
-                        logging.debug(f"Classified as intense: {sample_name}")
-                    elif "soft" in sample_name or "gentle" in sample_name or "chill" in sample_name:
-                        mood = "mellow"
-                        logging.debug(f"Classified as mellow: {sample_name}")
-                    elif "bright" in sample_name or "sunny" in sample_name or "happy" in sample_name:
-                        mood = "cheerful"
-                        logging.debug(f"Classified as cheerful: {sample_name}")
-                    elif "dark" in sample_name or "ominous" in sample_name or "deep" in sample_name:
-                        mood = "mysterious"
-                        logging.debug(f"Classified as mysterious: {sample_name}")
-                    elif "ambient" in sample_name or "atmos" in sample_name or "space" in sample_name:
-                        mood = "atmospheric"
-                        logging.debug(f"Classified as atmospheric: {sample_name}")
-                    elif "dreamy" in sample_name or "dream" in sample_name or "float" in sample_name:
-                        mood = "dreamy"
-                        logging.debug(f"Classified as dreamy: {sample_name}")
+        # Fall back to the sample_id if name isn't available
+        if not sample_name and i < len(sample_ids):
+            sample_name = sample_ids[i].lower()
         
-        moods.append(mood)
+        logging.debug(f"Analyzing sample name for mood: {sample_name}")
+        
+        # Check for mood indicators (mood names first, then alternative terms) in the filename
+        if sample_name:
+            moods[i] = match_keyword_label(sample_name, MOOD_PATTERN, MOOD_LOOKUP, "neutral")
+            logging.debug(f"Classified mood from name match: {moods[i]}")
+    
+    moods = moods.tolist()
     
     logging.debug(f"Classified moods: {set(moods)}")
     return moods
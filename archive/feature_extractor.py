@@ -1,39 +1,143 @@
 import os
 import logging
 import librosa
+import joblib
 import numpy as np
-from typing import Dict, List, Any
+import scipy.fft
+import scipy.signal
+import soundfile as sf
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Any, Optional
 from models import AudioFeatures
+from audio_processor import read_audio, SNDFILE_EXTENSIONS
 
-def extract_audio_features(samples: Dict[str, Dict]) -> Dict[str, Dict]:
+# Optional GPU backend for batched STFT/mel extraction
+try:
+    import torch
+    import torchlibrosa as tl
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+
+# Files longer than this are analysed block-by-block instead of decoded whole
+STREAM_BLOCK_SECONDS = 30
+N_FFT = 2048
+HOP_LENGTH = 512
+GPU_SAMPLE_RATE = 22050
+
+# Non-scalar feature entries, copied through unchanged by normalize_features
+VECTOR_FEATURES = ('mfcc', 'chroma', '_vec')
+
+# On-disk feature cache keyed by sample ID (which already encodes path + mtime)
+FEATURE_CACHE_PATH = '.feature_cache.joblib'
+
+def _featurize_one(file_path: str) -> Dict[str, Any]:
+    """
+    Extract features for a single file (runs in a worker process).
+    
+    Args:
+        file_path: Path to audio file
+        
+    Returns:
+        Dictionary of audio features, or an empty dict on failure
+    """
+    try:
+        logging.debug(f"Extracting features for {file_path}")
+        
+        if (Path(file_path).suffix.lower() in SNDFILE_EXTENSIONS
+                and sf.info(file_path).duration > STREAM_BLOCK_SECONDS):
+            # Long file: stream it so memory stays bounded by the block size
+            return extract_features_streaming(file_path)
+        
+        # Load audio file at its native sample rate
+        y, sr = read_audio(file_path, sr=None, mono=True)
+        
+        # Extract features
+        return extract_features(y, sr)
+        
+    except Exception as e:
+        logging.error(f"Error extracting features for {file_path}: {str(e)}")
+        return {}
+
+def load_feature_cache(cache_path: str) -> Dict[str, Dict]:
+    """
+    Load cached features from disk.
+    
+    Args:
+        cache_path: Path to the cache file
+        
+    Returns:
+        Dictionary of sample ID to features (empty if missing or unreadable)
+    """
+    if not os.path.exists(cache_path):
+        return {}
+    
+    try:
+        return joblib.load(cache_path)
+    except Exception as e:
+        logging.warning(f"Could not load feature cache {cache_path}: {str(e)}")
+        return {}
+
+def save_feature_cache(cache: Dict[str, Dict], cache_path: str) -> None:
+    """
+    Write cached features to disk.
+    
+    Args:
+        cache: Dictionary of sample ID to features
+        cache_path: Path to the cache file
+    """
+    try:
+        joblib.dump(cache, cache_path)
+    except Exception as e:
+        logging.warning(f"Could not save feature cache {cache_path}: {str(e)}")
+
+def extract_audio_features(samples: Dict[str, Dict], max_workers: Optional[int] = None,
+                           cache_path: Optional[str] = FEATURE_CACHE_PATH) -> Dict[str, Dict]:
     """
     Extract audio features from a dictionary of samples.
     
+    Features are reused from the on-disk cache for samples whose ID (path + mtime)
+    is already cached; the remaining files are featurized in parallel across a
+    process pool and added to the cache.
+    
     Args:
         samples: Dictionary of audio samples with ID as key
+        max_workers: Number of worker processes (default: one per CPU)
+        cache_path: Path to the feature cache, or None to disable caching
         
     Returns:
         Updated dictionary with features added to each sample
     """
     logging.info(f"Extracting features for {len(samples)} samples")
     
-    for sample_id, sample in samples.items():
-        try:
-            file_path = sample['path']
-            logging.debug(f"Extracting features for {file_path}")
-            
-            # Load audio file
-            y, sr = librosa.load(file_path, sr=None, mono=True)
-            
-            # Extract features
-            features = extract_features(y, sr)
-            
+    cache = load_feature_cache(cache_path) if cache_path else {}
+    
+    pending_ids = []
+    for sample_id in samples:
+        if sample_id in cache:
+            samples[sample_id]['features'] = cache[sample_id]
+        else:
+            pending_ids.append(sample_id)
+    
+    logging.info(f"Reused cached features for {len(samples) - len(pending_ids)} samples")
+    
+    if not pending_ids:
+        return samples
+    
+    paths = [samples[sample_id]['path'] for sample_id in pending_ids]
+    updates = {}
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for sample_id, features in zip(pending_ids, executor.map(_featurize_one, paths, chunksize=4)):
             # Add features to sample
             samples[sample_id]['features'] = features
-            
-        except Exception as e:
-            logging.error(f"Error extracting features for {sample['path']}: {str(e)}")
-            samples[sample_id]['features'] = {}
+            if features:
+                updates[sample_id] = features
+    
+    if cache_path and updates:
+        cache.update(updates)
+        save_feature_cache(cache, cache_path)
     
     return samples
 
@@ -56,16 +160,20 @@ def extract_features(y: np.ndarray, sr: int) -> Dict[str, Any]:
     
     # Extract spectral features
     if len(y) > 0:
+        # One STFT shared by every spectral feature below
+        S = np.abs(librosa.stft(y, n_fft=N_FFT))
+        S_power = S**2
+        
         # Spectral centroid
-        cent = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
+        cent = librosa.feature.spectral_centroid(S=S, sr=sr)[0]
         features.spectral_centroid = float(np.mean(cent))
         
         # Spectral bandwidth
-        bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=sr)[0]
+        bandwidth = librosa.feature.spectral_bandwidth(S=S, sr=sr)[0]
         features.spectral_bandwidth = float(np.mean(bandwidth))
         
         # Spectral rolloff
-        rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)[0]
+        rolloff = librosa.feature.spectral_rolloff(S=S, sr=sr)[0]
         features.spectral_rolloff = float(np.mean(rolloff))
         
         # Zero crossing rate
@@ -77,22 +185,242 @@ def extract_features(y: np.ndarray, sr: int) -> Dict[str, Any]:
         features.rms = float(np.mean(rms))
         features.energy = float(np.mean(rms**2))
         
-        # MFCCs
-        mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+        # MFCCs from the shared power spectrogram
+        log_mel = librosa.power_to_db(librosa.feature.melspectrogram(S=S_power, sr=sr))
+        mfccs = librosa.feature.mfcc(S=log_mel, n_mfcc=13)
         features.mfcc = [float(np.mean(mfcc)) for mfcc in mfccs]
         
         # Chroma features
-        chroma = librosa.feature.chroma_stft(y=y, sr=sr)
+        chroma = librosa.feature.chroma_stft(S=S_power, sr=sr)
         features.chroma = [float(np.mean(c)) for c in chroma]
         
-        # Tempo
-        try:
-            tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
-            features.tempo = float(tempo)
-        except:
-            features.tempo = 0.0
+        # Tempo from the same log-mel spectrogram
+        features.tempo = estimate_tempo(log_mel, sr)
     
-    return features.to_dict()
+    return features.to_dict(include_vector=True)
+
+def estimate_tempo(log_mel: np.ndarray, sr: int) -> float:
+    """
+    Estimate tempo from an onset envelope, without full beat tracking.
+    
+    Args:
+        log_mel: Log-power mel spectrogram (n_mels, frames), as used for the MFCCs
+        sr: Sample rate
+        
+    Returns:
+        Tempo in BPM, or 0.0 if it cannot be estimated
+    """
+    try:
+        onset_env = librosa.onset.onset_strength(S=log_mel, sr=sr)
+        return float(librosa.feature.tempo(onset_envelope=onset_env, sr=sr)[0])
+    except Exception:
+        return 0.0
+
+def extract_features_streaming(file_path: str, block_seconds: int = STREAM_BLOCK_SECONDS) -> Dict[str, Any]:
+    """
+    Extract the same aggregates as extract_features without holding the whole signal in memory.
+    
+    The file is read in fixed-size blocks; frame-level features are accumulated as
+    running sums and averaged at the end. Consecutive blocks overlap by N_FFT samples
+    so frames spanning a block boundary are not lost.
+    
+    Args:
+        file_path: Path to an audio file readable by soundfile
+        block_seconds: Length of each analysis block in seconds
+        
+    Returns:
+        Dictionary of audio features
+    """
+    info = sf.info(file_path)
+    sr = info.samplerate
+    
+    features = AudioFeatures()
+    features.duration = float(info.frames) / sr
+    
+    sums = {'centroid': 0.0, 'bandwidth': 0.0, 'rolloff': 0.0, 'zcr': 0.0, 'rms': 0.0, 'energy': 0.0}
+    mfcc_sum = None
+    chroma_sum = None
+    n_frames = 0
+    
+    for block in sf.blocks(file_path, blocksize=sr * block_seconds, overlap=N_FFT, dtype='float32'):
+        if block.ndim == 2:
+            block = block.mean(axis=1)
+        if len(block) == 0:
+            continue
+        
+        # One STFT per block shared by the spectral, MFCC and chroma features
+        S = np.abs(librosa.stft(block, n_fft=N_FFT))
+        S_power = S**2
+        
+        cent = librosa.feature.spectral_centroid(S=S, sr=sr)[0]
+        frames = len(cent)
+        sums['centroid'] += float(np.sum(cent))
+        sums['bandwidth'] += float(np.sum(librosa.feature.spectral_bandwidth(S=S, sr=sr)[0]))
+        sums['rolloff'] += float(np.sum(librosa.feature.spectral_rolloff(S=S, sr=sr)[0]))
+        sums['zcr'] += float(np.sum(librosa.feature.zero_crossing_rate(block, frame_length=N_FFT)[0]))
+        
+        rms = librosa.feature.rms(y=block, frame_length=N_FFT)[0]
+        sums['rms'] += float(np.sum(rms))
+        sums['energy'] += float(np.sum(rms**2))
+        
+        log_mel = librosa.power_to_db(librosa.feature.melspectrogram(S=S_power, sr=sr))
+        mfccs = librosa.feature.mfcc(S=log_mel, n_mfcc=13).sum(axis=1)
+        chroma = librosa.feature.chroma_stft(S=S_power, sr=sr).sum(axis=1)
+        mfcc_sum = mfccs if mfcc_sum is None else mfcc_sum + mfccs
+        chroma_sum = chroma if chroma_sum is None else chroma_sum + chroma
+        
+        if n_frames == 0:
+            # Tempo only needs a short excerpt; use the first block
+            features.tempo = estimate_tempo(log_mel, sr)
+        
+        n_frames += frames
+    
+    if n_frames > 0:
+        features.spectral_centroid = sums['centroid'] / n_frames
+        features.spectral_bandwidth = sums['bandwidth'] / n_frames
+        features.spectral_rolloff = sums['rolloff'] / n_frames
+        features.zero_crossing_rate = sums['zcr'] / n_frames
+        features.rms = sums['rms'] / n_frames
+        features.energy = sums['energy'] / n_frames
+        features.mfcc = [float(v) for v in mfcc_sum / n_frames]
+        features.chroma = [float(v) for v in chroma_sum / n_frames]
+    
+    return features.to_dict(include_vector=True)
+
+def extract_audio_features_gpu(samples: Dict[str, Dict], batch_size: int = 32) -> Dict[str, Dict]:
+    """
+    Extract audio features in batches on the GPU using torchlibrosa.
+    
+    Waveforms are resampled to GPU_SAMPLE_RATE, zero-padded to the batch maximum and
+    run through a single Spectrogram -> LogmelFilterBank pass. Spectral centroid,
+    bandwidth, rolloff, RMS, MFCC and chroma are derived from that one spectrogram;
+    padded frames are masked out of every mean. Tempo is estimated on the CPU from
+    the same log-mel frames.
+    Falls back to extract_audio_features when torch/torchlibrosa are not installed.
+    
+    Args:
+        samples: Dictionary of audio samples with ID as key
+        batch_size: Number of files per GPU batch
+        
+    Returns:
+        Updated dictionary with features added to each sample
+    """
+    if not TORCH_AVAILABLE:
+        logging.warning("torch/torchlibrosa not installed. Using CPU feature extraction.")
+        return extract_audio_features(samples)
+    
+    logging.info(f"Extracting features for {len(samples)} samples on GPU")
+    
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    sr = GPU_SAMPLE_RATE
+    n_mels = 128
+    
+    spectrogram = tl.Spectrogram(n_fft=N_FFT, hop_length=HOP_LENGTH, pad_mode='constant',
+                                 power=2.0, freeze_parameters=True).to(device)
+    logmel = tl.LogmelFilterBank(sr=sr, n_fft=N_FFT, n_mels=n_mels, fmin=0.0, fmax=sr / 2,
+                                 ref=1.0, amin=1e-10, top_db=None, freeze_parameters=True).to(device)
+    freqs = torch.linspace(0, sr / 2, N_FFT // 2 + 1, device=device)
+    # Same orthonormal DCT-II librosa.feature.mfcc applies along the mel axis
+    dct = torch.from_numpy(scipy.fft.dct(np.eye(n_mels), type=2, norm='ortho', axis=0)[:13]).float().to(device)
+    window_energy = float(np.sum(scipy.signal.get_window('hann', N_FFT)**2))
+    chroma_fb = torch.from_numpy(librosa.filters.chroma(sr=sr, n_fft=N_FFT)).float().to(device)
+    
+    sample_ids = list(samples.keys())
+    
+    for start in range(0, len(sample_ids), batch_size):
+        batch_ids = []
+        waveforms = []
+        
+        for sample_id in sample_ids[start:start + batch_size]:
+            try:
+                y, _ = read_audio(samples[sample_id]['path'], sr=sr, mono=True)
+                if len(y) == 0:
+                    raise ValueError("empty audio")
+                batch_ids.append(sample_id)
+                waveforms.append(torch.from_numpy(np.ascontiguousarray(y, dtype=np.float32)))
+            except Exception as e:
+                logging.error(f"Error extracting features for {samples[sample_id]['path']}: {str(e)}")
+                samples[sample_id]['features'] = {}
+        
+        if not waveforms:
+            continue
+        
+        lengths = torch.tensor([len(w) for w in waveforms], device=device)
+        batch = torch.nn.utils.rnn.pad_sequence(waveforms, batch_first=True).to(device)
+        
+        with torch.no_grad():
+            power = spectrogram(batch)                   # (B, 1, frames, bins)
+            log_mel = logmel(power)[:, 0]                # (B, frames, n_mels)
+            # Per-file 80 dB floor, as librosa.power_to_db(top_db=80) does
+            log_mel = torch.maximum(log_mel, log_mel.amax(dim=(1, 2), keepdim=True) - 80.0)
+            power = power[:, 0]                          # (B, frames, bins)
+            magnitude = power.sqrt()
+            
+            # Mask of frames that belong to the real (unpadded) signal
+            n_frames = 1 + lengths // HOP_LENGTH
+            frame_mask = (torch.arange(power.shape[1], device=device)[None, :] < n_frames[:, None]).float()
+            counts = frame_mask.sum(dim=1)
+            
+            def masked_mean(values):
+                return (values * frame_mask).sum(dim=1) / counts
+            
+            # Spectral centroid / bandwidth / rolloff from the magnitude spectrogram
+            norm = magnitude.sum(dim=2).clamp_min(1e-10)
+            centroid = (magnitude * freqs).sum(dim=2) / norm
+            bandwidth = ((magnitude / norm[..., None]) * (freqs - centroid[..., None])**2).sum(dim=2).sqrt()
+            cumulative = magnitude.cumsum(dim=2)
+            rolloff_idx = (cumulative < 0.85 * cumulative[..., -1:]).sum(dim=2).clamp_max(len(freqs) - 1)
+            rolloff = freqs[rolloff_idx]
+            
+            # RMS per frame from the power spectrum (Parseval, halving DC and Nyquist bins
+            # and undoing the Hann window's energy loss)
+            weighted = power.clone()
+            weighted[..., 0] *= 0.5
+            weighted[..., -1] *= 0.5
+            rms = (2 * weighted.sum(dim=2) / (N_FFT * window_energy)).sqrt()
+            
+            # Zero crossing rate over the unpadded samples
+            sample_mask = torch.arange(batch.shape[1] - 1, device=device)[None, :] < (lengths[:, None] - 1)
+            crossings = (torch.signbit(batch[:, 1:]) != torch.signbit(batch[:, :-1])) & sample_mask
+            zcr = crossings.sum(dim=1).float() / (lengths - 1).clamp_min(1).float()
+            
+            # MFCC (DCT of the log-mel) and chroma (chroma filterbank over the power spectrum)
+            mfcc = log_mel @ dct.T                       # (B, frames, 13)
+            chroma = power @ chroma_fb.T                 # (B, frames, 12)
+            chroma = chroma / chroma.amax(dim=2, keepdim=True).clamp_min(1e-10)
+            
+            stats = {
+                'centroid': masked_mean(centroid),
+                'bandwidth': masked_mean(bandwidth),
+                'rolloff': masked_mean(rolloff),
+                'rms': masked_mean(rms),
+                'energy': masked_mean(rms**2),
+                'mfcc': (mfcc * frame_mask[..., None]).sum(dim=1) / counts[:, None],
+                'chroma': (chroma * frame_mask[..., None]).sum(dim=1) / counts[:, None],
+            }
+            stats = {name: value.cpu().numpy() for name, value in stats.items()}
+            zcr = zcr.cpu().numpy()
+            log_mel = log_mel.cpu().numpy()
+            n_frames = n_frames.cpu().numpy()
+        
+        for b, sample_id in enumerate(batch_ids):
+            features = AudioFeatures()
+            features.duration = float(lengths[b]) / sr
+            features.spectral_centroid = float(stats['centroid'][b])
+            features.spectral_bandwidth = float(stats['bandwidth'][b])
+            features.spectral_rolloff = float(stats['rolloff'][b])
+            features.zero_crossing_rate = float(zcr[b])
+            features.rms = float(stats['rms'][b])
+            features.energy = float(stats['energy'][b])
+            features.mfcc = [float(v) for v in stats['mfcc'][b]]
+            features.chroma = [float(v) for v in stats['chroma'][b]]
+            
+            # Tempo from the GPU log-mel spectrogram (unpadded frames only)
+            features.tempo = estimate_tempo(log_mel[b, :n_frames[b]].T, sr)
+            
+            samples[sample_id]['features'] = features.to_dict(include_vector=True)
+    
+    return samples
 
 def normalize_features(features_dict: Dict[str, Dict]) -> Dict[str, Dict]:
     """
@@ -104,34 +432,37 @@ def normalize_features(features_dict: Dict[str, Dict]) -> Dict[str, Dict]:
     Returns:
         Dictionary with normalized features
     """
-    # Collect all values for each feature
-    feature_values = {}
+    if not features_dict:
+        return {}
     
-    for sample_id, features in features_dict.items():
-        for feature, value in features.items():
-            if feature not in ['mfcc', 'chroma']:  # Handle these separately
-                if feature not in feature_values:
-                    feature_values[feature] = []
-                feature_values[feature].append(value)
+    # Scalar feature keys across all samples (mfcc/chroma/_vec are copied through unchanged)
+    scalar_keys = list(dict.fromkeys(
+        feature for features in features_dict.values() for feature in features
+        if feature not in VECTOR_FEATURES
+    ))
+    key_index = {feature: j for j, feature in enumerate(scalar_keys)}
+    
+    # Stack into an (N, F) matrix; features a sample lacks are NaN and ignored by min/max
+    n_samples, n_features = len(features_dict), len(scalar_keys)
+    X = np.fromiter(
+        (features.get(feature, np.nan) for features in features_dict.values() for feature in scalar_keys),
+        dtype=np.float32, count=n_samples * n_features
+    ).reshape(n_samples, n_features)
+    
+    if n_features > 0:
+        col_min = np.nanmin(X, axis=0)
+        col_range = np.nanmax(X, axis=0) - col_min
+        
+        # Constant features normalize to 0.0 (avoids division by zero)
+        X = (X - col_min) / np.where(col_range > 0, col_range, 1.0)
     
     # Normalize features
     normalized_features = {}
     
-    for sample_id, features in features_dict.items():
-        normalized_features[sample_id] = {}
-        
-        for feature, value in features.items():
-            if feature not in ['mfcc', 'chroma']:
-                # Get min and max for this feature
-                min_val = min(feature_values[feature])
-                max_val = max(feature_values[feature])
-                
-                # Avoid division by zero
-                if max_val > min_val:
-                    normalized_features[sample_id][feature] = (value - min_val) / (max_val - min_val)
-                else:
-                    normalized_features[sample_id][feature] = 0.0
-            else:
-                normalized_features[sample_id][feature] = value
+    for row, (sample_id, features) in zip(X, features_dict.items()):
+        normalized_features[sample_id] = {
+            feature: value if feature in VECTOR_FEATURES else float(row[key_index[feature]])
+            for feature, value in features.items()
+        }
     
     return normalized_features
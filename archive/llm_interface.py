@@ -1,55 +1,115 @@
 import os
 import logging
 import json
-from typing import Dict, List, Any
+import re
+import heapq
+from itertools import islice
+from typing import Dict, List, Any, Optional, Tuple
 from langchain_community.llms import OpenAI
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
 import numpy as np
 
-def search_samples_with_llm(query: str, samples: Dict[str, Dict]) -> List[Dict[str, Any]]:
+# Splits names/categories/moods into word tokens for the search index
+TOKEN_SPLIT = re.compile(r'[\W_]+')
+
+# Score of a query term matching each searchable field in fallback_search
+SEARCH_FIELD_WEIGHTS = (("name", 3), ("category", 2), ("mood", 2))
+
+# Limit to 20 samples to avoid token limits
+MAX_LLM_SAMPLES = 20
+
+def sample_representation(sample_id: str, sample: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Create a simplified representation of a sample for the LLM prompt.
+    
+    Args:
+        sample_id: Sample ID
+        sample: Sample metadata dictionary
+        
+    Returns:
+        Dictionary with name, category, mood and key features
+    """
+    representation = {
+        "id": sample_id,
+        "name": sample.get("name", ""),
+        "category": sample.get("category", "Unknown"),
+        "mood": sample.get("mood", "Unknown")
+    }
+    
+    # Add key features if available
+    features = sample.get("features")
+    if isinstance(features, dict):
+        representation["spectral_centroid"] = features.get("spectral_centroid", 0)
+        representation["energy"] = features.get("energy", 0)
+        representation["tempo"] = features.get("tempo", 0)
+    
+    return representation
+
+# Serialized LLM payload, keyed by id(samples): (fingerprint, payload)
+_payload_cache: Dict[int, Tuple[tuple, str]] = {}
+
+def llm_payload(samples: Dict[str, Dict]) -> str:
+    """
+    Return the JSON list of sample representations sent to the LLM.
+    
+    The serialized payload is reused across queries until one of the sent samples
+    is added, removed, renamed, reclassified or re-featurized.
+    
+    Args:
+        samples: Dictionary of audio samples with metadata
+        
+    Returns:
+        JSON-encoded list of up to MAX_LLM_SAMPLES representations
+    """
+    head = list(islice(samples.items(), MAX_LLM_SAMPLES))
+    fingerprint = tuple(
+        (sample_id, sample.get("name"), sample.get("category"), sample.get("mood"), id(sample.get("features")))
+        for sample_id, sample in head
+    )
+    
+    cached = _payload_cache.get(id(samples))
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+    
+    # Create a simplified representation of samples for the LLM
+    payload = json.dumps([sample_representation(sample_id, sample) for sample_id, sample in head])
+    
+    # Only the most recent library is kept
+    _payload_cache.clear()
+    _payload_cache[id(samples)] = (fingerprint, payload)
+    return payload
+
+def search_samples_with_llm(query: str, samples: Dict[str, Dict],
+                            index: Optional[Dict[str, Dict[str, set]]] = None) -> List[Dict[str, Any]]:
     """
     Search for audio samples based on natural language query using LLM.
     
     Args:
         query: Natural language search query
         samples: Dictionary of audio samples with metadata
+        index: Index of samples from build_search_index for the fallback search
+            (default: search_index(samples), cached per library)
         
     Returns:
         List of matching sample dictionaries
     """
     logging.info(f"Searching samples with query: {query}")
     
+    # Nothing for the LLM to interpret (e.g. numbers or punctuation only)
+    if not re.search(r'[A-Za-z]', query):
+        return fallback_search(query, samples, index)
+    
     # Check if API key is available
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key:
         logging.warning("OpenAI API key not found. Using fallback search method.")
-        return fallback_search(query, samples)
+        return fallback_search(query, samples, index)
     
     try:
         # Initialize LLM
         llm = OpenAI(temperature=0.1)
         
-        # Create a simplified representation of samples for the LLM
-        sample_representations = []
-        for sample_id, sample in samples.items():
-            representation = {
-                "id": sample_id,
-                "name": sample.get("name", ""),
-                "category": sample.get("category", "Unknown"),
-                "mood": sample.get("mood", "Unknown")
-            }
-            
-            # Add key features if available
-            if "features" in sample:
-                features = sample["features"]
-                if isinstance(features, dict):
-                    representation["spectral_centroid"] = features.get("spectral_centroid", 0)
-                    representation["energy"] = features.get("energy", 0)
-                    representation["tempo"] = features.get("tempo", 0)
-            
-            sample_representations.append(representation)
-        
         # Create prompt
         prompt_template = """
         You are an expert audio engineer and sample librarian. Your task is to find the most relevant audio samples based on the user's query.
@@ -75,7 +135,7 @@ def search_samples_with_llm(query: str, samples: Dict[str, Dict]) -> List[Dict[s
         
         # Run chain
         result = chain.run({
-            "samples": json.dumps(sample_representations[:20], indent=2),  # Limit to 20 samples to avoid token limits
+            "samples": llm_payload(samples),
             "query": query
         })
         
@@ -106,58 +166,108 @@ def search_samples_with_llm(query: str, samples: Dict[str, Dict]) -> List[Dict[s
         except Exception as e:
             logging.error(f"Error parsing LLM result: {str(e)}")
             logging.error(f"Raw result: {result}")
-            return fallback_search(query, samples)
+            return fallback_search(query, samples, index)
     
     except Exception as e:
         logging.error(f"Error using LLM for search: {str(e)}")
-        return fallback_search(query, samples)
+        return fallback_search(query, samples, index)
+
+def build_search_index(samples: Dict[str, Dict]) -> Dict[str, Dict[str, set]]:
+    """
+    Build an inverted index of name/category/mood tokens for fallback_search.
+    
+    Args:
+        samples: Dictionary of audio samples
+        
+    Returns:
+        Dictionary with 'name', 'category' and 'mood' maps of token -> set of sample IDs,
+        plus 'order' mapping each sample ID to its position in the library
+    """
+    index = {"name": {}, "category": {}, "mood": {}}
+    
+    for sample_id, sample in samples.items():
+        for field, postings in index.items():
+            for token in TOKEN_SPLIT.split(sample.get(field, "").lower()):
+                if token:
+                    postings.setdefault(token, set()).add(sample_id)
+    
+    index["order"] = {sample_id: i for i, sample_id in enumerate(samples)}
+    return index
+
+# Fallback search index, keyed by id(samples): (fingerprint, index)
+_index_cache: Dict[int, Tuple[tuple, Dict[str, Dict[str, set]]]] = {}
+
+def search_index(samples: Dict[str, Dict]) -> Dict[str, Dict[str, set]]:
+    """
+    Return the build_search_index index of a library.
+    
+    The index is reused across queries until a sample is added, removed, renamed or
+    reclassified. Checking that is one pass of dictionary lookups, much cheaper than
+    lowercasing and substring-testing every sample for each query term.
+    
+    Args:
+        samples: Dictionary of audio samples
+        
+    Returns:
+        Index as returned by build_search_index
+    """
+    fingerprint = tuple(
+        (sample_id, sample.get("name"), sample.get("category"), sample.get("mood"))
+        for sample_id, sample in samples.items()
+    )
+    
+    cached = _index_cache.get(id(samples))
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+    
+    index = build_search_index(samples)
+    
+    # Only the most recent library is kept
+    _index_cache.clear()
+    _index_cache[id(samples)] = (fingerprint, index)
+    return index
 
-def fallback_search(query: str, samples: Dict[str, Dict]) -> List[Dict[str, Any]]:
+def fallback_search(query: str, samples: Dict[str, Dict], index: Optional[Dict[str, Dict[str, set]]] = None) -> List[Dict[str, Any]]:
     """
     Fallback keyword-based search when LLM is unavailable.
     
+    Each query term scores 3 for a name match and 2 each for category and mood
+    matches, where a term matches a field when it is a substring of it. Through the
+    token index, a term without separators only needs the (small) token vocabulary
+    scanned, never every sample; terms spanning a separator (e.g. "hi-hat") are
+    checked against the whole fields.
+    
     Args:
         query: Search query
         samples: Dictionary of audio samples
+        index: Index of samples from build_search_index (default: search_index(samples))
         
     Returns:
         List of matching sample dictionaries
     """
+    if index is None:
+        index = search_index(samples)
+    
     query_terms = query.lower().split()
-    matches = []
+    scores = {}
     
-    for sample_id, sample in samples.items():
-        score = 0
-        
-        # Check name
-        name = sample.get("name", "").lower()
-        for term in query_terms:
-            if term in name:
-                score += 3
-        
-        # Check category
-        category = sample.get("category", "").lower()
-        for term in query_terms:
-            if term in category:
-                score += 2
-        
-        # Check mood
-        mood = sample.get("mood", "").lower()
+    for field, weight in SEARCH_FIELD_WEIGHTS:
         for term in query_terms:
-            if term in mood:
-                score += 2
-        
-        if score > 0:
-            match = sample.copy()
-            match["search_score"] = score
-            matches.append(match)
-    
-    # Sort by score
-    matches.sort(key=lambda x: x.get("search_score", 0), reverse=True)
+            if TOKEN_SPLIT.search(term):
+                # Substring of the whole field
+                matched = [sample_id for sample_id, sample in samples.items() if term in sample.get(field, "").lower()]
+            else:
+                # Union postings of every token containing the term
+                matched = set()
+                for token, sample_ids in index[field].items():
+                    if term in token:
+                        matched |= sample_ids
+            
+            for sample_id in matched:
+                scores[sample_id] = scores.get(sample_id, 0) + weight
     
-    # Remove scores from results
-    for match in matches:
-        if "search_score" in match:
-            del match["search_score"]
+    # Top 10 matches by score (ties keep library order)
+    order = index["order"]
+    top_ids = heapq.nsmallest(10, scores, key=lambda sample_id: (-scores[sample_id], order[sample_id]))
     
-    return matches[:10]  # Return top 10 matches
+    return [samples[sample_id].copy() for sample_id in top_ids]
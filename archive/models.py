@@ -1,5 +1,19 @@
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Any
+import numpy as np
+
+# Slot layout of the float32 classification vector: 7 scalar features + first 5 MFCCs
+FEATURE_VECTOR_SLOTS = {
+    'spectral_centroid': 0,
+    'spectral_bandwidth': 1,
+    'spectral_rolloff': 2,
+    'zero_crossing_rate': 3,
+    'energy': 4,
+    'tempo': 5,
+    'rms': 6,
+}
+N_VECTOR_MFCC = 5
+FEATURE_VECTOR_LENGTH = len(FEATURE_VECTOR_SLOTS) + N_VECTOR_MFCC
 
 @dataclass
 class AudioFeatures:
@@ -15,9 +29,23 @@ class AudioFeatures:
     duration: float = 0.0
     rms: float = 0.0
     
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert features to dictionary for JSON serialization."""
-        return {
+    def to_vector(self) -> np.ndarray:
+        """Pack the classification features into a float32 vector (see FEATURE_VECTOR_SLOTS)."""
+        vector = np.zeros(FEATURE_VECTOR_LENGTH, dtype=np.float32)
+        for name, index in FEATURE_VECTOR_SLOTS.items():
+            vector[index] = getattr(self, name)
+        mfcc = self.mfcc[:N_VECTOR_MFCC]
+        vector[len(FEATURE_VECTOR_SLOTS):len(FEATURE_VECTOR_SLOTS) + len(mfcc)] = mfcc
+        return vector
+    
+    def to_dict(self, include_vector: bool = False) -> Dict[str, Any]:
+        """
+        Convert features to dictionary for JSON serialization.
+        
+        With include_vector, the packed float32 classification vector is added
+        under '_vec' (not JSON-serializable; used by the classifier).
+        """
+        result = {
             'spectral_centroid': self.spectral_centroid,
             'spectral_bandwidth': self.spectral_bandwidth,
             'spectral_rolloff': self.spectral_rolloff,
@@ -29,6 +57,9 @@ class AudioFeatures:
             'duration': self.duration,
             'rms': self.rms
         }
+        if include_vector:
+            result['_vec'] = self.to_vector()
+        return result
 
 @dataclass
 class AudioSample:
@@ -1,18 +1,31 @@
 import os
+import re
+import sys
 import shutil
 import argparse
+import bisect
 import numpy as np
 from pathlib import Path
 import json
 import csv
 from datetime import datetime
 import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
 warnings.filterwarnings('ignore')
 
+# On-disk cache for extracted features, plus librosa's own joblib cache (must be
+# configured before librosa is imported). Level 10 memoizes filterbanks and windows;
+# per-file STFTs are not worth storing since whole feature sets are cached below.
+CACHE_DIR = os.path.expanduser('~/.cache/sample_buddy')
+os.environ.setdefault('LIBROSA_CACHE_DIR', os.path.join(CACHE_DIR, 'librosa'))
+os.environ.setdefault('LIBROSA_CACHE_LEVEL', '10')
+
 # Import librosa for audio analysis
 try:
     import librosa
     import librosa.display
+    import soundfile as sf
     print(f"Librosa version {librosa.__version__} successfully imported!")
 except ImportError:
     print("Librosa not installed. Installing...")
@@ -22,255 +35,422 @@ except ImportError:
     try:
         import librosa
         import librosa.display
+        import soundfile as sf
         print(f"Librosa version {librosa.__version__} successfully installed and imported!")
     except ImportError:
         print("Failed to install librosa. Please install manually with:")
         print("pip install librosa")
         exit(1)
 
+# joblib, numba, scipy and threadpoolctl are installed with librosa
+from joblib import Memory
+from numba import njit
+from scipy import fft as scipy_fft
+from threadpoolctl import threadpool_limits
+feature_memory = Memory(os.path.join(CACHE_DIR, 'features'), verbose=0)
+
+# Optional: orjson serializes the JSON report in C; the standard library is used otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def json_dumps_indented(obj):
+    """JSON text of obj with 2-space indentation (orjson when available)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(obj, indent=2)
+
+AUDIO_EXTENSIONS = {'.wav', '.mp3', '.aiff', '.aif', '.flac'}
+
 def list_audio_files(input_dir):
     """List all audio files in the input directory"""
-    audio_files = []
-    for file in os.listdir(input_dir):
-        if file.lower().endswith(('.wav', '.mp3', '.aiff', '.aif', '.flac')):
-            audio_files.append(os.path.join(input_dir, file))
-    return audio_files
+    with os.scandir(input_dir) as entries:
+        return [entry.path for entry in entries
+                if os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS and entry.is_file()]
+
+# Frequency band boundaries in Hz: sub bass, bass, low mid, mid, upper mid, high
+FREQUENCY_BAND_EDGES = [20, 60, 250, 500, 2000, 4000, 11025]
+
+@lru_cache(maxsize=8)
+def bin_frequencies(sr, n_fft=2048):
+    """float32 center frequencies of the FFT bins, computed once per (sr, n_fft)"""
+    freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft).astype(np.float32)
+    freqs.setflags(write=False)  # shared between calls
+    return freqs
+
+@lru_cache(maxsize=8)
+def band_bin_edges(sr, n_fft=2048):
+    """FFT bin indices of FREQUENCY_BAND_EDGES, computed once per (sr, n_fft)"""
+    edges = np.searchsorted(bin_frequencies(sr, n_fft), FREQUENCY_BAND_EDGES)
+    edges.setflags(write=False)  # shared between calls
+    return edges
+
+# Rate every file is resampled to before analysis: the aggregate features are stable
+# at 22.05 kHz and it halves the STFT work for 44.1/48 kHz material
+ANALYSIS_SR = 22050
+
+# STFT parameters (librosa's defaults) and FFT threads per STFT; -1 uses every core,
+# pool workers drop to 1 since files are already processed in parallel
+N_FFT = 2048
+HOP_LENGTH = 512
+FFT_WORKERS = -1
+
+@lru_cache(maxsize=4)
+def stft_window(n_fft=N_FFT):
+    """Periodic Hann window as a float32 column, computed once per n_fft"""
+    window = librosa.filters.get_window('hann', n_fft, fftbins=True).astype(np.float32)[:, np.newaxis]
+    window.setflags(write=False)  # shared between calls
+    return window
 
-def extract_audio_features(file_path):
-    """Extract comprehensive audio features using Librosa"""
+@lru_cache(maxsize=4)
+def mel_basis(sr, n_fft=N_FFT, n_mels=128):
+    """Mel filter bank (librosa's melspectrogram defaults), computed once per (sr, n_fft, n_mels)"""
+    basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+    basis.setflags(write=False)  # shared between calls
+    return basis
+
+def stft_magnitude(y, n_fft=N_FFT, hop_length=HOP_LENGTH):
+    """Magnitude STFT matching np.abs(librosa.stft(y)) (centered, zero padded)
+    
+    Frames are windowed in one pass and transformed by a single multi-threaded
+    scipy.fft.rfft call.
+    """
+    frames = librosa.util.frame(np.pad(y, n_fft // 2), frame_length=n_fft, hop_length=hop_length)
+    return np.abs(scipy_fft.rfft(frames * stft_window(n_fft), axis=0, workers=FFT_WORKERS))
+
+def extract_audio_features(file_path, max_analysis_seconds=10.0, feature_set='full'):
+    """Extract comprehensive audio features using Librosa
+    
+    Only the first max_analysis_seconds of audio are decoded and analyzed (None for
+    the whole file); 'duration' is still the full length of the file. feature_set
+    'mood' skips tempo and MFCCs (unused by the mood and traditional classifiers) and
+    'duration' only reads the file length. Every value is a plain Python scalar, so
+    the dict can be written to the JSON/CSV reports without filtering. Results are
+    cached on disk per (path, modification time, size), so unchanged files are only
+    analyzed once across runs; failures are not cached, so they are retried next run.
+    """
     try:
-        print(f"  Analyzing {os.path.basename(file_path)}...")
-        
-        # Load the audio file with librosa
-        try:
-            # Try default loading
-            y, sr = librosa.load(file_path, sr=None)
-            
-            # If loaded successfully, get duration
-            duration = librosa.get_duration(y=y, sr=sr)
-            print(f"  Loaded audio: {duration:.2f} seconds, {sr} Hz")
-        except Exception as e:
-            print(f"  Warning: Error in basic loading: {e}")
-            # Try with different parameters
+        stat = os.stat(file_path)
+    except OSError as e:
+        print(f"Error analyzing {file_path}: {e}")
+        return None
+    file_stamp = (stat.st_mtime_ns, stat.st_size)
+    try:
+        return _extract_audio_features(os.path.abspath(file_path), file_stamp, max_analysis_seconds, feature_set)
+    except _ExtractionFailed:
+        return None
+
+class _ExtractionFailed(Exception):
+    """Raised (after logging) by _extract_audio_features; joblib only caches return values"""
+
+@feature_memory.cache
+def _extract_audio_features(file_path, file_stamp, max_analysis_seconds, feature_set='full'):
+    """Uncached feature extraction; file_stamp (mtime in ns, size) is only part of the cache key
+    
+    Progress messages are collected and written in one go once the file is done, so
+    output from parallel workers doesn't interleave. Failures raise _ExtractionFailed
+    rather than returning None, which would be cached.
+    """
+    log_lines = []
+    log = log_lines.append
+    try:
+        if feature_set == 'duration':
             try:
-                y, sr = librosa.load(file_path, sr=22050, mono=True)
-                duration = librosa.get_duration(y=y, sr=sr)
-                print(f"  Loaded with fallback: {duration:.2f} seconds, 22050 Hz")
-            except Exception as e2:
-                print(f"  Error: Could not load audio file: {e2}")
-                return None
+                return {'duration': librosa.get_duration(path=file_path), 'sample_rate': ANALYSIS_SR}
+            except Exception as e:
+                log(f"  Error: Could not read audio file: {e}")
+                raise _ExtractionFailed from e
         
-        # Initialize features dictionary
-        features = {
-            'duration': duration,
-            'sample_rate': sr
-        }
-        
-        # Basic energy features
         try:
-            # RMS energy (loudness)
-            rms = librosa.feature.rms(y=y)[0]
-            energy_mean = np.mean(rms)
-            energy_std = np.std(rms)
-            energy_max = np.max(rms)
-            
-            features['energy_mean'] = float(energy_mean)
-            features['energy_std'] = float(energy_std)
-            features['energy_max'] = float(energy_max)
-            features['energy_dynamic_range'] = float(energy_max / (energy_mean + 1e-5))
-            
-            print(f"  Extracted energy features")
-        except Exception as e:
-            print(f"  Warning: Error extracting energy features: {e}")
-        
-        # Spectral features
-        try:
-            # Compute spectrogram
-            S = np.abs(librosa.stft(y))
-            
-            # Spectral centroid
-            centroid = librosa.feature.spectral_centroid(S=S, sr=sr)[0]
-            features['avg_centroid'] = float(np.mean(centroid))
+            log(f"  Analyzing {os.path.basename(file_path)}...")
             
-            # Spectral bandwidth
-            bandwidth = librosa.feature.spectral_bandwidth(S=S, sr=sr)[0]
-            features['avg_bandwidth'] = float(np.mean(bandwidth))
-            
-            # Spectral contrast
-            contrast = librosa.feature.spectral_contrast(S=S, sr=sr)
-            features['avg_contrast'] = float(np.mean(contrast))
-            
-            # Spectral flatness
-            flatness = librosa.feature.spectral_flatness(S=S)[0]
-            features['avg_flatness'] = float(np.mean(flatness))
-            
-            # Spectral rolloff
-            rolloff = librosa.feature.spectral_rolloff(S=S, sr=sr)[0]
-            features['avg_rolloff'] = float(np.mean(rolloff))
+            # Load the audio file as mono, resampled to ANALYSIS_SR
+            try:
+                # Read directly with soundfile (wav/flac/aiff), skipping librosa's audioread path
+                info = sf.info(file_path)
+                frames = int(max_analysis_seconds * info.samplerate) if max_analysis_seconds is not None else -1
+                y, native_sr = sf.read(file_path, frames=frames, dtype='float32', always_2d=True)
+                y = y.mean(axis=1)
+                sr = ANALYSIS_SR
+                if native_sr != sr:
+                    y = librosa.resample(y, orig_sr=native_sr, target_sr=sr, res_type='soxr_lq')
+                
+                # If loaded successfully, get duration
+                duration = info.duration
+                log(f"  Loaded audio: {duration:.2f} seconds, {sr} Hz")
+            except Exception as e:
+                log(f"  Warning: Error in basic loading: {e}")
+                # Fall back to librosa's loader (e.g. formats soundfile can't decode)
+                try:
+                    y, sr = librosa.load(file_path, sr=ANALYSIS_SR, mono=True, res_type='soxr_lq')
+                    duration = librosa.get_duration(y=y, sr=sr)
+                    if max_analysis_seconds is not None:
+                        y = y[:int(max_analysis_seconds * sr)]
+                    log(f"  Loaded with fallback: {duration:.2f} seconds, {sr} Hz")
+                except Exception as e2:
+                    log(f"  Error: Could not load audio file: {e2}")
+                    raise _ExtractionFailed from e2
             
-            print(f"  Extracted spectral features")
-        except Exception as e:
-            print(f"  Warning: Error extracting spectral features: {e}")
-        
-        # Rhythm features
-        try:
-            # Tempo estimation
-            onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-            tempo, _ = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr)
-            features['tempo'] = float(tempo)
+            # Keep the signal (and everything derived from it) in single precision
+            y = y.astype(np.float32, copy=False)
             
-            # Onset rate
-            onset_frames = librosa.onset.onset_detect(y=y, sr=sr)
-            onset_rate = len(onset_frames) / duration if duration > 0 else 0
-            features['onset_rate'] = float(onset_rate)
+            # Length of the analyzed excerpt (rates below are relative to it)
+            analyzed_duration = len(y) / sr
             
-            print(f"  Extracted rhythm features")
-        except Exception as e:
-            print(f"  Warning: Error extracting rhythm features: {e}")
-        
-        # MFCC features for timbre analysis
-        try:
-            mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-            for i in range(min(5, mfccs.shape[0])):  # Just use first 5 MFCCs
-                features[f'mfcc{i+1}'] = float(np.mean(mfccs[i]))
+            # Initialize features dictionary
+            features = {
+                'duration': duration,
+                'sample_rate': sr
+            }
             
-            print(f"  Extracted MFCC features")
-        except Exception as e:
-            print(f"  Warning: Error extracting MFCC features: {e}")
-        
-        # Envelope analysis for ADSR
-        try:
-            # Calculate envelope
-            envelope = np.abs(y)
+            # Shared spectra: one STFT (and one mel spectrogram derived from it) reused by
+            # the spectral, rhythm, MFCC and frequency band features below
+            S = stft_magnitude(y)
+            S_power = S**2
+            freqs = bin_frequencies(sr, 2 * (S.shape[0] - 1))
+            log_mel = librosa.power_to_db(mel_basis(sr) @ S_power)
             
-            # Smooth envelope
-            frame_length = int(sr * 0.03)  # 30ms frames
-            hop_length = int(sr * 0.01)  # 10ms hop
-            frames = librosa.util.frame(envelope, frame_length=frame_length, hop_length=hop_length)
-            env_frames = np.mean(frames, axis=0)
+            # Basic energy features
+            try:
+                # RMS energy (loudness)
+                rms = librosa.feature.rms(y=y)[0]
+                energy_mean = np.mean(rms)
+                energy_std = np.std(rms)
+                energy_max = np.max(rms)
+                
+                features['energy_mean'] = float(energy_mean)
+                features['energy_std'] = float(energy_std)
+                features['energy_max'] = float(energy_max)
+                features['energy_dynamic_range'] = float(energy_max / (energy_mean + 1e-5))
+                
+                log(f"  Extracted energy features")
+            except Exception as e:
+                log(f"  Warning: Error extracting energy features: {e}")
             
-            # Find attack time (time to reach 80% of peak)
-            if len(env_frames) > 0:
-                peak_idx = np.argmax(env_frames)
-                threshold = 0.8 * env_frames[peak_idx]
-                attack_frames = 0
+            # Spectral features
+            try:
+                # Spectral centroid
+                centroid = librosa.feature.spectral_centroid(S=S, sr=sr, freq=freqs)[0]
                 
-                for i in range(min(peak_idx, len(env_frames))):
-                    if env_frames[peak_idx - i] < threshold:
-                        attack_frames = i
-                        break
+                # Spectral bandwidth
+                bandwidth = librosa.feature.spectral_bandwidth(S=S, sr=sr, freq=freqs)[0]
                 
-                attack_time = attack_frames * hop_length / sr
-                features['attack_time'] = float(attack_time)
+                # Spectral contrast (averaged over its bands per frame)
+                contrast = librosa.feature.spectral_contrast(S=S, sr=sr, freq=freqs).mean(axis=0)
                 
-                # Check for transient (fast attack)
-                features['has_transient'] = bool(attack_time < 0.05)
+                # Spectral flatness
+                flatness = librosa.feature.spectral_flatness(S=S)[0]
                 
-                # Check for sustain
-                if peak_idx < len(env_frames) - 1:
-                    late_energy = np.mean(env_frames[int(len(env_frames)*0.7):])
-                    early_energy = np.mean(env_frames[int(len(env_frames)*0.1):int(len(env_frames)*0.3)])
-                    is_sustained = late_energy > (0.5 * early_energy)
-                    features['is_sustained'] = bool(is_sustained)
+                # Spectral rolloff
+                rolloff = librosa.feature.spectral_rolloff(S=S, sr=sr, freq=freqs)[0]
                 
-                print(f"  Extracted envelope features")
-            else:
+                # Average all per-frame spectral features in one reduction
+                means = np.stack([centroid, bandwidth, contrast, flatness, rolloff]).mean(axis=1)
+                (features['avg_centroid'], features['avg_bandwidth'], features['avg_contrast'],
+                 features['avg_flatness'], features['avg_rolloff']) = means.tolist()
+                
+                log(f"  Extracted spectral features")
+            except Exception as e:
+                log(f"  Warning: Error extracting spectral features: {e}")
+            
+            # Rhythm features
+            try:
+                # Tempo estimation (onset envelope from the shared mel spectrogram)
+                onset_env = librosa.onset.onset_strength(S=log_mel, sr=sr)
+                if feature_set == 'full':
+                    tempo, _ = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr)
+                    features['tempo'] = float(np.atleast_1d(tempo)[0])
+                
+                # Onset rate
+                onset_frames = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr)
+                onset_rate = len(onset_frames) / analyzed_duration if analyzed_duration > 0 else 0
+                features['onset_rate'] = float(onset_rate)
+                
+                log(f"  Extracted rhythm features")
+            except Exception as e:
+                log(f"  Warning: Error extracting rhythm features: {e}")
+            
+            # MFCC features for timbre analysis
+            if feature_set == 'full':
+                try:
+                    mfccs = librosa.feature.mfcc(S=log_mel, n_mfcc=13)
+                    for i in range(min(5, mfccs.shape[0])):  # Just use first 5 MFCCs
+                        features[f'mfcc{i+1}'] = float(np.mean(mfccs[i]))
+                    
+                    log(f"  Extracted MFCC features")
+                except Exception as e:
+                    log(f"  Warning: Error extracting MFCC features: {e}")
+            
+            # Envelope analysis for ADSR
+            try:
+                # Calculate envelope
+                envelope = np.abs(y)
+                
+                # Smooth envelope: 30ms moving average (difference of a running sum) sampled every 10ms
+                frame_length = int(sr * 0.03)  # 30ms frames
+                hop_length = int(sr * 0.01)  # 10ms hop
+                running_sum = np.concatenate(([0.0], np.cumsum(envelope, dtype=np.float64)))
+                env_frames = (running_sum[frame_length::hop_length] - running_sum[:-frame_length:hop_length]) / frame_length
+                
+                # Find attack time (time to reach 80% of peak)
+                if len(env_frames) > 0:
+                    peak_idx = np.argmax(env_frames)
+                    threshold = 0.8 * env_frames[peak_idx]
+                    
+                    # Frames back from the peak (peak_idx down to 1) until the envelope drops below threshold
+                    below = np.flatnonzero(env_frames[peak_idx:0:-1] < threshold)
+                    attack_frames = int(below[0]) if below.size else 0
+                    
+                    attack_time = attack_frames * hop_length / sr
+                    features['attack_time'] = float(attack_time)
+                    
+                    # Check for transient (fast attack)
+                    features['has_transient'] = bool(attack_time < 0.05)
+                    
+                    # Check for sustain
+                    if peak_idx < len(env_frames) - 1:
+                        late_energy = np.mean(env_frames[int(len(env_frames)*0.7):])
+                        early_energy = np.mean(env_frames[int(len(env_frames)*0.1):int(len(env_frames)*0.3)])
+                        is_sustained = late_energy > (0.5 * early_energy)
+                        features['is_sustained'] = bool(is_sustained)
+                    
+                    log(f"  Extracted envelope features")
+                else:
+                    features['attack_time'] = 0
+                    features['has_transient'] = False
+                    features['is_sustained'] = False
+            except Exception as e:
+                log(f"  Warning: Error extracting envelope features: {e}")
                 features['attack_time'] = 0
                 features['has_transient'] = False
                 features['is_sustained'] = False
-        except Exception as e:
-            print(f"  Warning: Error extracting envelope features: {e}")
-            features['attack_time'] = 0
-            features['has_transient'] = False
-            features['is_sustained'] = False
-        
-        # Frequency band analysis
-        try:
-            # Get frequency bands
-            spec = np.abs(librosa.stft(y))
-            
-            # Define frequency bands
-            freqs = librosa.fft_frequencies(sr=sr)
-            
-            # Get indices for frequency bands
-            def get_band_indices(low, high, freqs):
-                return np.where((freqs >= low) & (freqs < high))[0]
             
-            sub_bass_idx = get_band_indices(20, 60, freqs)
-            bass_idx = get_band_indices(60, 250, freqs)
-            low_mid_idx = get_band_indices(250, 500, freqs)
-            mid_idx = get_band_indices(500, 2000, freqs)
-            upper_mid_idx = get_band_indices(2000, 4000, freqs)
-            high_idx = get_band_indices(4000, 20000, freqs)
+            # Frequency band analysis
+            try:
+                # Get frequency bands from the shared magnitude spectrogram
+                spec = S
+                
+                # Bands are contiguous runs of FFT bins: sum each band as a slice of the
+                # per-bin energy (spec is freq x time)
+                band_edges = band_bin_edges(sr, 2 * (spec.shape[0] - 1))
+                bin_energy = np.concatenate(([0.0], np.cumsum(spec.sum(axis=1))))
+                band_energies = bin_energy[band_edges[1:]] - bin_energy[band_edges[:-1]]
+                
+                # Calculate energy in each band
+                total_energy = bin_energy[-1]
+                
+                if total_energy > 0:
+                    sub_bass_energy, bass_energy, low_mid_energy, mid_energy, upper_mid_energy, high_energy = band_energies
+                    
+                    features['sub_bass_ratio'] = float(sub_bass_energy / total_energy)
+                    features['bass_ratio'] = float(bass_energy / total_energy)
+                    features['low_mid_ratio'] = float(low_mid_energy / total_energy)
+                    features['mid_ratio'] = float(mid_energy / total_energy)
+                    features['upper_mid_ratio'] = float(upper_mid_energy / total_energy)
+                    features['high_ratio'] = float(high_energy / total_energy)
+                    
+                    log(f"  Extracted frequency band features")
+                else:
+                    features['sub_bass_ratio'] = 0.0
+                    features['bass_ratio'] = 0.0 
+                    features['low_mid_ratio'] = 0.0
+                    features['mid_ratio'] = 0.0
+                    features['upper_mid_ratio'] = 0.0
+                    features['high_ratio'] = 0.0
+            except Exception as e:
+                log(f"  Warning: Error extracting frequency band features: {e}")
             
-            # Calculate energy in each band
-            total_energy = np.sum(spec)
+            # Zero crossing rate (noisiness/harshness)
+            try:
+                zcr = librosa.feature.zero_crossing_rate(y)[0]
+                features['avg_zcr'] = float(np.mean(zcr))
+                log(f"  Extracted ZCR features")
+            except Exception as e:
+                log(f"  Warning: Error extracting ZCR features: {e}")
             
-            if total_energy > 0:
-                sub_bass_energy = np.sum(spec[:, sub_bass_idx]) if len(sub_bass_idx) > 0 else 0
-                bass_energy = np.sum(spec[:, bass_idx]) if len(bass_idx) > 0 else 0
-                low_mid_energy = np.sum(spec[:, low_mid_idx]) if len(low_mid_idx) > 0 else 0
-                mid_energy = np.sum(spec[:, mid_idx]) if len(mid_idx) > 0 else 0
-                upper_mid_energy = np.sum(spec[:, upper_mid_idx]) if len(upper_mid_idx) > 0 else 0 
-                high_energy = np.sum(spec[:, high_idx]) if len(high_idx) > 0 else 0
+            # Additional features for mood classification
+            try:
+                # Harmonic to percussive ratio, approximated from spectral flatness (tonal
+                # spectra are peaky, noisy/percussive ones are flat) instead of running HPSS
+                if 'avg_flatness' in features:
+                    flatness = features['avg_flatness']
+                    # float32 flatness can round slightly above 1 (e.g. silence); keep the ratio non-negative
+                    features['harmonic_percussive_ratio'] = float(max(0.0, 1.0 - flatness) / (flatness + 1e-5))
+                else:
+                    features['harmonic_percussive_ratio'] = float(1.0)
                 
-                features['sub_bass_ratio'] = float(sub_bass_energy / total_energy)
-                features['bass_ratio'] = float(bass_energy / total_energy)
-                features['low_mid_ratio'] = float(low_mid_energy / total_energy)
-                features['mid_ratio'] = float(mid_energy / total_energy)
-                features['upper_mid_ratio'] = float(upper_mid_energy / total_energy)
-                features['high_ratio'] = float(high_energy / total_energy)
+                # Roughness approximation using spectral contrast
+                if 'avg_contrast' in features:
+                    features['roughness'] = float(1.0 - features['avg_contrast'])
                 
-                print(f"  Extracted frequency band features")
-            else:
-                features['sub_bass_ratio'] = 0.0
-                features['bass_ratio'] = 0.0 
-                features['low_mid_ratio'] = 0.0
-                features['mid_ratio'] = 0.0
-                features['upper_mid_ratio'] = 0.0
-                features['high_ratio'] = 0.0
-        except Exception as e:
-            print(f"  Warning: Error extracting frequency band features: {e}")
-        
-        # Zero crossing rate (noisiness/harshness)
-        try:
-            zcr = librosa.feature.zero_crossing_rate(y)[0]
-            features['avg_zcr'] = float(np.mean(zcr))
-            print(f"  Extracted ZCR features")
-        except Exception as e:
-            print(f"  Warning: Error extracting ZCR features: {e}")
-        
-        # Additional features for mood classification
-        try:
-            # Harmonic-percussive source separation for additional features
-            y_harmonic, y_percussive = librosa.effects.hpss(y)
+                log(f"  Extracted additional mood features")
+            except Exception as e:
+                log(f"  Warning: Error extracting additional mood features: {e}")
             
-            # Harmonic to percussive ratio
-            harmonic_energy = np.sum(y_harmonic**2)
-            percussive_energy = np.sum(y_percussive**2)
-            if percussive_energy > 0:
-                features['harmonic_percussive_ratio'] = float(harmonic_energy / percussive_energy)
-            else:
-                features['harmonic_percussive_ratio'] = float(1.0)
+            # Print summary of extracted features
+            log(f"  Successfully extracted {len(features)} features")
             
-            # Roughness approximation using spectral contrast
-            if 'avg_contrast' in features:
-                features['roughness'] = float(1.0 - features['avg_contrast'])
-            
-            print(f"  Extracted additional mood features")
-        except Exception as e:
-            print(f"  Warning: Error extracting additional mood features: {e}")
-        
-        # Print summary of extracted features
-        print(f"  Successfully extracted {len(features)} features")
+            return features
         
-        return features
-    
-    except Exception as e:
-        print(f"Error analyzing {file_path}: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
+        except _ExtractionFailed:
+            raise
+        except Exception as e:
+            log(f"Error analyzing {file_path}: {e}")
+            import traceback
+            log(traceback.format_exc().rstrip())
+            raise _ExtractionFailed from e
+    finally:
+        if log_lines:
+            sys.stdout.write("\n".join(log_lines) + "\n")
+
+def _keyword_pattern(words):
+    """Compile a keyword list into one regex matching any of the words as a substring"""
+    return re.compile('|'.join(map(re.escape, words)))
+
+# Filename keywords by (type, subtype), checked in priority order
+FILENAME_TYPE_PATTERNS = [
+    # Percussion
+    (('percussion', 'kick'), _keyword_pattern(['kick', 'bass drum', 'bd', '808'])),
+    (('percussion', 'snare'), _keyword_pattern(['snare', 'sd'])),
+    (('percussion', 'hi_hat_cymbal'), _keyword_pattern(['hat', 'hh', 'hi-hat', 'hihat', 'cymbal', 'crash', 'ride'])),
+    (('percussion', 'tom'), _keyword_pattern(['tom', 'floor', 'rack'])),
+    (('percussion', 'clap'), _keyword_pattern(['clap', 'handclap'])),
+    (('percussion', 'other_percussion'), _keyword_pattern(['perc', 'drum', 'percussion'])),
+    # Bass
+    (('bass', '808_bass'), _keyword_pattern(['808'])),
+    (('bass', 'other_bass'), _keyword_pattern(['bass', 'sub'])),
+    # Strings/Pads
+    (('pad', 'strings_pad'), _keyword_pattern(['pad', 'string', 'strings', 'ambient', 'atmo', 'atmosphere', 'chord'])),
+    # Leads/Synths
+    (('lead', 'synth_lead'), _keyword_pattern(['lead', 'synth', 'melody', 'arp', 'pluck'])),
+    # FX
+    (('fx', 'effect'), _keyword_pattern(['fx', 'effect', 'glitch', 'transition', 'riser', 'sweep', 'impact', 'whoosh'])),
+    # Vocals
+    (('vocal', 'vocal'), _keyword_pattern(['vocal', 'vox', 'voice'])),
+]
+
+# Mood hints from filename, first match wins
+FILENAME_MOOD_PATTERNS = [
+    ('aggressive', _keyword_pattern(['aggressive', 'hard', 'distort', 'heavy', 'intense', 'angry', 'rage', 'fierce', 'monster', 'beast'])),
+    ('chill', _keyword_pattern(['chill', 'calm', 'relax', 'ambient', 'smooth', 'gentle', 'soft', 'mellow'])),
+    ('dark', _keyword_pattern(['dark', 'horror', 'scary', 'creepy', 'spooky', 'gloomy', 'tension', 'evil', 'cinematic'])),
+    ('bright', _keyword_pattern(['bright', 'happy', 'upbeat', 'uplifting', 'joyful', 'cheerful', 'light', 'shine', 'vivid'])),
+    ('sad', _keyword_pattern(['sad', 'melancholic', 'emotional', 'moody', 'sorrow', 'blue', 'longing', 'nostalgic'])),
+    ('epic', _keyword_pattern(['epic', 'cinematic', 'dramatic', 'grand', 'powerful', 'massive', 'huge', 'impact'])),
+    ('funky', _keyword_pattern(['funk', 'funky', 'groovy', 'disco', 'retro', 'dance'])),
+    ('ethereal', _keyword_pattern(['ethereal', 'dreamy', 'floating', 'atmospheric', 'space', 'cosmic', 'heaven'])),
+]
+
+# Genre hints from filename, first match wins
+FILENAME_GENRE_PATTERNS = [
+    ('electronic', _keyword_pattern(['edm', 'electronic', 'techno', 'house', 'dance', 'trance', 'dubstep', 'glitch'])),
+    ('hiphop', _keyword_pattern(['hip', 'hop', 'trap', 'rap', 'gangsta', 'dirty', 'south'])),
+    ('pop', _keyword_pattern(['pop', 'commercial', 'radio', 'chart', 'hit'])),
+    ('rock', _keyword_pattern(['rock', 'band', 'guitar', 'grunge', 'metal', 'alternative'])),
+    ('jazz', _keyword_pattern(['jazz', 'blues', 'swing', 'brass'])),
+    ('cinematic', _keyword_pattern(['cinematic', 'score', 'soundtrack', 'film', 'movie', 'trailer', 'epic'])),
+]
 
 def classify_by_filename(file_path):
     """Classify audio sample based on filename"""
@@ -282,85 +462,21 @@ def classify_by_filename(file_path):
         'subtype': 'other'
     }
     
-    # Percussion
-    if any(word in filename for word in ['kick', 'bass drum', 'bd', '808']):
-        classification['type'] = 'percussion'
-        classification['subtype'] = 'kick'
-    elif any(word in filename for word in ['snare', 'sd']):
-        classification['type'] = 'percussion'
-        classification['subtype'] = 'snare'
-    elif any(word in filename for word in ['hat', 'hh', 'hi-hat', 'hihat', 'cymbal', 'crash', 'ride']):
-        classification['type'] = 'percussion'
-        classification['subtype'] = 'hi_hat_cymbal'
-    elif any(word in filename for word in ['tom', 'floor', 'rack']):
-        classification['type'] = 'percussion'
-        classification['subtype'] = 'tom'
-    elif any(word in filename for word in ['clap', 'handclap']):
-        classification['type'] = 'percussion'
-        classification['subtype'] = 'clap'
-    elif any(word in filename for word in ['perc', 'drum', 'percussion']):
-        classification['type'] = 'percussion'
-        classification['subtype'] = 'other_percussion'
-    
-    # Bass
-    elif any(word in filename for word in ['808']):
-        classification['type'] = 'bass'
-        classification['subtype'] = '808_bass'
-    elif any(word in filename for word in ['bass', 'sub']):
-        classification['type'] = 'bass'
-        classification['subtype'] = 'other_bass'
-    
-    # Strings/Pads
-    elif any(word in filename for word in ['pad', 'string', 'strings', 'ambient', 'atmo', 'atmosphere', 'chord']):
-        classification['type'] = 'pad'
-        classification['subtype'] = 'strings_pad'
-    
-    # Leads/Synths
-    elif any(word in filename for word in ['lead', 'synth', 'melody', 'arp', 'pluck']):
-        classification['type'] = 'lead'
-        classification['subtype'] = 'synth_lead'
-    
-    # FX
-    elif any(word in filename for word in ['fx', 'effect', 'glitch', 'transition', 'riser', 'sweep', 'impact', 'whoosh']):
-        classification['type'] = 'fx'
-        classification['subtype'] = 'effect'
-    
-    # Vocals
-    elif any(word in filename for word in ['vocal', 'vox', 'voice']):
-        classification['type'] = 'vocal'
-        classification['subtype'] = 'vocal'
-    
-    # Try to extract mood hints from filename
-    mood_words = {
-        'aggressive': ['aggressive', 'hard', 'distort', 'heavy', 'intense', 'angry', 'rage', 'fierce', 'monster', 'beast'],
-        'chill': ['chill', 'calm', 'relax', 'ambient', 'smooth', 'gentle', 'soft', 'mellow'],
-        'dark': ['dark', 'horror', 'scary', 'creepy', 'spooky', 'gloomy', 'tension', 'evil', 'cinematic'],
-        'bright': ['bright', 'happy', 'upbeat', 'uplifting', 'joyful', 'cheerful', 'light', 'shine', 'vivid'],
-        'sad': ['sad', 'melancholic', 'emotional', 'moody', 'sorrow', 'blue', 'longing', 'nostalgic'],
-        'epic': ['epic', 'cinematic', 'dramatic', 'grand', 'powerful', 'massive', 'huge', 'impact'],
-        'funky': ['funk', 'funky', 'groovy', 'disco', 'retro', 'dance'],
-        'ethereal': ['ethereal', 'dreamy', 'floating', 'atmospheric', 'space', 'cosmic', 'heaven']
-    }
-    
-    # Check for genre hints in filename
-    genre_words = {
-        'electronic': ['edm', 'electronic', 'techno', 'house', 'dance', 'trance', 'dubstep', 'glitch'],
-        'hiphop': ['hip', 'hop', 'trap', 'rap', 'gangsta', 'dirty', 'south'],
-        'pop': ['pop', 'commercial', 'radio', 'chart', 'hit'],
-        'rock': ['rock', 'band', 'guitar', 'grunge', 'metal', 'alternative'],
-        'jazz': ['jazz', 'blues', 'swing', 'brass'],
-        'cinematic': ['cinematic', 'score', 'soundtrack', 'film', 'movie', 'trailer', 'epic']
-    }
+    for (sample_type, subtype), pattern in FILENAME_TYPE_PATTERNS:
+        if pattern.search(filename):
+            classification['type'] = sample_type
+            classification['subtype'] = subtype
+            break
     
     # Extract mood hints
-    for mood, keywords in mood_words.items():
-        if any(word in filename for word in keywords):
+    for mood, pattern in FILENAME_MOOD_PATTERNS:
+        if pattern.search(filename):
             classification['mood_hint'] = mood
             break
     
     # Extract genre hints
-    for genre, keywords in genre_words.items():
-        if any(word in filename for word in keywords):
+    for genre, pattern in FILENAME_GENRE_PATTERNS:
+        if pattern.search(filename):
             classification['genre_hint'] = genre
             break
     
@@ -440,42 +556,59 @@ def classify_by_mood(features):
     
     mood = {}
     
+    # Unpack every feature once (None when it wasn't extracted)
+    get = features.get
+    energy_mean = get('energy_mean')
+    energy_dynamic_range = get('energy_dynamic_range')
+    attack_time = get('attack_time')
+    onset_rate = get('onset_rate')
+    avg_zcr = get('avg_zcr')
+    avg_centroid = get('avg_centroid')
+    avg_flatness = get('avg_flatness')
+    roughness = get('roughness')
+    is_sustained = get('is_sustained')
+    high_ratio = get('high_ratio')
+    upper_mid_ratio = get('upper_mid_ratio')
+    bass_ratio = get('bass_ratio')
+    sub_bass_ratio = get('sub_bass_ratio')
+    duration = get('duration', 0)
+    
     # ENERGY LEVEL (Aggressive vs Chill)
     # Base energy score on multiple factors
     energy_score = 0
     energy_count = 0
     
     # Energy mean (0-1)
-    if 'energy_mean' in features:
-        energy_score += features['energy_mean'] * 10  # Scale up for impact
+    if energy_mean is not None:
+        energy_score += energy_mean * 10  # Scale up for impact
         energy_count += 1
     
     # Dynamic range contributes to perceived energy
-    if 'energy_dynamic_range' in features:
-        energy_score += min(features['energy_dynamic_range'], 5)
+    if energy_dynamic_range is not None:
+        energy_score += min(energy_dynamic_range, 5)
         energy_count += 1
     
     # Attack time (fast attacks = more aggressive)
-    if 'attack_time' in features:
+    if attack_time is not None:
         # Inverse relationship: shorter attack = higher energy score
-        attack_factor = max(0, 1 - (features['attack_time'] * 20))  # Scale to make small differences matter
+        attack_factor = max(0, 1 - (attack_time * 20))  # Scale to make small differences matter
         energy_score += attack_factor * 3
         energy_count += 1
     
     # Onset rate (more onsets = more energetic)
-    if 'onset_rate' in features:
-        energy_score += min(features['onset_rate'], 5)
+    if onset_rate is not None:
+        energy_score += min(onset_rate, 5)
         energy_count += 1
     
     # Zero crossing rate (noisy = more aggressive)
-    if 'avg_zcr' in features:
-        energy_score += features['avg_zcr'] * 30  # Scale up for impact
+    if avg_zcr is not None:
+        energy_score += avg_zcr * 30  # Scale up for impact
         energy_count += 1
     
     # Spectral centroid (brightness contributes to perceived energy)
-    if 'avg_centroid' in features:
+    if avg_centroid is not None:
         # Normalize to 0-1 range (assuming 10kHz is very bright)
-        centroid_factor = min(features['avg_centroid'] / 10000, 1)
+        centroid_factor = min(avg_centroid / 10000, 1)
         energy_score += centroid_factor * 3
         energy_count += 1
     
@@ -487,14 +620,15 @@ def classify_by_mood(features):
     
     # Convert to qualitative descriptions
     if normalized_energy > 7.5:
-        mood['energy'] = 'aggressive'
+        energy = 'aggressive'
     elif normalized_energy > 5:
-        mood['energy'] = 'energetic'
+        energy = 'energetic'
     elif normalized_energy > 2.5:
-        mood['energy'] = 'moderate'
+        energy = 'moderate'
     else:
-        mood['energy'] = 'chill'
+        energy = 'chill'
     
+    mood['energy'] = energy
     # Store numerical value for reference
     mood['energy_value'] = round(normalized_energy, 2)
     
@@ -503,19 +637,19 @@ def classify_by_mood(features):
     brightness_count = 0
     
     # Spectral centroid is the primary indicator of brightness
-    if 'avg_centroid' in features:
+    if avg_centroid is not None:
         # Map centroid to 0-10 scale (0-10kHz range)
-        brightness_score += min(features['avg_centroid'] / 1000, 10)
+        brightness_score += min(avg_centroid / 1000, 10)
         brightness_count += 1
     
     # High frequency content contributes to brightness
-    if 'high_ratio' in features and 'upper_mid_ratio' in features:
-        brightness_score += (features['high_ratio'] + features['upper_mid_ratio']) * 10
+    if high_ratio is not None and upper_mid_ratio is not None:
+        brightness_score += (high_ratio + upper_mid_ratio) * 10
         brightness_count += 1
     
     # Low frequency content reduces brightness
-    if 'bass_ratio' in features and 'sub_bass_ratio' in features:
-        brightness_score -= (features['bass_ratio'] + features['sub_bass_ratio']) * 5
+    if bass_ratio is not None and sub_bass_ratio is not None:
+        brightness_score -= (bass_ratio + sub_bass_ratio) * 5
         brightness_count += 1
     
     # Normalize brightness score to 0-10
@@ -526,14 +660,15 @@ def classify_by_mood(features):
     
     # Convert to qualitative descriptions
     if normalized_brightness > 7.5:
-        mood['brightness'] = 'bright'
+        brightness = 'bright'
     elif normalized_brightness > 5:
-        mood['brightness'] = 'balanced'
+        brightness = 'balanced'
     elif normalized_brightness > 2.5:
-        mood['brightness'] = 'warm'
+        brightness = 'warm'
     else:
-        mood['brightness'] = 'dark'
+        brightness = 'dark'
     
+    mood['brightness'] = brightness
     # Store numerical value for reference
     mood['brightness_value'] = round(normalized_brightness, 2)
     
@@ -542,18 +677,18 @@ def classify_by_mood(features):
     texture_count = 0
     
     # Flatness is a key indicator (inverse relationship to roughness)
-    if 'avg_flatness' in features:
-        texture_score += (1 - features['avg_flatness']) * 5
+    if avg_flatness is not None:
+        texture_score += (1 - avg_flatness) * 5
         texture_count += 1
     
     # Zero crossing rate contributes to roughness
-    if 'avg_zcr' in features:
-        texture_score += features['avg_zcr'] * 20
+    if avg_zcr is not None:
+        texture_score += avg_zcr * 20
         texture_count += 1
     
     # Roughness directly relates to texture
-    if 'roughness' in features:
-        texture_score += features['roughness'] * 10
+    if roughness is not None:
+        texture_score += roughness * 10
         texture_count += 1
     
     # Normalize texture score to 0-10
@@ -564,14 +699,15 @@ def classify_by_mood(features):
     
     # Convert to qualitative descriptions
     if normalized_texture > 7.5:
-        mood['texture'] = 'rough'
+        texture = 'rough'
     elif normalized_texture > 5:
-        mood['texture'] = 'textured'
+        texture = 'textured'
     elif normalized_texture > 2.5:
-        mood['texture'] = 'balanced'
+        texture = 'balanced'
     else:
-        mood['texture'] = 'smooth'
+        texture = 'smooth'
     
+    mood['texture'] = texture
     # Store numerical value for reference
     mood['texture_value'] = round(normalized_texture, 2)
     
@@ -580,18 +716,18 @@ def classify_by_mood(features):
     weight_count = 0
     
     # Low frequency content contributes to heaviness
-    if 'bass_ratio' in features and 'sub_bass_ratio' in features:
-        weight_score += (features['bass_ratio'] + features['sub_bass_ratio'] * 2) * 10
+    if bass_ratio is not None and sub_bass_ratio is not None:
+        weight_score += (bass_ratio + sub_bass_ratio * 2) * 10
         weight_count += 1
     
     # High energy contributes to perceived weight
-    if 'energy_mean' in features:
-        weight_score += features['energy_mean'] * 5
+    if energy_mean is not None:
+        weight_score += energy_mean * 5
         weight_count += 1
     
     # Sustain contributes to weight
-    if 'is_sustained' in features:
-        if features['is_sustained']:
+    if is_sustained is not None:
+        if is_sustained:
             weight_score += 3
         weight_count += 1
     
@@ -603,14 +739,15 @@ def classify_by_mood(features):
     
     # Convert to qualitative descriptions
     if normalized_weight > 7.5:
-        mood['weight'] = 'heavy'
+        weight = 'heavy'
     elif normalized_weight > 5:
-        mood['weight'] = 'solid'
+        weight = 'solid'
     elif normalized_weight > 2.5:
-        mood['weight'] = 'balanced'
+        weight = 'balanced'
     else:
-        mood['weight'] = 'light'
+        weight = 'light'
     
+    mood['weight'] = weight
     # Store numerical value for reference
     mood['weight_value'] = round(normalized_weight, 2)
     
@@ -620,45 +757,45 @@ def classify_by_mood(features):
     mood_labels = []
     
     # Aggressive sound
-    if mood.get('energy') == 'aggressive' and mood.get('texture', '') in ['rough', 'textured']:
+    if energy == 'aggressive' and texture in ('rough', 'textured'):
         mood_labels.append('aggressive')
     
     # Chill sound
-    if mood.get('energy') in ['chill', 'moderate'] and mood.get('texture', '') in ['smooth', 'balanced']:
+    if energy in ('chill', 'moderate') and texture in ('smooth', 'balanced'):
         mood_labels.append('chill')
     
     # Dark sound
-    if mood.get('brightness') in ['dark', 'warm'] and normalized_brightness < 4:
+    if brightness in ('dark', 'warm') and normalized_brightness < 4:
         mood_labels.append('dark')
     
     # Bright sound
-    if mood.get('brightness') == 'bright' and normalized_brightness > 6:
+    if brightness == 'bright' and normalized_brightness > 6:
         mood_labels.append('bright')
     
     # Heavy sound
-    if mood.get('weight') == 'heavy' and normalized_weight > 7:
+    if weight == 'heavy' and normalized_weight > 7:
         mood_labels.append('heavy')
     
     # Ethereal sound
-    if (mood.get('energy') == 'chill' and 
-        mood.get('texture', '') in ['smooth', 'balanced'] and 
-        mood.get('brightness', '') in ['bright', 'balanced']):
+    if (energy == 'chill' and 
+        texture in ('smooth', 'balanced') and 
+        brightness in ('bright', 'balanced')):
         mood_labels.append('ethereal')
     
     # Epic sound
-    if (mood.get('energy', '') in ['energetic', 'aggressive'] and 
-        mood.get('weight', '') in ['heavy', 'solid'] and 
-        features.get('duration', 0) > 2.0):
+    if (energy in ('energetic', 'aggressive') and 
+        weight in ('heavy', 'solid') and 
+        duration > 2.0):
         mood_labels.append('epic')
     
     # Sad sound
-    if (mood.get('energy') == 'chill' and 
-        mood.get('brightness', '') in ['dark', 'warm'] and
+    if (energy == 'chill' and 
+        brightness in ('dark', 'warm') and
         normalized_brightness < 3.5):
         mood_labels.append('sad')
     
     # Tense sound
-    if 'avg_zcr' in features and features['avg_zcr'] > 0.2 and mood.get('brightness') in ['dark', 'warm']:
+    if avg_zcr is not None and avg_zcr > 0.2 and brightness in ('dark', 'warm'):
         mood_labels.append('tense')
     
     # If we have no mood labels yet, create a fallback
@@ -678,6 +815,237 @@ def classify_by_mood(features):
     
     return mood
 
+# Fixed column order of the feature matrix used by the batch classifiers
+FEATURE_NAMES = [
+    'duration', 'sample_rate',
+    'energy_mean', 'energy_std', 'energy_max', 'energy_dynamic_range',
+    'avg_centroid', 'avg_bandwidth', 'avg_contrast', 'avg_flatness', 'avg_rolloff',
+    'tempo', 'onset_rate',
+    'mfcc1', 'mfcc2', 'mfcc3', 'mfcc4', 'mfcc5',
+    'attack_time', 'has_transient', 'is_sustained',
+    'sub_bass_ratio', 'bass_ratio', 'low_mid_ratio', 'mid_ratio', 'upper_mid_ratio', 'high_ratio',
+    'avg_zcr', 'harmonic_percussive_ratio', 'roughness'
+]
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_NAMES)}
+
+def features_to_matrix(all_features):
+    """Stack per-file feature dicts into an (n_files, len(FEATURE_NAMES)) matrix
+    
+    Missing features (and files whose extraction failed) are NaN; booleans become 0/1.
+    """
+    X = np.full((len(all_features), len(FEATURE_NAMES)), np.nan)
+    for row, features in zip(X, all_features):
+        if features:
+            for name, value in features.items():
+                col = FEATURE_INDEX.get(name)
+                if col is not None and value is not None:
+                    row[col] = value
+    return X
+
+# Feature matrix columns read by the compiled mood kernel (globals are constants to numba)
+(_DURATION, _ENERGY_MEAN, _DYNAMIC_RANGE, _ATTACK_TIME, _ONSET_RATE, _ZCR, _CENTROID, _FLATNESS,
+ _ROUGHNESS, _SUSTAINED, _HIGH, _UPPER_MID, _BASS, _SUB_BASS) = (
+    FEATURE_INDEX[name] for name in (
+        'duration', 'energy_mean', 'energy_dynamic_range', 'attack_time', 'onset_rate', 'avg_zcr',
+        'avg_centroid', 'avg_flatness', 'roughness', 'is_sustained', 'high_ratio', 'upper_mid_ratio',
+        'bass_ratio', 'sub_bass_ratio'))
+
+@njit(cache=True)
+def _mood_scores(X):
+    """Energy, brightness, texture and weight scores (0-10) and their levels (0-3) per row
+    
+    Same arithmetic as classify_by_mood: each term only counts toward its score's
+    average when the features it uses are present (not NaN); empty scores are 5.
+    """
+    n = X.shape[0]
+    scores = np.empty((n, 4))
+    levels = np.empty((n, 4), dtype=np.int8)
+    for i in range(n):
+        row = X[i]
+        
+        # ENERGY
+        total = 0.0
+        count = 0
+        if not np.isnan(row[_ENERGY_MEAN]):
+            total += row[_ENERGY_MEAN] * 10
+            count += 1
+        if not np.isnan(row[_DYNAMIC_RANGE]):
+            total += min(row[_DYNAMIC_RANGE], 5.0)
+            count += 1
+        if not np.isnan(row[_ATTACK_TIME]):
+            total += max(0.0, 1 - row[_ATTACK_TIME] * 20) * 3
+            count += 1
+        if not np.isnan(row[_ONSET_RATE]):
+            total += min(row[_ONSET_RATE], 5.0)
+            count += 1
+        if not np.isnan(row[_ZCR]):
+            total += row[_ZCR] * 30
+            count += 1
+        if not np.isnan(row[_CENTROID]):
+            total += min(row[_CENTROID] / 10000, 1.0) * 3
+            count += 1
+        scores[i, 0] = min(total / count, 10.0) if count > 0 else 5.0
+        
+        # BRIGHTNESS
+        total = 0.0
+        count = 0
+        if not np.isnan(row[_CENTROID]):
+            total += min(row[_CENTROID] / 1000, 10.0)
+            count += 1
+        if not (np.isnan(row[_HIGH]) or np.isnan(row[_UPPER_MID])):
+            total += (row[_HIGH] + row[_UPPER_MID]) * 10
+            count += 1
+        if not (np.isnan(row[_BASS]) or np.isnan(row[_SUB_BASS])):
+            total -= (row[_BASS] + row[_SUB_BASS]) * 5
+            count += 1
+        scores[i, 1] = max(min(total / count, 10.0), 0.0) if count > 0 else 5.0
+        
+        # TEXTURE
+        total = 0.0
+        count = 0
+        if not np.isnan(row[_FLATNESS]):
+            total += (1 - row[_FLATNESS]) * 5
+            count += 1
+        if not np.isnan(row[_ZCR]):
+            total += row[_ZCR] * 20
+            count += 1
+        if not np.isnan(row[_ROUGHNESS]):
+            total += row[_ROUGHNESS] * 10
+            count += 1
+        scores[i, 2] = min(total / count, 10.0) if count > 0 else 5.0
+        
+        # WEIGHT
+        total = 0.0
+        count = 0
+        if not (np.isnan(row[_BASS]) or np.isnan(row[_SUB_BASS])):
+            total += (row[_BASS] + row[_SUB_BASS] * 2) * 10
+            count += 1
+        if not np.isnan(row[_ENERGY_MEAN]):
+            total += row[_ENERGY_MEAN] * 5
+            count += 1
+        if not np.isnan(row[_SUSTAINED]):
+            if row[_SUSTAINED] != 0:
+                total += 3
+            count += 1
+        scores[i, 3] = min(total / count, 10.0) if count > 0 else 5.0
+        
+        # Levels: <=2.5, <=5, <=7.5, >7.5
+        for j in range(4):
+            levels[i, j] = (scores[i, j] > 2.5) + (scores[i, j] > 5) + (scores[i, j] > 7.5)
+    
+    return scores, levels
+
+# Qualitative levels for the 0-10 mood scores, indexed by _mood_scores levels
+MOOD_SCORE_NAMES = ('energy', 'brightness', 'texture', 'weight')
+MOOD_LEVELS = {
+    'energy': np.array(['chill', 'moderate', 'energetic', 'aggressive'], dtype=object),
+    'brightness': np.array(['dark', 'warm', 'balanced', 'bright'], dtype=object),
+    'texture': np.array(['smooth', 'balanced', 'textured', 'rough'], dtype=object),
+    'weight': np.array(['light', 'balanced', 'solid', 'heavy'], dtype=object),
+}
+
+def classify_by_mood_batch(X):
+    """Vectorized classify_by_mood over a feature matrix from features_to_matrix
+    
+    Returns one mood dict per row, identical to classify_by_mood on that file.
+    """
+    duration = X[:, _DURATION]
+    avg_zcr = X[:, _ZCR]
+    
+    # Scores and levels from the compiled kernel, one column per MOOD_SCORE_NAMES entry
+    score_matrix, level_matrix = _mood_scores(np.ascontiguousarray(X, dtype=np.float64))
+    energy, brightness, weight = score_matrix[:, 0], score_matrix[:, 1], score_matrix[:, 3]
+    e, b, t, w = level_matrix.T
+    labels = {name: MOOD_LEVELS[name][level_matrix[:, j]] for j, name in enumerate(MOOD_SCORE_NAMES)}
+    
+    # Overall mood rules, one boolean column per label in output order
+    rules = [
+        ('aggressive', (e == 3) & (t >= 2)),
+        ('chill', (e <= 1) & (t <= 1)),
+        ('dark', (b <= 1) & (brightness < 4)),
+        ('bright', (b == 3) & (brightness > 6)),
+        ('heavy', (w == 3) & (weight > 7)),
+        ('ethereal', (e == 0) & (t <= 1) & (b >= 2)),
+        ('epic', (e >= 2) & (w >= 2) & (duration > 2.0)),
+        ('sad', (e == 0) & (b <= 1) & (brightness < 3.5)),
+        ('tense', (avg_zcr > 0.2) & (b <= 1)),
+    ]
+    fallback = np.where(energy > 5,
+                        np.where(brightness > 5, 'vibrant', 'intense'),
+                        np.where(brightness > 5, 'airy', 'reserved'))
+    
+    results = []
+    for i in range(X.shape[0]):
+        # Files without features get no mood classification
+        if np.isnan(duration[i]):
+            results.append({})
+            continue
+        
+        mood = {}
+        for j, name in enumerate(MOOD_SCORE_NAMES):
+            mood[name] = labels[name][i]
+            mood[f'{name}_value'] = round(float(score_matrix[i, j]), 2)
+        mood['overall_mood'] = [label for label, matched in rules if matched[i]] or [str(fallback[i])]
+        results.append(mood)
+    
+    return results
+
+# (type, subtype) per traditional rule, in priority order; the last entry is the default
+TRADITIONAL_CLASSES = [
+    ('percussion', 'kick'),
+    ('percussion', 'snare'),
+    ('percussion', 'hi_hat_cymbal'),
+    ('percussion', 'other_percussion'),
+    ('bass', '808_bass'),
+    ('bass', 'other_bass'),
+    ('pad', 'strings_pad'),
+    ('lead', 'synth_lead'),
+    ('fx', 'effect'),
+    ('other', 'other'),
+]
+
+def classify_by_traditional_batch(X):
+    """Vectorized classify_by_traditional_categories over a feature matrix
+    
+    Returns one {'type', 'subtype'} dict per row, identical to the per-file rules.
+    """
+    col = lambda name: X[:, FEATURE_INDEX[name]]
+    # Features with a default when missing, as in the per-file .get() calls
+    col_or = lambda name, default: np.nan_to_num(col(name), nan=default)
+    
+    duration = col('duration')
+    centroid = col('avg_centroid')
+    bass = col('bass_ratio')
+    mid = col('mid_ratio')
+    high = col('high_ratio')
+    is_sustained = col_or('is_sustained', 0) == 1
+    
+    sufficient = ~np.isnan(duration)
+    for name in ('avg_centroid', 'energy_mean', 'bass_ratio', 'mid_ratio', 'high_ratio'):
+        sufficient &= ~np.isnan(col(name))
+    
+    percussion = sufficient & (col_or('has_transient', 0) == 1) & (col('onset_rate') > 1.0)
+    is_bass = sufficient & ~percussion & (bass > 0.5) & (centroid < 500)
+    rest = sufficient & ~percussion & ~is_bass
+    pad = rest & is_sustained & (duration > 1.5) & (col_or('avg_zcr', 1.0) < 0.2)
+    lead = rest & ~pad & (mid > 0.4) & (col('upper_mid_ratio') > 0.2)
+    fx = (rest & ~pad & ~lead &
+          ((col_or('avg_flatness', 0) > 0.3) | (col_or('avg_zcr', 0) > 0.3) | (high > 0.5)))
+    
+    class_index = np.select([
+        percussion & (bass > 0.4) & (centroid < 500),
+        percussion & (mid > 0.4) & (col_or('attack_time', 1.0) < 0.05),
+        percussion & (high > 0.4) & (centroid > 5000),
+        percussion,
+        is_bass & is_sustained & (duration > 0.8),
+        is_bass,
+        pad,
+        lead,
+        fx,
+    ], range(len(TRADITIONAL_CLASSES) - 1), default=len(TRADITIONAL_CLASSES) - 1)
+    
+    return [{'type': TRADITIONAL_CLASSES[i][0], 'subtype': TRADITIONAL_CLASSES[i][1]} for i in class_index]
+
 def classify_by_production_use(features):
     """Classify by how the sound would be used in production"""
     if features is None or 'duration' not in features:
@@ -717,12 +1085,48 @@ def classify_by_production_use(features):
     
     return production_use
 
+def required_feature_set(file_path, classification_types):
+    """Pick the extract_audio_features feature_set a file needs
+    
+    When the filename already gives a type, traditional classification can't change
+    it: mood classification then only needs the 'mood' subset, and without mood or
+    production use classification only the duration is read.
+    """
+    if 'production_use' in classification_types or classify_by_filename(file_path)['type'] == 'other':
+        return 'full'
+    return 'mood' if 'mood' in classification_types else 'duration'
+
 def analyze_and_classify_sample(file_path, classification_types=['traditional', 'mood']):
     """Analyze and classify an audio sample using multiple approaches"""
     print(f"Processing: {os.path.basename(file_path)}")
     
-    # Extract audio features
-    features = extract_audio_features(file_path)
+    # Extract audio features (only those the classification still needs)
+    features = extract_audio_features(file_path, feature_set=required_feature_set(file_path, classification_types))
+    
+    return classify_sample(file_path, features, classification_types)
+
+# Flattened classification keys ("<class type>_<key>"), formatted and interned once per pair
+_FLAT_KEYS = {}
+
+def flat_key(class_type, key):
+    """Key under which all_classifications[class_type][key] is copied into the flat classification"""
+    try:
+        return _FLAT_KEYS[class_type, key]
+    except KeyError:
+        name = _FLAT_KEYS[class_type, key] = sys.intern(f"{class_type}_{key}")
+        return name
+
+# Duration categories: a sample falls in the first bin whose upper edge (seconds) it is below
+DURATION_EDGES = (0.15, 0.5, 2.0, 8.0)
+DURATION_LABELS = ('very_short', 'short', 'medium', 'long', 'very_long')
+
+def classify_sample(file_path, features, classification_types=['traditional', 'mood'], precomputed=None):
+    """Classify an audio sample from its extracted features
+    
+    precomputed maps a classification type to a result already computed for this
+    file (e.g. by the batch classifiers); other types are classified here.
+    """
+    precomputed = precomputed or {}
     
     # Initialize complete classification dictionary
     all_classifications = {}
@@ -752,7 +1156,7 @@ def analyze_and_classify_sample(file_path, classification_types=['traditional',
     # Apply all requested classification types
     for class_type in classification_types:
         if class_type == 'traditional' and features is not None:
-            trad_classification = classify_by_traditional_categories(features)
+            trad_classification = precomputed['traditional'] if 'traditional' in precomputed else classify_by_traditional_categories(features)
             if trad_classification['type'] != 'other' and classification['type'] == 'other':
                 classification['type'] = trad_classification['type']
                 classification['subtype'] = trad_classification['subtype']
@@ -760,7 +1164,7 @@ def analyze_and_classify_sample(file_path, classification_types=['traditional',
             all_classifications['traditional'] = trad_classification
         
         if class_type == 'mood' and features is not None:
-            mood_classification = classify_by_mood(features)
+            mood_classification = precomputed['mood'] if 'mood' in precomputed else classify_by_mood(features)
             if mood_classification:  # Only add if non-empty
                 all_classifications['mood'] = mood_classification
         
@@ -771,16 +1175,7 @@ def analyze_and_classify_sample(file_path, classification_types=['traditional',
     
     # Add duration classification
     if features is not None and features.get('duration', 0) > 0:
-        if features['duration'] < 0.15:
-            classification['duration'] = 'very_short'
-        elif features['duration'] < 0.5:
-            classification['duration'] = 'short'
-        elif features['duration'] < 2.0:
-            classification['duration'] = 'medium'
-        elif features['duration'] < 8.0:
-            classification['duration'] = 'long'
-        else:
-            classification['duration'] = 'very_long'
+        classification['duration'] = DURATION_LABELS[bisect.bisect_right(DURATION_EDGES, features['duration'])]
         
         # Add flattened classifications for easier access
         for class_type, class_dict in all_classifications.items():
@@ -789,53 +1184,212 @@ def analyze_and_classify_sample(file_path, classification_types=['traditional',
                 if key == 'overall_mood' and isinstance(value, list):
                     # Add each mood as a separate key for easier searching
                     for i, mood in enumerate(value):
-                        classification[f"mood_{i+1}"] = mood
+                        classification[flat_key('mood', i + 1)] = mood
                     # Keep the original list for reference
-                    classification[f"{class_type}_{key}"] = value
+                    classification[flat_key(class_type, key)] = value
                 elif key != 'type' and key != 'subtype':  # Avoid overwriting primary type/subtype
-                    classification[f"{class_type}_{key}"] = value
+                    classification[flat_key(class_type, key)] = value
     else:
         classification['duration'] = 'unknown'
     
-    # Print results
-    print(f"\nClassification results for: {os.path.basename(file_path)}")
-    print(f"  Primary classification method: {method}")
-    print(f"  Type: {classification['type']}")
-    print(f"  Subtype: {classification['subtype']}")
-    print(f"  Duration: {classification['duration']}")
+    # Print results (collected and written at once)
+    log_lines = []
+    log = log_lines.append
+    log(f"\nClassification results for: {os.path.basename(file_path)}")
+    log(f"  Primary classification method: {method}")
+    log(f"  Type: {classification['type']}")
+    log(f"  Subtype: {classification['subtype']}")
+    log(f"  Duration: {classification['duration']}")
     
     # Print mood classification if available
     if 'mood' in all_classifications:
-        print("\n  Mood Classification:")
+        log("\n  Mood Classification:")
         if 'overall_mood' in all_classifications['mood']:
-            print(f"    Overall mood: {', '.join(all_classifications['mood']['overall_mood'])}")
+            log(f"    Overall mood: {', '.join(all_classifications['mood']['overall_mood'])}")
         for key, value in all_classifications['mood'].items():
             if key != 'overall_mood' and not key.endswith('_value'):
-                print(f"    {key}: {value}")
+                log(f"    {key}: {value}")
     
     # Print other classifications if available
     for class_type in [t for t in classification_types if t not in ['traditional', 'mood']]:
         if class_type in all_classifications and all_classifications[class_type]:
-            print(f"\n  {class_type.capitalize().replace('_', ' ')} Classification:")
+            log(f"\n  {class_type.capitalize().replace('_', ' ')} Classification:")
             for key, value in all_classifications[class_type].items():
-                print(f"    {key}: {value}")
+                log(f"    {key}: {value}")
     
     # Print extracted features (just a few key ones)
     if features is not None and features.get('duration', 0) > 0:
-        print("\n  Key Audio Features:")
+        log("\n  Key Audio Features:")
         # Print just a few key features
         key_features = ['duration', 'energy_mean', 'avg_centroid', 'avg_flatness', 'tempo', 'onset_rate']
         for feature in key_features:
             if feature in features:
                 if isinstance(features[feature], float):
-                    print(f"    {feature}: {features[feature]:.4f}")
+                    log(f"    {feature}: {features[feature]:.4f}")
                 else:
-                    print(f"    {feature}: {features[feature]}")
+                    log(f"    {feature}: {features[feature]}")
+    
+    sys.stdout.write("\n".join(log_lines) + "\n")
     
     return classification, features, all_classifications
 
+def _init_worker():
+    """Limit each worker to one BLAS/OpenMP/FFT thread so the pool doesn't oversubscribe the cores"""
+    global FFT_WORKERS
+    # The BLAS/OpenMP libraries are already loaded by now (environment variables
+    # would come too late), so limit their thread pools directly
+    threadpool_limits(1)
+    FFT_WORKERS = 1
+    warnings.filterwarnings('ignore')
+
+def _classify_batch(file_paths, all_features, classification_types):
+    """Classify one batch of extracted features over a (files x features) matrix"""
+    X = features_to_matrix(all_features)
+    batch_results = {}
+    if 'traditional' in classification_types:
+        batch_results['traditional'] = classify_by_traditional_batch(X)
+    if 'mood' in classification_types:
+        batch_results['mood'] = classify_by_mood_batch(X)
+    
+    results = []
+    for i, (file_path, features) in enumerate(zip(file_paths, all_features)):
+        precomputed = {class_type: batch[i] for class_type, batch in batch_results.items()}
+        results.append(classify_sample(file_path, features, classification_types, precomputed))
+    return results
+
+def iter_analyzed_samples(audio_files, classification_types=['traditional', 'mood'], max_workers=None, batch_size=256):
+    """Analyze and classify audio files, yielding results as each batch completes
+    
+    Features are extracted in parallel, one file per worker process; traditional and
+    mood classification then run once per batch of batch_size files as a feature
+    matrix. Yields (file_path, (classification, features, all_classifications)) in
+    the same order as audio_files. The next batch is queued on the pool before the
+    current one is handed to the caller, so the workers keep extracting while the
+    caller handles (copies, reports) a batch, and at most two batches of files are
+    in flight however large the library is.
+    """
+    feature_sets = [required_feature_set(file_path, classification_types) for file_path in audio_files]
+    max_analysis_seconds = [10.0] * len(audio_files)
+    
+    # A single file isn't worth the cost of starting a pool
+    executor = None
+    if len(audio_files) > 1:
+        executor = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=_init_worker)
+    
+    def queue_batch(start):
+        """Start extracting the batch at start; returns its features in order as they complete"""
+        stop = start + batch_size
+        if executor:
+            return executor.map(extract_audio_features, audio_files[start:stop], max_analysis_seconds[start:stop],
+                                feature_sets[start:stop], chunksize=4)
+        return map(extract_audio_features, audio_files[start:stop], max_analysis_seconds[start:stop],
+                   feature_sets[start:stop])
+    
+    try:
+        queued = queue_batch(0)
+        for start in range(0, len(audio_files), batch_size):
+            batch_files = audio_files[start:start + batch_size]
+            current = queued
+            
+            # Queue the next batch before waiting on this one, so the workers don't run dry
+            if start + batch_size < len(audio_files):
+                queued = queue_batch(start + batch_size)
+            
+            batch_features = list(current)
+            
+            yield from zip(batch_files, _classify_batch(batch_files, batch_features, classification_types))
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+def analyze_samples(audio_files, classification_types=['traditional', 'mood'], max_workers=None):
+    """Analyze and classify audio files
+    
+    Returns a list of (classification, features, all_classifications) tuples in the
+    same order as audio_files (see iter_analyzed_samples).
+    """
+    return [result for _, result in iter_analyzed_samples(audio_files, classification_types, max_workers)]
+
+def _format_report_entry(filename, classification, all_classifications):
+    """Format one file's section of the text classification report"""
+    lines = [f"File: {filename}", "Primary Classification:"]
+    lines.extend(f"  {category}: {value}" for category, value in classification.items())
+    
+    lines.extend(["", "Detailed Classifications:"])
+    for class_type, class_dict in all_classifications.items():
+        lines.append(f"  {class_type.capitalize()}:")
+        for key, value in class_dict.items():
+            if isinstance(value, list):
+                lines.append(f"    {key}: {', '.join(str(v) for v in value)}")
+            else:
+                lines.append(f"    {key}: {value}")
+    lines.extend(["", "="*50, "", ""])
+    return "\n".join(lines)
+
+def make_dest_resolver(organize_by, output_dir):
+    """Return a function mapping (classification, all_classifications) to a destination folder
+    
+    organize_by is parsed here once so the per-file call is just the lookups.
+    """
+    # Mood organization: mood_<index>, or by overall_mood if no index is given
+    if organize_by.startswith('mood_'):
+        try:
+            mood_key = f"mood_{int(organize_by.split('_')[1])}"
+        except (ValueError, IndexError):
+            mood_key = None
+        
+        if mood_key is not None:
+            def resolve(classification, all_classifications):
+                if mood_key in classification:
+                    return os.path.join(output_dir, "mood", classification[mood_key])
+                return os.path.join(output_dir, "mood", "uncategorized")
+        else:
+            def resolve(classification, all_classifications):
+                if 'mood' in all_classifications and 'overall_mood' in all_classifications['mood']:
+                    if all_classifications['mood']['overall_mood']:
+                        # Use the first mood in the list
+                        return os.path.join(output_dir, "mood", all_classifications['mood']['overall_mood'][0])
+                    return os.path.join(output_dir, "mood", "uncategorized")
+                return os.path.join(output_dir, classification['type'])
+        return resolve
+    
+    # organize_by contains an underscore (e.g., 'mood_energy'): <classification type>_<attribute>
+    if '_' in organize_by:
+        class_type, attribute = organize_by.split('_', 1)
+        
+        def resolve(classification, all_classifications):
+            if class_type in all_classifications and attribute in all_classifications[class_type]:
+                # Get the category from the specified classification type
+                return os.path.join(output_dir, attribute, str(all_classifications[class_type][attribute]))
+            if organize_by in classification:
+                # Direct match to a flattened classification key
+                return os.path.join(output_dir, organize_by, str(classification[organize_by]))
+            # Fallback to type
+            return os.path.join(output_dir, classification['type'])
+        return resolve
+    
+    # Traditional organization methods
+    def resolve(classification, all_classifications):
+        if organize_by in classification:
+            main_category = classification[organize_by]
+            # If organizing by type and subtype is available, use it for further organization
+            if organize_by == 'type' and 'subtype' in classification:
+                return os.path.join(output_dir, main_category, classification['subtype'])
+            return os.path.join(output_dir, main_category)
+        # Fallback to type
+        return os.path.join(output_dir, classification['type'])
+    return resolve
+
+# Threads copying/moving organized files; a handful keeps an SSD busy, use 1 on spinning disks
+COPY_WORKERS = 4
+
 def organize_samples(input_dir, output_dir, classification_types=['traditional', 'mood'], organize_by='type', copy_mode='copy'):
-    """Organize samples into folders based on analysis"""
+    """Organize samples into folders based on analysis
+    
+    The text, JSON and CSV reports are written as each file is classified, so
+    memory stays flat for large libraries and an interrupted run keeps the reports
+    for every file already organized. Returns each file's primary classification.
+    """
     audio_files = list_audio_files(input_dir)
     
     if not audio_files:
@@ -847,165 +1401,93 @@ def organize_samples(input_dir, output_dir, classification_types=['traditional',
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
     
-    # Keep track of classifications and features
-    all_data = {}
+    # Keep track of classifications (features are only streamed to the reports)
+    all_classifications_by_file = {}
     
-    # Analyze and categorize each file
-    for file_path in audio_files:
-        # Analyze and classify the sample
-        classification, features, all_classifications = analyze_and_classify_sample(file_path, classification_types)
-        
-        # Store results
-        filename = os.path.basename(file_path)
-        all_data[filename] = {
-            'classification': classification,
-            'features': features,
-            'all_classifications': all_classifications
-        }
+    report_path = os.path.join(output_dir, "sample_classification_report.txt")
+    json_report_path = os.path.join(output_dir, "sample_classification_data.json")
+    feature_report_path = os.path.join(output_dir, "sample_features.csv")
+    
+    # Sort feature names for consistent ordering
+    feature_names = sorted(FEATURE_NAMES)
+    
+    # Organization method is parsed once, not per file
+    resolve_dest = make_dest_resolver(organize_by, output_dir)
+    created_folders = set()
+    
+    # Copies/moves run on a few I/O threads while the next files are classified
+    copy_futures = []
+    
+    with open(report_path, 'w') as report_file, \
+         open(json_report_path, 'w') as json_file, \
+         open(feature_report_path, 'w', newline='') as csv_file, \
+         ThreadPoolExecutor(max_workers=COPY_WORKERS) as io_pool:
+        # Classification report header
+        report_file.write("Sample Classification Report\n")
+        report_file.write("=========================\n\n")
+        report_file.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        report_file.write(f"Classification types used: {', '.join(classification_types)}\n\n")
         
-        # Determine destination folder based on organization method
-        dest_folder = output_dir
+        # JSON report (for local LLM access): one object keyed by filename, written entry by entry
+        json_file.write("{")
+        json_separator = "\n"
         
-        # Handle mood organization specially
-        if organize_by.startswith('mood_'):
-            try:
-                mood_index = int(organize_by.split('_')[1])
-                if f"mood_{mood_index}" in classification:
-                    mood_category = classification[f"mood_{mood_index}"]
-                    dest_folder = os.path.join(output_dir, "mood", mood_category)
-                else:
-                    dest_folder = os.path.join(output_dir, "mood", "uncategorized")
-            except (ValueError, IndexError):
-                # Handle mood organization by overall_mood
-                if 'mood' in all_classifications and 'overall_mood' in all_classifications['mood']:
-                    if all_classifications['mood']['overall_mood']:
-                        # Use the first mood in the list
-                        mood_category = all_classifications['mood']['overall_mood'][0]
-                        dest_folder = os.path.join(output_dir, "mood", mood_category)
-                    else:
-                        dest_folder = os.path.join(output_dir, "mood", "uncategorized")
-                else:
-                    dest_folder = os.path.join(output_dir, classification['type'])
-        # Check if the organize_by contains an underscore (e.g., 'mood_energy')
-        elif '_' in organize_by:
-            class_type, attribute = organize_by.split('_', 1)
-            if (class_type in all_classifications and 
-                attribute in all_classifications[class_type]):
-                # Get the category from the specified classification type
-                category = all_classifications[class_type][attribute]
-                dest_folder = os.path.join(output_dir, attribute, str(category))
-            elif organize_by in classification:
-                # Direct match to a flattened classification key
-                dest_folder = os.path.join(output_dir, organize_by, str(classification[organize_by]))
-            else:
-                # Fallback to type
-                dest_folder = os.path.join(output_dir, classification['type'])
-        else:
-            # Traditional organization methods
-            if organize_by in classification:
-                main_category = classification[organize_by]
-                
-                # If organizing by type and subtype is available, use it for further organization
-                if organize_by == 'type' and 'subtype' in classification:
-                    dest_folder = os.path.join(output_dir, main_category, classification['subtype'])
-                else:
-                    dest_folder = os.path.join(output_dir, main_category)
-            else:
-                # Fallback to type
-                dest_folder = os.path.join(output_dir, classification['type'])
+        # CSV feature report header (features a file lacks are left blank)
+        writer = csv.DictWriter(csv_file, fieldnames=['Filename'] + feature_names, restval="", extrasaction='ignore')
+        writer.writeheader()
         
-        # Create the destination folder if it doesn't exist
-        os.makedirs(dest_folder, exist_ok=True)
+        # Analyze files in parallel batches, then categorize each one
+        for file_path, (classification, features, all_classifications) in iter_analyzed_samples(audio_files, classification_types):
+            filename = os.path.basename(file_path)
+            all_classifications_by_file[filename] = classification
+            
+            # Determine destination folder based on organization method
+            dest_folder = resolve_dest(classification, all_classifications)
         
-        # Copy or move the file to the destination
-        dest_file = os.path.join(dest_folder, filename)
-        if copy_mode == 'copy':
-            shutil.copy2(file_path, dest_file)
-            print(f"  Copied to: {dest_folder}")
-        else:  # move mode
-            shutil.move(file_path, dest_file)
-            print(f"  Moved to: {dest_folder}")
-    
-    # Generate classification report
-    report_path = os.path.join(output_dir, "sample_classification_report.txt")
-    with open(report_path, 'w') as f:
-        f.write("Sample Classification Report\n")
-        f.write("=========================\n\n")
-        f.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"Classification types used: {', '.join(classification_types)}\n\n")
+            # Create the destination folder if it doesn't exist (once per folder)
+            if dest_folder not in created_folders:
+                os.makedirs(dest_folder, exist_ok=True)
+                created_folders.add(dest_folder)
         
-        for filename, data in all_data.items():
-            f.write(f"File: {filename}\n")
-            f.write("Primary Classification:\n")
-            for category, value in data['classification'].items():
-                f.write(f"  {category}: {value}\n")
+            # Copy or move the file to the destination
+            dest_file = os.path.join(dest_folder, filename)
+            if copy_mode == 'copy':
+                copy_futures.append(io_pool.submit(shutil.copy2, file_path, dest_file))
+                print(f"  Copied to: {dest_folder}")
+            else:  # move mode
+                copy_futures.append(io_pool.submit(shutil.move, file_path, dest_file))
+                print(f"  Moved to: {dest_folder}")
             
-            f.write("\nDetailed Classifications:\n")
-            for class_type, class_dict in data['all_classifications'].items():
-                f.write(f"  {class_type.capitalize()}:\n")
-                for key, value in class_dict.items():
-                    if isinstance(value, list):
-                        f.write(f"    {key}: {', '.join(str(v) for v in value)}\n")
-                    else:
-                        f.write(f"    {key}: {value}\n")
-            f.write("\n" + "="*50 + "\n\n")
-    
-    # Generate JSON report (for local LLM access)
-    json_report_path = os.path.join(output_dir, "sample_classification_data.json")
-    with open(json_report_path, 'w') as f:
-        json_data = {}
-        for filename, data in all_data.items():
-            json_data[filename] = {
-                'classification': data['classification'],
-                'all_classifications': data['all_classifications']
-            }
-            # Include selected features but not all (some might not be serializable)
-            if data['features']:
-                safe_features = {}
-                for key, value in data['features'].items():
-                    if isinstance(value, (int, float, bool, str)) or value is None:
-                        safe_features[key] = value
-                json_data[filename]['features'] = safe_features
-        
-        json.dump(json_data, f, indent=2)
-    
-    # Generate CSV feature report
-    if any(data['features'] for data in all_data.values()):
-        feature_report_path = os.path.join(output_dir, "sample_features.csv")
-        with open(feature_report_path, 'w', newline='') as f:
-            # Get all unique feature names
-            feature_names = set()
-            for data in all_data.values():
-                if data['features']:
-                    feature_names.update(k for k, v in data['features'].items() 
-                                        if isinstance(v, (int, float, bool, str)))
+            # Append this file to the reports, one write each
+            report_file.write(_format_report_entry(filename, classification, all_classifications))
             
-            # Sort feature names for consistent ordering
-            feature_names = sorted(feature_names)
+            json_entry = {
+                'classification': classification,
+                'all_classifications': all_classifications
+            }
+            # Features are plain Python scalars, so they go into the reports as-is
+            if features is not None:
+                json_entry['features'] = features
+            json_body = json_dumps_indented(json_entry).replace("\n", "\n  ")
+            json_file.write(f"{json_separator}  {json.dumps(filename)}: {json_body}")
+            json_separator = ",\n"
             
-            # Write CSV header
-            writer = csv.writer(f)
-            writer.writerow(['Filename'] + list(feature_names))
+            writer.writerow({'Filename': filename, **(features or {})})
             
-            # Write each file's features
-            for filename, data in all_data.items():
-                row = [filename]
-                if data['features']:
-                    for feature in feature_names:
-                        value = data['features'].get(feature, "")
-                        if isinstance(value, (int, float, bool, str)):
-                            row.append(value)
-                        else:
-                            row.append("")
-                else:
-                    row.extend([""] * len(feature_names))
-                writer.writerow(row)
+            # Make completed files visible right away
+            for f in (report_file, json_file, csv_file):
+                f.flush()
+        
+        json_file.write("\n}")
         
-        print(f"\nFeature data saved to: {feature_report_path}")
+        # Wait for the outstanding copies, raising the first failure
+        for future in copy_futures:
+            future.result()
     
+    print(f"\nFeature data saved to: {feature_report_path}")
     print(f"\nClassification report saved to: {report_path}")
     print(f"JSON data for LLM access saved to: {json_report_path}")
-    return all_data
+    return all_classifications_by_file
 
 def main():
     # Parse command line arguments
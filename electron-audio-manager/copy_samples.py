@@ -7,10 +7,11 @@ by copying them from another location or generating simple test tones.
 """
 
 import os
+import re
 import sys
 import shutil
 import argparse
-from pathlib import Path
+from functools import lru_cache
 import random
 
 # Variables that will be set if imports are available
@@ -40,25 +41,37 @@ SAMPLE_TYPES = {
     "instrument": ["guitar", "piano", "strings", "brass", "wind", "acoustic"]
 }
 
+AUDIO_EXTENSIONS = frozenset({".wav", ".mp3", ".ogg", ".aif", ".aiff", ".flac"})
+
 def find_audio_files(source_dir):
     """Find audio files in the source directory recursively"""
-    audio_extensions = [".wav", ".mp3", ".ogg", ".aif", ".aiff", ".flac"]
     files = []
     
-    for ext in audio_extensions:
-        files.extend(list(Path(source_dir).rglob(f"*{ext}")))
+    # Single walk over the tree, matching extensions case-insensitively
+    for root, _, filenames in os.walk(source_dir):
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() in AUDIO_EXTENSIONS:
+                files.append(os.path.join(root, filename))
     
     return files
 
+# Flat keyword -> type lookup, in SAMPLE_TYPES order
+_KEYWORD_TO_TYPE = {keyword: sample_type for sample_type, keywords in SAMPLE_TYPES.items() for keyword in keywords}
+_TYPE_RANK = {sample_type: rank for rank, sample_type in enumerate(SAMPLE_TYPES)}
+
+# Zero-width lookahead finds a keyword at every position in one scan; keywords are
+# tried in SAMPLE_TYPES order, so the first listed type still wins when a name
+# matches several (e.g. "bass_drum" is drums)
+_KEYWORD_RE = re.compile("(?=(" + "|".join(re.escape(keyword) for keyword in _KEYWORD_TO_TYPE) + "))")
+
+@lru_cache(maxsize=8192)
 def classify_by_filename(filename):
     """Classify a file by its filename"""
     filename_lower = str(filename).lower()
     
-    # Check each type
-    for sample_type, keywords in SAMPLE_TYPES.items():
-        for keyword in keywords:
-            if keyword in filename_lower:
-                return sample_type
+    matched_types = {_KEYWORD_TO_TYPE[keyword] for keyword in _KEYWORD_RE.findall(filename_lower)}
+    if matched_types:
+        return min(matched_types, key=_TYPE_RANK.__getitem__)
     
     # Default to "other" if no match found
     return "other"
@@ -81,7 +94,7 @@ def copy_sample_files(source_dir, target_dir, max_files=5):
     # Group by type
     files_by_type = {}
     for file in audio_files:
-        sample_type = classify_by_filename(file.name)
+        sample_type = classify_by_filename(os.path.basename(file))
         if sample_type not in files_by_type:
             files_by_type[sample_type] = []
         files_by_type[sample_type].append(file)
@@ -95,10 +108,11 @@ def copy_sample_files(source_dir, target_dir, max_files=5):
         
         # Copy up to max_files per type
         for file in files[:max_files]:
-            target_file = os.path.join(type_dir, file.name)
+            filename = os.path.basename(file)
+            target_file = os.path.join(type_dir, filename)
             shutil.copy2(file, target_file)
             copied_count += 1
-            print(f"Copied: {file.name} -> {target_file}")
+            print(f"Copied: {filename} -> {target_file}")
     
     print(f"Copied {copied_count} sample files to '{target_dir}'")
     return True
@@ -115,59 +129,77 @@ def generate_test_tones(target_dir, num_samples=10):
     
     # Generate sample types
     sample_types = list(SAMPLE_TYPES.keys())
+    sample_rate = 44100  # Sample rate in Hz
     
+    # Draw the random parameters for every sample up front
+    params = []
     for i in range(num_samples):
-        # Random parameters
         sample_type = random.choice(sample_types)
         duration = random.uniform(0.5, 2.0)  # Duration in seconds
-        sample_rate = 44100  # Sample rate in Hz
         frequency = random.uniform(80, 1000)  # Frequency in Hz
+        keyword = random.choice(SAMPLE_TYPES[sample_type])
+        params.append((sample_type, duration, frequency, keyword))
+    
+    # Synthesize each sample type as one (samples x frames) batch
+    signals = [None] * num_samples
+    groups = {}
+    for i, (sample_type, _, _, _) in enumerate(params):
+        groups.setdefault(sample_type, []).append(i)
+    
+    for sample_type, indices in groups.items():
+        durations = np.array([params[i][1] for i in indices])
+        freqs = np.array([params[i][2] for i in indices])[:, None]
+        lengths = (sample_rate * durations).astype(int)
         
-        # Generate time array
-        t = np.linspace(0, duration, int(sample_rate * duration), False)
+        # Time arrays, zero-padded to the longest sample in the batch
+        k = np.arange(lengths.max())[None, :]
+        t = k * (durations / lengths)[:, None]
         
         # Generate signal based on sample type
         if sample_type == "drums":
             # Short percussive sound with decay
-            signal = np.sin(2 * np.pi * frequency * t) * np.exp(-5 * t)
+            signal = np.sin(2 * np.pi * freqs * t) * np.exp(-5 * t)
         elif sample_type == "synth":
             # Synth with harmonics
-            signal = 0.5 * np.sin(2 * np.pi * frequency * t) + 0.3 * np.sin(2 * np.pi * 2 * frequency * t)
-            # Apply envelope
-            envelope = np.ones_like(t)
+            signal = 0.5 * np.sin(2 * np.pi * freqs * t) + 0.3 * np.sin(2 * np.pi * 2 * freqs * t)
+            # Apply envelope: linear attack, flat sustain, linear release
             attack = int(0.1 * sample_rate)
             release = int(0.3 * sample_rate)
-            envelope[:attack] = np.linspace(0, 1, attack)
-            envelope[-release:] = np.linspace(1, 0, release)
-            signal = signal * envelope
+            envelope = np.minimum(k / (attack - 1), (lengths[:, None] - 1 - k) / (release - 1))
+            signal *= np.minimum(envelope, 1.0, out=envelope)
         elif sample_type == "vocal":
             # Vocal-like with vibrato
             vibrato_rate = 5  # Hz
             vibrato_depth = 10  # Hz
-            frequency_mod = frequency + vibrato_depth * np.sin(2 * np.pi * vibrato_rate * t)
-            signal = np.sin(2 * np.pi * np.cumsum(frequency_mod) / sample_rate)
+            frequency_mod = freqs + vibrato_depth * np.sin(2 * np.pi * vibrato_rate * t)
+            signal = np.sin(2 * np.pi * np.cumsum(frequency_mod, axis=1) / sample_rate)
         elif sample_type == "fx":
             # Sweeping effect
-            frequency_mod = np.linspace(frequency, frequency * 3, len(t))
-            signal = np.sin(2 * np.pi * np.cumsum(frequency_mod) / sample_rate)
+            frequency_mod = freqs + 2 * freqs * (k / (lengths[:, None] - 1))
+            signal = np.sin(2 * np.pi * np.cumsum(frequency_mod, axis=1) / sample_rate)
         else:  # instrument or other
             # Basic tone with harmonics and sustain
-            signal = 0.7 * np.sin(2 * np.pi * frequency * t) + 0.2 * np.sin(2 * np.pi * 2 * frequency * t) + 0.1 * np.sin(2 * np.pi * 3 * frequency * t)
+            signal = 0.7 * np.sin(2 * np.pi * freqs * t) + 0.2 * np.sin(2 * np.pi * 2 * freqs * t) + 0.1 * np.sin(2 * np.pi * 3 * freqs * t)
+        
+        # Silence the padding so it does not affect normalization
+        signal[k >= lengths[:, None]] = 0.0
         
         # Normalize
-        signal = signal / np.max(np.abs(signal))
+        signal = signal / np.max(np.abs(signal), axis=1, keepdims=True)
         
         # Convert to 16-bit PCM
         signal = (signal * 32767).astype(np.int16)
         
+        for row, i in enumerate(indices):
+            signals[i] = signal[row, :lengths[row]]
+    
+    for i, (sample_type, _, _, keyword) in enumerate(params):
         # Create sample name with recognizable keywords for classification
-        keywords = SAMPLE_TYPES[sample_type]
-        keyword = random.choice(keywords)
         filename = f"test_{sample_type}_{keyword}_{i+1:02d}.wav"
         filepath = os.path.join(target_dir, filename)
         
         # Write WAV file
-        wavfile.write(filepath, sample_rate, signal)
+        wavfile.write(filepath, sample_rate, signals[i])
         print(f"Generated: {filepath}")
     
     print(f"Generated {num_samples} test tone samples in '{target_dir}'")
@@ -9,6 +9,7 @@ import os
 import platform
 import subprocess
 import json
+import importlib.util
 
 def check_environment():
     """Check Python environment and dependencies"""
@@ -25,13 +26,11 @@ def check_environment():
         "sklearn", "tensorflow", "torch"
     ]
     
-    # Check each package
+    # Check each package (locate it without importing, which is slow for tensorflow/torch)
     for package in required_packages:
-        try:
-            # Attempt to import the package
-            __import__(package)
+        if importlib.util.find_spec(package) is not None:
             result["dependencies"][package] = "Installed"
-        except ImportError:
+        else:
             result["dependencies"][package] = "Missing"
     
     # Check for audio libraries
@@ -7,14 +7,34 @@ It's used by the Electron Audio Sample Manager application.
 """
 
 import os
+import re
 import sys
 import json
 import shutil
+import datetime
 import logging
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Tuple, Any, Optional
 import numpy as np
 
+from feature_cache import load_cached_features, save_cached_features
+
+# Linux FICLONE ioctl (not exposed by fcntl before Python 3.12): copy-on-write file clone
+try:
+    import fcntl
+    FICLONE = getattr(fcntl, 'FICLONE', 0x40049409) if sys.platform.startswith('linux') else None
+except ImportError:
+    FICLONE = None
+
+# Optional: orjson encodes the metadata and result JSON in C; the standard library is used otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -24,20 +44,27 @@ logger = logging.getLogger(__name__)
 try:
     import librosa
     import librosa.display
-    from sklearn.cluster import KMeans
+    import soundfile as sf
+    from sklearn.cluster import KMeans, MiniBatchKMeans
     from sklearn.preprocessing import StandardScaler
 except ImportError as e:
     logger.error(f"Required dependency not found: {e}")
     logger.error("Please install required packages: librosa, scikit-learn, numpy")
     sys.exit(1)
 
-def process_audio_files(input_files: List[str], output_dir: str) -> Dict[str, Any]:
+def process_audio_files(input_files: List[str], output_dir: str, cache_regenerate: bool = False,
+                        use_gpu: bool = False) -> Dict[str, Any]:
     """
     Process a list of audio files, extract features, classify, and organize into categories.
     
+    Features are cached per sample ID under <output_dir>/.feature_cache, so files that
+    haven't changed since the last run are not analyzed again.
+    
     Args:
         input_files: List of file paths to process
         output_dir: Output directory for classified files
+        cache_regenerate: Ignore cached features and extract every file again
+        use_gpu: Compute the STFTs in batches on a CUDA GPU, if there is one
         
     Returns:
         Dictionary with processing results
@@ -47,36 +74,58 @@ def process_audio_files(input_files: List[str], output_dir: str) -> Dict[str, An
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Process each file
+    # Reuse cached features; only new or changed files are extracted
+    cache_dir = os.path.join(output_dir, FEATURE_CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    results = [None] * len(input_files)
+    pending = []
+    for i, file_path in enumerate(input_files):
+        sample_id = generate_sample_id(file_path)
+        features = None
+        if not cache_regenerate and os.path.isfile(file_path):
+            features = load_cached_features(feature_cache_path(cache_dir, sample_id))
+        if features is not None:
+            results[i] = (sample_id, os.path.basename(file_path), file_path, features)
+        else:
+            pending.append(i)
+    
+    if len(pending) < len(input_files):
+        logger.info(f"Using cached features for {len(input_files) - len(pending)} files")
+    
+    # Extract features in parallel worker processes (results come back in input order)
+    for i, result in zip(pending, map_extract([input_files[i] for i in pending], use_gpu=use_gpu)):
+        if result is not None:
+            save_cached_features(feature_cache_path(cache_dir, result[0]), result[3])
+        results[i] = result
+    
+    # Sample registry, plus its classification feature matrix filled row by row
+    # (row_of maps a sample ID to its row, in registry order)
     samples = {}
-    for file_path in input_files:
-        try:
-            sample_id = generate_sample_id(file_path)
-            filename = os.path.basename(file_path)
-            
-            logger.info(f"Processing file: {filename}")
-            
-            # Extract audio features
-            y, sr = load_audio(file_path)
-            features = extract_features(y, sr)
-            
-            # Store sample details
-            samples[sample_id] = {
-                'id': sample_id,
-                'name': filename,
-                'path': file_path,
-                'features': features,
-                'category': 'unknown',
-                'mood': 'neutral'
-            }
-        except Exception as e:
-            logger.error(f"Error processing file {file_path}: {e}")
+    feature_matrix = np.zeros((len(input_files), FEATURE_VECTOR_LENGTH), dtype=FEATURE_DTYPE)
+    row_of = {}
+    for result in results:
+        if result is None:
+            continue
+        sample_id, filename, file_path, features = result
+        
+        row = row_of.setdefault(sample_id, len(row_of))
+        fill_feature_row(feature_matrix[row], features)
+        
+        # Store sample details
+        samples[sample_id] = {
+            'id': sample_id,
+            'name': filename,
+            'path': file_path,
+            'features': features,
+            'category': 'unknown',
+            'mood': 'neutral'
+        }
     
     if not samples:
         return {'success': False, 'error': 'No valid audio files to process', 'samples': []}
     
     # Classify samples
-    samples = classify_audio_samples(samples)
+    samples = classify_audio_samples(samples, feature_matrix[:len(row_of)])
     
     # Organize files into categories
     organized_samples = organize_files(samples, output_dir)
@@ -86,9 +135,196 @@ def process_audio_files(input_files: List[str], output_dir: str) -> Dict[str, An
         'samples': list(organized_samples.values())
     }
 
+# Feature cache directory, created inside the output directory
+FEATURE_CACHE_DIR = '.feature_cache'
+
+def feature_cache_path(cache_dir: str, sample_id: str) -> str:
+    """
+    Path of the cached features for a sample.
+    
+    Args:
+        cache_dir: Feature cache directory
+        sample_id: Sample ID (name, size and modification time of the file)
+        
+    Returns:
+        Path to the sample's .npz cache file
+    """
+    return os.path.join(cache_dir, f"{sample_id}.npz")
+
+def extract_one(file_path: str) -> Optional[Tuple[str, str, str, Dict[str, Any]]]:
+    """
+    Load one audio file and extract its features (runs in a worker process).
+    
+    Args:
+        file_path: Path to audio file
+        
+    Returns:
+        Tuple of (sample_id, filename, file_path, features), or None if the file failed
+    """
+    try:
+        sample_id = generate_sample_id(file_path)
+        filename = os.path.basename(file_path)
+        
+        logger.info(f"Processing file: {filename}")
+        
+        # Extract audio features
+        y, sr = load_audio(file_path)
+        features = extract_features(y, sr)
+        
+        return sample_id, filename, file_path, features
+    except Exception as e:
+        logger.error(f"Error processing file {file_path}: {e}")
+        return None
+
+def map_extract(input_files: List[str], max_workers: Optional[int] = None,
+                use_gpu: bool = False) -> List[Optional[Tuple[str, str, str, Dict[str, Any]]]]:
+    """
+    Run extract_one over the input files on a process pool, preserving input order.
+    
+    Args:
+        input_files: List of file paths to process
+        max_workers: Number of worker processes (default: one per CPU, at most one per file)
+        use_gpu: Compute the STFTs in batches on a CUDA GPU, if there is one (see gpu_map_extract)
+        
+    Returns:
+        List of extract_one results
+    """
+    device = None
+    if use_gpu and input_files:
+        device = cuda_device()
+        if device is None:
+            logger.warning("No CUDA device available; extracting features on the CPU")
+    
+    max_workers = min(max_workers or os.cpu_count() or 1, len(input_files))
+    if max_workers <= 1:
+        # Not worth starting a pool for a single file
+        if device is not None:
+            return gpu_map_extract(input_files, device, map)
+        return [extract_one(file_path) for file_path in input_files]
+    
+    # spawn: workers start clean instead of inheriting the parent's threads/locks
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        if device is not None:
+            return gpu_map_extract(input_files, device, executor.map)
+        return list(executor.map(extract_one, input_files, chunksize=4))
+
+# Clips per padded GPU STFT batch (only one batch of decoded audio is held at a time)
+GPU_BATCH_SIZE = 32
+
+def cuda_device() -> Optional[Any]:
+    """
+    Return a CUDA device for batched STFTs, or None if torch or a GPU is unavailable.
+    
+    torch is imported here rather than at module level, so runs that don't ask for
+    the GPU never pay for importing it.
+    """
+    try:
+        import torch
+    except ImportError:
+        return None
+    return torch.device('cuda') if torch.cuda.is_available() else None
+
+def load_one(file_path: str) -> Optional[Tuple[np.ndarray, int]]:
+    """
+    Load one audio file for gpu_map_extract (runs in a worker process).
+    
+    Args:
+        file_path: Path to audio file
+        
+    Returns:
+        Tuple of (audio_data, sample_rate), or None if the file failed
+    """
+    try:
+        logger.info(f"Processing file: {os.path.basename(file_path)}")
+        return load_audio(file_path)
+    except Exception as e:
+        logger.error(f"Error processing file {file_path}: {e}")
+        return None
+
+def extract_one_from_magnitude(file_path: str, y: np.ndarray, sr: int,
+                               S: np.ndarray) -> Optional[Tuple[str, str, str, Dict[str, Any]]]:
+    """
+    extract_one for audio already loaded, with its STFT magnitude computed (runs in a worker process).
+    
+    Args:
+        file_path: Path to audio file
+        y: Audio signal
+        sr: Sample rate
+        S: STFT magnitude of y
+        
+    Returns:
+        Tuple of (sample_id, filename, file_path, features), or None if the file failed
+    """
+    try:
+        features = extract_features(y, sr, S=S)
+        return generate_sample_id(file_path), os.path.basename(file_path), file_path, features
+    except Exception as e:
+        logger.error(f"Error processing file {file_path}: {e}")
+        return None
+
+def gpu_map_extract(input_files: List[str], device: Any, map_fn: Any) -> List[Optional[Tuple[str, str, str, Dict[str, Any]]]]:
+    """
+    Extract features like map_extract, computing the STFTs in padded batches on a GPU.
+    
+    Files go through in batches of GPU_BATCH_SIZE: the workers decode a batch, the
+    GPU transforms it, and the workers extract the features from the magnitudes.
+    Clips are zero-padded to the longest clip in their batch; since the STFT pads
+    with zeros too, a clip's first 1 + len // hop_length frames are exactly its own STFT.
+    
+    Args:
+        input_files: List of file paths to process
+        device: torch CUDA device
+        map_fn: Order-preserving map to run the per-file steps with (executor.map, or map)
+        
+    Returns:
+        List of extract_one results, in input order
+    """
+    import torch
+    
+    # Files of similar size share a batch, to keep padding small
+    def file_size(i: int) -> int:
+        try:
+            return os.path.getsize(input_files[i])
+        except OSError:
+            return 0
+    order = sorted(range(len(input_files)), key=file_size)
+    
+    results = [None] * len(input_files)
+    window = torch.hann_window(STFT_N_FFT, device=device)
+    
+    for start in range(0, len(order), GPU_BATCH_SIZE):
+        batch = order[start:start + GPU_BATCH_SIZE]
+        loaded = [(i, clip) for i, clip in zip(batch, map_fn(load_one, [input_files[i] for i in batch])) if clip is not None]
+        if not loaded:
+            continue
+        
+        padded = np.zeros((len(loaded), max(len(y) for _, (y, _) in loaded)), dtype=np.float32)
+        for row, (_, (y, _)) in zip(padded, loaded):
+            row[:len(y)] = y
+        
+        with torch.no_grad():
+            spec = torch.stft(torch.from_numpy(padded).to(device), n_fft=STFT_N_FFT, hop_length=STFT_HOP_LENGTH,
+                              window=window, center=True, pad_mode='constant', return_complex=True)
+            magnitudes = spec.abs().cpu().numpy()
+        del padded, spec
+        
+        extracted = map_fn(
+            extract_one_from_magnitude,
+            [input_files[i] for i, _ in loaded],
+            [y for _, (y, _) in loaded],
+            [sr for _, (_, sr) in loaded],
+            [S[:, :1 + len(y) // STFT_HOP_LENGTH] for (_, (y, _)), S in zip(loaded, magnitudes)],
+        )
+        for (i, _), result in zip(loaded, extracted):
+            results[i] = result
+    
+    return results
+
 def load_audio(file_path: str, sr: int = 22050, mono: bool = True) -> Tuple[np.ndarray, int]:
     """
-    Load audio file using librosa.
+    Load audio file with soundfile, resampling with soxr only when the rate differs.
+    
+    Formats soundfile can't decode fall back to librosa.load.
     
     Args:
         file_path: Path to audio file
@@ -99,19 +335,37 @@ def load_audio(file_path: str, sr: int = 22050, mono: bool = True) -> Tuple[np.n
         Tuple of (audio_data, sample_rate)
     """
     try:
-        y, sr = librosa.load(file_path, sr=sr, mono=mono)
-        return y, sr
+        try:
+            y, orig_sr = sf.read(file_path, dtype='float32', always_2d=True)
+        except RuntimeError:
+            # libsndfile can't decode it (sf.LibsndfileError, a RuntimeError, on soundfile >= 0.11)
+            return librosa.load(file_path, sr=sr, mono=mono)
+        
+        # Same layout as librosa.load: (samples,) for mono, (channels, samples) otherwise
+        y = y.mean(axis=1) if mono else np.squeeze(y.T)
+        
+        if sr is None or sr == orig_sr:
+            return y, orig_sr
+        return librosa.resample(y, orig_sr=orig_sr, target_sr=sr, res_type='soxr_hq'), sr
     except Exception as e:
         logger.error(f"Error loading audio file {file_path}: {e}")
         raise
 
-def extract_features(y: np.ndarray, sr: int) -> Dict[str, Any]:
+# Samples shorter than this (seconds) are treated as one-shots and get no tempo estimate
+MIN_TEMPO_DURATION = 2.0
+
+# STFT frame size and hop shared by the CPU and GPU paths
+STFT_N_FFT = 2048
+STFT_HOP_LENGTH = 512
+
+def extract_features(y: np.ndarray, sr: int, S: Optional[np.ndarray] = None) -> Dict[str, Any]:
     """
     Extract audio features from an audio signal.
     
     Args:
         y: Audio signal
         sr: Sample rate
+        S: Precomputed STFT magnitude of y (computed here if omitted)
         
     Returns:
         Dictionary of audio features
@@ -119,10 +373,16 @@ def extract_features(y: np.ndarray, sr: int) -> Dict[str, Any]:
     # Basic features
     features = {}
     
+    # One STFT shared by every spectral feature below (magnitude, power and log-mel)
+    if S is None:
+        S = np.abs(librosa.stft(y, n_fft=STFT_N_FFT, hop_length=STFT_HOP_LENGTH))
+    S_power = S**2
+    log_mel = librosa.power_to_db(librosa.feature.melspectrogram(S=S_power, sr=sr))
+    
     # Extract spectral features
-    features['spectral_centroid'] = float(np.mean(librosa.feature.spectral_centroid(y=y, sr=sr)[0]))
-    features['spectral_bandwidth'] = float(np.mean(librosa.feature.spectral_bandwidth(y=y, sr=sr)[0]))
-    features['spectral_rolloff'] = float(np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr)[0]))
+    features['spectral_centroid'] = float(np.mean(librosa.feature.spectral_centroid(S=S, sr=sr)[0]))
+    features['spectral_bandwidth'] = float(np.mean(librosa.feature.spectral_bandwidth(S=S, sr=sr)[0]))
+    features['spectral_rolloff'] = float(np.mean(librosa.feature.spectral_rolloff(S=S, sr=sr)[0]))
     
     # Zero crossing rate (percussiveness)
     features['zero_crossing_rate'] = float(np.mean(librosa.feature.zero_crossing_rate(y)[0]))
@@ -130,53 +390,54 @@ def extract_features(y: np.ndarray, sr: int) -> Dict[str, Any]:
     # RMS energy
     features['rms'] = float(np.mean(librosa.feature.rms(y=y)[0]))
     
-    # Tempo
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-    tempo = librosa.beat.tempo(onset_envelope=onset_env, sr=sr)[0]
-    features['tempo'] = float(tempo)
+    # Tempo (meaningless for one-shots, which are left at 0)
+    if len(y) / sr >= MIN_TEMPO_DURATION:
+        onset_env = librosa.onset.onset_strength(S=log_mel, sr=sr)
+        tempo = librosa.beat.tempo(onset_envelope=onset_env, sr=sr)[0]
+        features['tempo'] = float(tempo)
+    else:
+        features['tempo'] = 0.0
     
     # Calculate MFCCs (timbre)
-    mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-    features['mfcc'] = [float(np.mean(mfcc)) for mfcc in mfccs]
+    mfccs = librosa.feature.mfcc(S=log_mel, n_mfcc=13)
+    features['mfcc'] = mfccs.mean(axis=1).tolist()
     
     # Chromagram (pitch content)
-    chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-    features['chroma'] = [float(np.mean(c)) for c in chroma]
+    chroma = librosa.feature.chroma_stft(S=S_power, sr=sr)
+    features['chroma'] = chroma.mean(axis=1).tolist()
     
     # Duration
     features['duration'] = float(len(y) / sr)
     
     return features
 
-def classify_audio_samples(samples: Dict[str, Dict]) -> Dict[str, Dict]:
+def classify_audio_samples(samples: Dict[str, Dict], X: Optional[np.ndarray] = None) -> Dict[str, Dict]:
     """
     Classify audio samples by instrument type and mood.
     
     Args:
         samples: Dictionary of audio samples with features
+        X: Feature matrix already built for the samples with features, in library
+            order (built from the features dictionaries if omitted)
         
     Returns:
         Updated dictionary with classification results
     """
     try:
-        # Create feature matrix
-        feature_list = []
-        sample_ids = []
-        
-        for sample_id, sample in samples.items():
-            if 'features' in sample:
-                feature_vector = create_feature_vector(sample['features'])
-                feature_list.append(feature_vector)
-                sample_ids.append(sample_id)
+        # Samples with feature data, in library order
+        sample_ids = [sample_id for sample_id, sample in samples.items() if 'features' in sample]
         
-        if not feature_list:
+        if not sample_ids:
             logger.warning("No feature data available for classification")
             return samples
         
-        # Convert to numpy array
-        X = np.array(feature_list)
+        # Create feature matrix
+        if X is None:
+            X = create_feature_matrix([samples[sample_id]['features'] for sample_id in sample_ids])
+        else:
+            X = X.astype(FEATURE_DTYPE, copy=False)
         
-        # Scale features
+        # Scale features (float32 in, float32 out)
         scaler = StandardScaler()
         X_scaled = scaler.fit_transform(X)
         
@@ -193,6 +454,53 @@ def classify_audio_samples(samples: Dict[str, Dict]) -> Dict[str, Dict]:
         logger.error(f"Error in classification: {e}")
         return samples
 
+# Classification feature vector: these scalar features, then the first MFCCs and chroma bins
+VECTOR_SCALAR_FEATURES = (
+    'spectral_centroid', 'spectral_bandwidth', 'spectral_rolloff',
+    'zero_crossing_rate', 'rms', 'tempo',
+)
+N_VECTOR_MFCC = 5
+N_VECTOR_CHROMA = 3
+FEATURE_VECTOR_LENGTH = len(VECTOR_SCALAR_FEATURES) + N_VECTOR_MFCC + N_VECTOR_CHROMA
+# Acoustic features need no double precision; scaling and clustering keep float32
+FEATURE_DTYPE = np.float32
+
+def create_feature_matrix(feature_dicts: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    Build the classification feature matrix, one row per features dictionary.
+    
+    Args:
+        feature_dicts: List of audio feature dictionaries
+        
+    Returns:
+        Feature matrix of shape (len(feature_dicts), FEATURE_VECTOR_LENGTH); missing
+        features and coefficients are 0
+    """
+    X = np.zeros((len(feature_dicts), FEATURE_VECTOR_LENGTH), dtype=FEATURE_DTYPE)
+    for row, features in zip(X, feature_dicts):
+        fill_feature_row(row, features)
+    return X
+
+def fill_feature_row(row: np.ndarray, features: Dict[str, Any]) -> None:
+    """
+    Write a features dictionary into one (zeroed) row of the classification feature matrix.
+    
+    Args:
+        row: Feature matrix row of length FEATURE_VECTOR_LENGTH, filled in place
+        features: Dictionary of audio features
+    """
+    mfcc_start = len(VECTOR_SCALAR_FEATURES)
+    chroma_start = mfcc_start + N_VECTOR_MFCC
+    
+    # Select most relevant features for clustering
+    row[:mfcc_start] = [features.get(name, 0) for name in VECTOR_SCALAR_FEATURES]
+    
+    # Add MFCCs (first 5) and chroma features (first 3)
+    mfccs = features.get('mfcc', [])[:N_VECTOR_MFCC]
+    row[mfcc_start:mfcc_start + len(mfccs)] = mfccs
+    chroma = features.get('chroma', [])[:N_VECTOR_CHROMA]
+    row[chroma_start:chroma_start + len(chroma)] = chroma
+
 def create_feature_vector(features: Dict[str, Any]) -> List[float]:
     """
     Create a feature vector for classification from features dictionary.
@@ -203,25 +511,10 @@ def create_feature_vector(features: Dict[str, Any]) -> List[float]:
     Returns:
         Feature vector as list of floats
     """
-    # Select most relevant features for clustering
-    feature_vector = [
-        features.get('spectral_centroid', 0),
-        features.get('spectral_bandwidth', 0),
-        features.get('spectral_rolloff', 0),
-        features.get('zero_crossing_rate', 0),
-        features.get('rms', 0),
-        features.get('tempo', 0),
-    ]
-    
-    # Add MFCCs (first 5)
-    mfccs = features.get('mfcc', [])
-    feature_vector.extend(mfccs[:5] if len(mfccs) >= 5 else mfccs + [0] * (5 - len(mfccs)))
-    
-    # Add chroma features (first 3)
-    chroma = features.get('chroma', [])
-    feature_vector.extend(chroma[:3] if len(chroma) >= 3 else chroma + [0] * (3 - len(chroma)))
-    
-    return feature_vector
+    return create_feature_matrix([features])[0].tolist()
+
+# Libraries with at least this many samples are clustered with MiniBatchKMeans
+MINIBATCH_KMEANS_MIN_SAMPLES = 256
 
 def classify_instrument_types(X: np.ndarray, sample_ids: List[str], samples: Dict[str, Dict]) -> List[str]:
     """
@@ -235,44 +528,73 @@ def classify_instrument_types(X: np.ndarray, sample_ids: List[str], samples: Dic
     Returns:
         List of instrument category labels
     """
+    categories = []
+    
     # Use k-means clustering to group similar sounds
     num_clusters = min(5, len(X))  # Don't create more clusters than samples
     if num_clusters < 2:
         # Not enough samples for meaningful clustering
         for sample_id in sample_ids:
+            sample = samples[sample_id]
             # Use heuristic classification based on filename if available
-            samples[sample_id]['category'] = classify_by_filename(samples[sample_id]['name'])
-        return [samples[sample_id]['category'] for sample_id in sample_ids]
+            category = sample['category'] = classify_by_filename(sample['name'])
+            categories.append(category)
+        return categories
     
-    # Perform clustering
-    kmeans = KMeans(n_clusters=num_clusters, random_state=42)
+    # Perform clustering (mini-batch updates once the library is large)
+    if len(X) >= MINIBATCH_KMEANS_MIN_SAMPLES:
+        kmeans = MiniBatchKMeans(n_clusters=num_clusters, batch_size=256, n_init=3, random_state=42)
+    else:
+        kmeans = KMeans(n_clusters=num_clusters, random_state=42)
     clusters = kmeans.fit_predict(X)
     
     # Define instrument categories based on cluster characteristics
     cluster_categories = assign_categories_to_clusters(X, clusters, kmeans)
     
     # Assign categories to samples
-    for i, sample_id in enumerate(sample_ids):
-        cluster = clusters[i]
+    for sample_id, cluster in zip(sample_ids, clusters.tolist()):
+        sample = samples[sample_id]
         # Get the category for this cluster
         category = cluster_categories.get(cluster)
         
         # If clustering doesn't provide a clear category, use filename heuristic
         if not category:
-            category = classify_by_filename(samples[sample_id]['name'])
+            category = classify_by_filename(sample['name'])
             
-        samples[sample_id]['category'] = category
+        sample['category'] = category
+        categories.append(category)
     
-    return [samples[sample_id]['category'] for sample_id in sample_ids]
+    return categories
 
-def assign_categories_to_clusters(X: np.ndarray, clusters: np.ndarray, kmeans: KMeans) -> Dict[int, str]:
+# Cluster category criteria: level of a feature (column of the feature matrix) in the
+# cluster center relative to the median over all samples
+CLUSTER_CATEGORIES = {
+    'percussion': {'zero_crossing_rate': 'high', 'spectral_centroid': 'high'},
+    'bass': {'spectral_centroid': 'low'},
+    'guitar': {'rms': 'medium', 'spectral_centroid': 'medium'},
+    'synth': {'spectral_bandwidth': 'high'},
+    'vocal': {'spectral_bandwidth': 'medium', 'spectral_rolloff': 'medium'},
+    'ambient': {'rms': 'low', 'spectral_centroid': 'low'},
+}
+
+# The criteria as a (categories x features) matrix of level codes (0 = low, 1 = medium,
+# 2 = high, -1 = not a criterion) over the first N_LEVEL_FEATURES feature columns
+N_LEVEL_FEATURES = 5
+LEVEL_CODES = {'low': 0, 'medium': 1, 'high': 2}
+CLUSTER_CATEGORY_NAMES = list(CLUSTER_CATEGORIES)
+CATEGORY_LEVEL_TARGETS = np.full((len(CLUSTER_CATEGORIES), N_LEVEL_FEATURES), -1, dtype=np.int8)
+for _row, _criteria in zip(CATEGORY_LEVEL_TARGETS, CLUSTER_CATEGORIES.values()):
+    for _feature, _level in _criteria.items():
+        _row[VECTOR_SCALAR_FEATURES.index(_feature)] = LEVEL_CODES[_level]
+
+def assign_categories_to_clusters(X: np.ndarray, clusters: np.ndarray, kmeans: Any) -> Dict[int, str]:
     """
     Assign instrument categories to clusters based on feature characteristics.
     
     Args:
         X: Feature matrix
         clusters: Cluster assignments
-        kmeans: Fitted KMeans model
+        kmeans: Fitted KMeans or MiniBatchKMeans model
         
     Returns:
         Dictionary mapping cluster IDs to category names
@@ -280,60 +602,42 @@ def assign_categories_to_clusters(X: np.ndarray, clusters: np.ndarray, kmeans: K
     # Get cluster centers
     centers = kmeans.cluster_centers_
     
-    # Define categories
-    categories = {
-        'percussion': {'zero_crossing_rate': 'high', 'spectral_centroid': 'high'},
-        'bass': {'spectral_centroid': 'low'},
-        'guitar': {'rms': 'medium', 'spectral_centroid': 'medium'},
-        'synth': {'spectral_bandwidth': 'high'},
-        'vocal': {'spectral_bandwidth': 'medium', 'spectral_rolloff': 'medium'},
-        'ambient': {'rms': 'low', 'spectral_centroid': 'low'},
-    }
+    # Compare cluster centers to feature medians: 0 = low, 1 = medium, 2 = high
+    medians = np.median(X[:, :N_LEVEL_FEATURES], axis=0)
+    center_values = centers[:, :N_LEVEL_FEATURES]
+    low, medium, high = np.int8(0), np.int8(1), np.int8(2)
+    levels = np.where(center_values > medians * 1.5, high, np.where(center_values < medians * 0.5, low, medium))
     
-    # Calculate feature importance indices
-    feature_indices = {
-        'spectral_centroid': 0,
-        'spectral_bandwidth': 1,
-        'spectral_rolloff': 2,
-        'zero_crossing_rate': 3,
-        'rms': 4,
-    }
+    # Score every (cluster, category) pair: number of criteria the cluster meets
+    scores = (levels[:, np.newaxis, :] == CATEGORY_LEVEL_TARGETS).sum(axis=2)
     
-    # Calculate median values for features
-    medians = np.median(X, axis=0)
-    
-    # Assign categories to clusters
-    cluster_categories = {}
-    for cluster_id in range(len(centers)):
-        center = centers[cluster_id]
-        
-        # Compare cluster center to feature medians
-        feature_levels = {}
-        for feature, idx in feature_indices.items():
-            if center[idx] > medians[idx] * 1.5:
-                feature_levels[feature] = 'high'
-            elif center[idx] < medians[idx] * 0.5:
-                feature_levels[feature] = 'low'
-            else:
-                feature_levels[feature] = 'medium'
-        
-        # Find the best matching category
-        best_category = None
-        best_score = 0
-        
-        for category, criteria in categories.items():
-            score = 0
-            for feature, level in criteria.items():
-                if feature in feature_levels and feature_levels[feature] == level:
-                    score += 1
-            
-            if score > best_score:
-                best_score = score
-                best_category = category
-        
-        cluster_categories[cluster_id] = best_category if best_score > 0 else 'other'
+    # Best matching category per cluster (first listed wins ties)
+    best = scores.argmax(axis=1)
+    best_scores = scores[np.arange(len(centers)), best]
     
-    return cluster_categories
+    return {
+        cluster_id: CLUSTER_CATEGORY_NAMES[best[cluster_id]] if best_scores[cluster_id] > 0 else 'other'
+        for cluster_id in range(len(centers))
+    }
+
+# Filename keywords per category; when a name matches several, the first listed category wins
+FILENAME_CATEGORY_KEYWORDS = {
+    'percussion': ['kick', 'snare', 'drum', 'hat', 'perc', 'clap', 'cym'],
+    'bass': ['bass', 'sub', '808'],
+    'guitar': ['guitar', 'gtr', 'strum'],
+    'synth': ['synth', 'lead', 'arp', 'pad'],
+    'vocal': ['vox', 'vocal', 'voice', 'sing'],
+    'ambient': ['amb', 'atmo', 'pad', 'texture'],
+    'fx': ['fx', 'effect', 'impact', 'trans'],
+}
+FILENAME_CATEGORY_RANK = {category: rank for rank, category in enumerate(FILENAME_CATEGORY_KEYWORDS)}
+
+# One scan over the name: a zero-width lookahead at every position reports the
+# highest-priority category with a keyword starting there (as the named group)
+FILENAME_CATEGORY_RE = re.compile("(?=" + "|".join(
+    f"(?P<{category}>{'|'.join(re.escape(keyword) for keyword in keywords)})"
+    for category, keywords in FILENAME_CATEGORY_KEYWORDS.items()
+) + ")")
 
 def classify_by_filename(filename: str) -> str:
     """
@@ -345,24 +649,10 @@ def classify_by_filename(filename: str) -> str:
     Returns:
         Category label
     """
-    filename = filename.lower()
-    
-    if any(kw in filename for kw in ['kick', 'snare', 'drum', 'hat', 'perc', 'clap', 'cym']):
-        return 'percussion'
-    elif any(kw in filename for kw in ['bass', 'sub', '808']):
-        return 'bass'
-    elif any(kw in filename for kw in ['guitar', 'gtr', 'strum']):
-        return 'guitar'
-    elif any(kw in filename for kw in ['synth', 'lead', 'arp', 'pad']):
-        return 'synth'
-    elif any(kw in filename for kw in ['vox', 'vocal', 'voice', 'sing']):
-        return 'vocal'
-    elif any(kw in filename for kw in ['amb', 'atmo', 'pad', 'texture']):
-        return 'ambient'
-    elif any(kw in filename for kw in ['fx', 'effect', 'impact', 'trans']):
-        return 'fx'
-    else:
+    matched = {match.lastgroup for match in FILENAME_CATEGORY_RE.finditer(filename.lower())}
+    if not matched:
         return 'other'
+    return min(matched, key=FILENAME_CATEGORY_RANK.__getitem__)
 
 def classify_moods(X: np.ndarray, sample_ids: List[str], samples: Dict[str, Dict]) -> List[str]:
     """
@@ -376,35 +666,81 @@ def classify_moods(X: np.ndarray, sample_ids: List[str], samples: Dict[str, Dict
     Returns:
         List of mood category labels
     """
-    # Simple heuristic-based mood classification
-    for i, sample_id in enumerate(sample_ids):
-        features = samples[sample_id]['features']
-        
-        # Extract relevant features
-        rms = features.get('rms', 0)
-        tempo = features.get('tempo', 0)
-        spec_cent = features.get('spectral_centroid', 0)
-        
-        # Thresholds for mood classification
+    # Simple heuristic-based mood classification, evaluated for all samples at once
+    members = [samples[sample_id] for sample_id in sample_ids]
+    feature_dicts = [sample['features'] for sample in members]
+    rms = np.array([features.get('rms', 0) for features in feature_dicts], dtype=float)
+    tempo = np.array([features.get('tempo', 0) for features in feature_dicts], dtype=float)
+    spec_cent = np.array([features.get('spectral_centroid', 0) for features in feature_dicts], dtype=float)
+    
+    # Thresholds for mood classification (first matching rule wins)
+    conditions = [
         # High energy, fast tempo, bright sound = aggressive
-        if rms > 0.3 and tempo > 120 and spec_cent > 2000:
-            mood = 'aggressive'
+        (rms > 0.3) & (tempo > 120) & (spec_cent > 2000),
         # Low energy, moderate tempo, darker sound = mellow
-        elif rms < 0.15 and tempo < 100:
-            mood = 'mellow'
+        (rms < 0.15) & (tempo < 100),
         # High energy, moderate tempo = energetic
-        elif rms > 0.2 and tempo > 100:
-            mood = 'energetic'
+        (rms > 0.2) & (tempo > 100),
         # Low energy, slow tempo = calm
-        elif rms < 0.1 and tempo < 80:
-            mood = 'calm'
-        # Default
-        else:
-            mood = 'neutral'
-        
-        samples[sample_id]['mood'] = mood
+        (rms < 0.1) & (tempo < 80),
+    ]
+    moods = np.select(conditions, ['aggressive', 'mellow', 'energetic', 'calm'], default='neutral').tolist()
+    
+    for sample, mood in zip(members, moods):
+        sample['mood'] = mood
     
-    return [samples[sample_id]['mood'] for sample_id in sample_ids]
+    return moods
+
+def fast_copy(src: str, dst: str) -> None:
+    """
+    Copy a file's contents, cloning it copy-on-write where the filesystem supports it.
+    
+    Btrfs/XFS clones share the data blocks, so no audio is read or written; elsewhere
+    shutil.copyfile copies in the kernel (sendfile). Metadata isn't copied, so the copy's
+    modification time is the time of the copy.
+    
+    Args:
+        src: Source file path
+        dst: Destination file path
+    """
+    if FICLONE is not None:
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return
+        except OSError:
+            # Cloning not supported here (e.g. ext4, different filesystems)
+            pass
+    shutil.copyfile(src, dst)
+
+# Threads copying files into the output directory
+COPY_WORKERS = 8
+
+def copy_to_destination(new_path: str, destination_samples: List[Dict]) -> None:
+    """
+    Copy samples into their (existing) category/mood folder and point them at the copy.
+    
+    Args:
+        new_path: Destination path shared by the samples
+        destination_samples: Samples to copy there, in library order
+    """
+    for sample in destination_samples:
+        try:
+            # Copy file to new location, skipping it if already processed (a copy
+            # at least as new as the source)
+            try:
+                up_to_date = os.stat(sample['path']).st_mtime <= os.stat(new_path).st_mtime
+            except FileNotFoundError:
+                # No copy yet (a missing source fails in the copy below)
+                up_to_date = False
+            if not up_to_date:
+                fast_copy(sample['path'], new_path)
+                logger.info(f"Copied {os.path.basename(new_path)} to {sample['category']}/{sample['mood']}")
+            
+            # Update path in samples dictionary
+            sample['path'] = new_path
+        except Exception as e:
+            logger.error(f"Error organizing file {sample['name']}: {e}")
 
 def organize_files(samples: Dict[str, Dict], output_dir: str) -> Dict[str, Dict]:
     """
@@ -417,29 +753,23 @@ def organize_files(samples: Dict[str, Dict], output_dir: str) -> Dict[str, Dict]
     Returns:
         Updated samples dictionary with new file paths
     """
-    for sample_id, sample in samples.items():
+    # Samples sharing a destination (same name, category and mood) are handled in
+    # order by one task, so they never write the same file concurrently
+    by_destination = {}
+    for sample in samples.values():
+        new_path = os.path.join(output_dir, sample['category'], sample['mood'], os.path.basename(sample['path']))
+        by_destination.setdefault(new_path, []).append(sample)
+    
+    # Create each category/mood folder once, before any copy starts
+    for folder in {os.path.dirname(new_path) for new_path in by_destination}:
         try:
-            # Create category folder
-            category_dir = os.path.join(output_dir, sample['category'])
-            os.makedirs(category_dir, exist_ok=True)
-            
-            # Create mood subfolder
-            mood_dir = os.path.join(category_dir, sample['mood'])
-            os.makedirs(mood_dir, exist_ok=True)
-            
-            # Copy file to new location
-            filename = os.path.basename(sample['path'])
-            new_path = os.path.join(mood_dir, filename)
-            
-            # Skip if already processed
-            if not os.path.exists(new_path) or os.path.getmtime(sample['path']) > os.path.getmtime(new_path):
-                shutil.copy2(sample['path'], new_path)
-                logger.info(f"Copied {filename} to {sample['category']}/{sample['mood']}")
-            
-            # Update path in samples dictionary
-            sample['path'] = new_path
-        except Exception as e:
-            logger.error(f"Error organizing file {sample['name']}: {e}")
+            os.makedirs(folder, exist_ok=True)
+        except OSError as e:
+            logger.error(f"Error creating folder {folder}: {e}")
+    
+    # Copies are I/O-bound (the GIL is released), so run them on a thread pool
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS) as executor:
+        list(executor.map(copy_to_destination, by_destination.keys(), by_destination.values()))
     
     # Create metadata file
     metadata = {
@@ -448,25 +778,21 @@ def organize_files(samples: Dict[str, Dict], output_dir: str) -> Dict[str, Dict]
         'categories': {}
     }
     
-    # Count samples per category
-    for sample in samples.values():
-        category = sample['category']
-        mood = sample['mood']
-        
-        if category not in metadata['categories']:
-            metadata['categories'][category] = {'count': 0, 'moods': {}}
-        
-        metadata['categories'][category]['count'] += 1
-        
-        if mood not in metadata['categories'][category]['moods']:
-            metadata['categories'][category]['moods'][mood] = 0
-        
-        metadata['categories'][category]['moods'][mood] += 1
+    # Count samples per category and mood (in order of first appearance)
+    pair_counts = Counter((sample['category'], sample['mood']) for sample in samples.values())
+    for (category, mood), count in pair_counts.items():
+        category_entry = metadata['categories'].setdefault(category, {'count': 0, 'moods': {}})
+        category_entry['count'] += count
+        category_entry['moods'][mood] = count
     
     # Write metadata
     metadata_path = os.path.join(output_dir, 'metadata.json')
-    with open(metadata_path, 'w') as f:
-        json.dump(metadata, f, indent=2)
+    if orjson is not None:
+        with open(metadata_path, 'wb') as f:
+            f.write(orjson.dumps(metadata, option=orjson.OPT_INDENT_2))
+    else:
+        with open(metadata_path, 'w') as f:
+            json.dump(metadata, f, indent=2)
     
     return samples
 
@@ -501,16 +827,23 @@ if __name__ == "__main__":
         
         input_files = config.get('files', [])
         output_dir = config.get('outputDir', '')
+        cache_regenerate = config.get('regenerateCache', False)
+        use_gpu = config.get('useGpu', False)
         
         if not input_files or not output_dir:
             print("Error: Missing required input files or output directory")
             sys.exit(1)
         
         # Process files
-        result = process_audio_files(input_files, output_dir)
+        result = process_audio_files(input_files, output_dir, cache_regenerate, use_gpu)
         
         # Output result as JSON
-        print(json.dumps(result))
+        if orjson is not None:
+            sys.stdout.flush()
+            sys.stdout.buffer.write(orjson.dumps(result) + b"\n")
+            sys.stdout.buffer.flush()
+        else:
+            print(json.dumps(result))
         
     except Exception as e:
         error_result = {'success': False, 'error': str(e), 'samples': []}
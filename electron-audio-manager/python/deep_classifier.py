@@ -1,11 +1,19 @@
 import os
+import re
 import json
+import shutil
+import hashlib
 import logging
 import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 from pathlib import Path
-import time
 import numpy as np
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+
+from feature_cache import load_cached_features, save_cached_features
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -15,6 +23,7 @@ logger = logging.getLogger(__name__)
 try:
     import librosa
     import librosa.display
+    import soundfile as sf
     logger.info(f"Librosa version {librosa.__version__} successfully imported!")
     LIBROSA_AVAILABLE = True
 except ImportError:
@@ -60,6 +69,57 @@ MOOD_KEYWORDS = {
     "epic": ["epic", "cinematic", "movie", "trailer", "dramatic"],
 }
 
+def keyword_regex(keyword_map: Dict[str, List[str]]) -> re.Pattern:
+    """
+    Compile a keyword map into one pattern that scans a filename in a single pass.
+    
+    A zero-width lookahead at every position reports, as the named group, the
+    first-listed key with a keyword starting there.
+    
+    Args:
+        keyword_map: Dictionary of key -> keywords, in priority order
+        
+    Returns:
+        Compiled pattern for finditer
+    """
+    return re.compile("(?=" + "|".join(
+        f"(?P<{key}>{'|'.join(re.escape(keyword) for keyword in keywords)})"
+        for key, keywords in keyword_map.items()
+    ) + ")")
+
+def first_keyword_match(pattern: re.Pattern, rank: Dict[str, int], filename: str) -> Optional[str]:
+    """
+    Return the highest-priority key with a keyword anywhere in the filename, or None.
+    
+    Args:
+        pattern: Pattern from keyword_regex
+        rank: Priority of each key (position in the keyword map)
+        filename: Lowercased filename
+    """
+    matched = {match.lastgroup for match in pattern.finditer(filename)}
+    if not matched:
+        return None
+    return min(matched, key=rank.__getitem__)
+
+# Filename keyword scanners, with the first-listed subtype/mood winning as before
+SUBTYPE_KEYWORD_RE = keyword_regex(CATEGORY_KEYWORDS)
+SUBTYPE_RANK = {subtype: rank for rank, subtype in enumerate(CATEGORY_KEYWORDS)}
+MOOD_KEYWORD_RE = keyword_regex(MOOD_KEYWORDS)
+MOOD_RANK = {mood: rank for rank, mood in enumerate(MOOD_KEYWORDS)}
+
+# Whole-word matches of each subtype's keywords (not inside a longer word, so "tom"
+# doesn't count in "custom"); only these make a filename classification confident
+SUBTYPE_WORD_RE = {
+    subtype: re.compile(r"(?<![a-z])(?:" + "|".join(re.escape(keyword) for keyword in keywords) + r")(?![a-z])")
+    for subtype, keywords in CATEGORY_KEYWORDS.items()
+}
+
+# Main type of each subtype
+SUBTYPE_MAIN_TYPE = {}
+for _main_type, _subtypes in MAIN_CATEGORIES.items():
+    for _subtype in _subtypes:
+        SUBTYPE_MAIN_TYPE.setdefault(_subtype, _main_type)
+
 def classify_by_filename(file_path: str) -> Dict[str, str]:
     """
     Classify audio sample based on filename.
@@ -68,7 +128,8 @@ def classify_by_filename(file_path: str) -> Dict[str, str]:
         file_path: Path to audio file
         
     Returns:
-        Dictionary with classification results
+        Dictionary with classification results; 'confidence' is 'high' when one of
+        the subtype's keywords appears as a whole word and 'low' otherwise
     """
     filename = os.path.basename(file_path).lower()
     
@@ -76,35 +137,134 @@ def classify_by_filename(file_path: str) -> Dict[str, str]:
     classification = {
         'type': 'other',
         'subtype': 'other',
-        'mood': 'neutral'
+        'mood': 'neutral',
+        'confidence': 'low'
     }
     
     # Check for subtypes first
-    for subtype, keywords in CATEGORY_KEYWORDS.items():
-        if any(keyword in filename for keyword in keywords):
-            classification['subtype'] = subtype
-            break
-    
-    # Determine main type based on subtype
-    for main_type, subtypes in MAIN_CATEGORIES.items():
-        if classification['subtype'] in subtypes:
-            classification['type'] = main_type
-            break
+    subtype = first_keyword_match(SUBTYPE_KEYWORD_RE, SUBTYPE_RANK, filename)
+    if subtype:
+        classification['subtype'] = subtype
+        if SUBTYPE_WORD_RE[subtype].search(filename):
+            classification['confidence'] = 'high'
+        
+        # Determine main type based on subtype
+        classification['type'] = SUBTYPE_MAIN_TYPE.get(subtype, 'other')
     
     # Determine mood if possible
-    for mood, keywords in MOOD_KEYWORDS.items():
-        if any(keyword in filename for keyword in keywords):
-            classification['mood'] = mood
-            break
+    mood = first_keyword_match(MOOD_KEYWORD_RE, MOOD_RANK, filename)
+    if mood:
+        classification['mood'] = mood
     
     return classification
 
-def extract_audio_features(file_path: str) -> Dict[str, Any]:
+# Only the start of longer files is analyzed; timbre statistics settle well within it
+MAX_ANALYSIS_SECONDS = 10.0
+
+def load_audio(file_path: str, max_duration: Optional[float] = None) -> Tuple[np.ndarray, int]:
+    """
+    Load an audio file as mono float32 at its native sample rate.
+    
+    soundfile decodes directly; formats it can't read (e.g. mp3 on older
+    libsndfile) fall back to librosa.load.
+    
+    Args:
+        file_path: Path to audio file
+        max_duration: Only decode this many seconds from the start (default: whole file)
+        
+    Returns:
+        Tuple of (audio_data, sample_rate)
+    """
+    try:
+        with sf.SoundFile(file_path) as f:
+            sr = f.samplerate
+            frames = -1 if max_duration is None else int(sr * max_duration)
+            y = f.read(frames, dtype='float32', always_2d=True)
+    except RuntimeError:
+        # libsndfile can't decode it (sf.LibsndfileError, a RuntimeError, on soundfile >= 0.11)
+        return librosa.load(file_path, sr=None, duration=max_duration)
+    
+    # Average the channels, as librosa.load does
+    return y.mean(axis=1), sr
+
+def read_header_features(file_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the duration and sample rate from the file header, without decoding audio.
+    
+    Args:
+        file_path: Path to audio file
+        
+    Returns:
+        Dictionary with 'duration' and 'sample_rate', or None if the header can't be read
+    """
+    try:
+        info = sf.info(file_path)
+        return {'duration': info.frames / info.samplerate, 'sample_rate': info.samplerate}
+    except Exception as e:
+        logger.warning(f"Could not read audio header of {file_path}: {e}")
+        return None
+
+# Frequency bands for the band energy ratios: [low, high) in Hz
+FREQUENCY_BANDS = {
+    "sub_bass": (20, 60),
+    "bass": (60, 250),
+    "low_mid": (250, 500),
+    "mid": (500, 2000),
+    "upper_mid": (2000, 4000),
+    "high": (4000, 20000)
+}
+
+@lru_cache(maxsize=None)
+def band_bin_ranges(sr: int, n_fft: int) -> Tuple[Tuple[str, int, int], ...]:
+    """
+    STFT bin range of each frequency band, for one sample rate and FFT size.
+    
+    Args:
+        sr: Sample rate
+        n_fft: FFT size
+        
+    Returns:
+        Tuple of (band_name, start, stop) with bins start:stop inside the band
+    """
+    freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+    return tuple(
+        (band_name, int(np.searchsorted(freqs, low)), int(np.searchsorted(freqs, high)))
+        for band_name, (low, high) in FREQUENCY_BANDS.items()
+    )
+
+def attack_frame_count(env_frames: np.ndarray) -> int:
+    """
+    Number of envelope frames from the attack start up to the peak.
+    
+    The attack starts where the envelope, walking back from its peak, first drops
+    below 80% of the peak value; 0 if it never does (before frame 0).
+    
+    Args:
+        env_frames: Framed amplitude envelope
+        
+    Returns:
+        Attack length in frames
+    """
+    peak_idx = np.argmax(env_frames)
+    threshold = 0.8 * env_frames[peak_idx]
+    
+    # Frames back from the peak (peak_idx down to 1) until the envelope drops below threshold
+    below = np.flatnonzero(env_frames[peak_idx:0:-1] < threshold)
+    return int(below[0]) if below.size else 0
+
+# STFT frame size and hop (librosa's defaults), shared by the CPU and GPU paths
+STFT_N_FFT = 2048
+STFT_HOP_LENGTH = 512
+
+def extract_audio_features(file_path: str, audio: Optional[Tuple[np.ndarray, int]] = None,
+                           S: Optional[np.ndarray] = None) -> Dict[str, Any]:
     """
     Extract audio features using librosa if available.
     
     Args:
         file_path: Path to audio file
+        audio: (audio_data, sample_rate) already loaded by load_audio (loaded here if omitted)
+        S: Precomputed STFT magnitude of the audio (computed here if omitted)
         
     Returns:
         Dictionary of audio features or None if extraction fails
@@ -116,9 +276,9 @@ def extract_audio_features(file_path: str) -> Dict[str, Any]:
     try:
         logger.info(f"Analyzing {os.path.basename(file_path)}...")
         
-        # Load the audio file
-        y, sr = librosa.load(file_path, sr=None)
-        duration = librosa.get_duration(y=y, sr=sr)
+        # Load the audio file (features describe its first MAX_ANALYSIS_SECONDS)
+        y, sr = audio if audio is not None else load_audio(file_path, max_duration=MAX_ANALYSIS_SECONDS)
+        duration = len(y) / sr
         
         # Initialize features
         features = {
@@ -126,6 +286,12 @@ def extract_audio_features(file_path: str) -> Dict[str, Any]:
             'sample_rate': sr
         }
         
+        # Report the full length of truncated files
+        if duration >= MAX_ANALYSIS_SECONDS:
+            header = read_header_features(file_path)
+            if header:
+                features['duration'] = header['duration']
+        
         # Basic energy features
         rms = librosa.feature.rms(y=y)[0]
         features['energy_mean'] = float(np.mean(rms))
@@ -133,8 +299,10 @@ def extract_audio_features(file_path: str) -> Dict[str, Any]:
         features['energy_max'] = float(np.max(rms))
         features['energy_dynamic_range'] = float(features['energy_max'] / (features['energy_mean'] + 1e-5))
         
-        # Spectral features
-        S = np.abs(librosa.stft(y))
+        # One STFT shared by the spectral, rhythm, MFCC and band features below
+        if S is None:
+            S = np.abs(librosa.stft(y, n_fft=STFT_N_FFT, hop_length=STFT_HOP_LENGTH))
+        log_mel = librosa.power_to_db(librosa.feature.melspectrogram(S=S**2, sr=sr))
         
         # Spectral centroid (brightness)
         centroid = librosa.feature.spectral_centroid(S=S, sr=sr)[0]
@@ -157,17 +325,17 @@ def extract_audio_features(file_path: str) -> Dict[str, Any]:
         features['avg_rolloff'] = float(np.mean(rolloff))
         
         # Rhythm features
-        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+        onset_env = librosa.onset.onset_strength(S=log_mel, sr=sr)
         tempo, _ = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr)
-        features['tempo'] = float(tempo)
+        features['tempo'] = float(np.atleast_1d(tempo)[0])
         
         # Onset rate (attacks per second)
-        onset_frames = librosa.onset.onset_detect(y=y, sr=sr)
+        onset_frames = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr)
         onset_rate = len(onset_frames) / duration if duration > 0 else 0
         features['onset_rate'] = float(onset_rate)
         
         # MFCC features for timbre
-        mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+        mfccs = librosa.feature.mfcc(S=log_mel, n_mfcc=13)
         for i in range(min(5, mfccs.shape[0])):  # First 5 MFCCs
             features[f'mfcc{i+1}'] = float(np.mean(mfccs[i]))
         
@@ -180,15 +348,7 @@ def extract_audio_features(file_path: str) -> Dict[str, Any]:
         if frames.size > 0:
             env_frames = np.mean(frames, axis=0)
             peak_idx = np.argmax(env_frames)
-            threshold = 0.8 * env_frames[peak_idx]
-            attack_frames = 0
-            
-            for i in range(min(peak_idx, len(env_frames))):
-                if env_frames[peak_idx - i] < threshold:
-                    attack_frames = i
-                    break
-            
-            attack_time = attack_frames * hop_length / sr
+            attack_time = attack_frame_count(env_frames) * hop_length / sr
             features['attack_time'] = float(attack_time)
             features['has_transient'] = bool(attack_time < 0.05)
             
@@ -203,45 +363,27 @@ def extract_audio_features(file_path: str) -> Dict[str, Any]:
         zcr = librosa.feature.zero_crossing_rate(y)[0]
         features['avg_zcr'] = float(np.mean(zcr))
         
-        # Harmonic-percussive source separation
-        y_harmonic, y_percussive = librosa.effects.hpss(y)
-        harmonic_energy = np.sum(y_harmonic**2)
-        percussive_energy = np.sum(y_percussive**2)
-        
-        if percussive_energy > 0:
-            features['harmonic_percussive_ratio'] = float(harmonic_energy / percussive_energy)
-        else:
-            features['harmonic_percussive_ratio'] = float(1.0)
+        # Harmonic to percussive ratio, approximated from spectral flatness (tonal
+        # spectra are peaky, noisy/percussive ones are flat) instead of running HPSS
+        flatness = features['avg_flatness']
+        # float32 flatness can round slightly above 1 (e.g. silence); keep the ratio non-negative
+        features['harmonic_percussive_ratio'] = float(max(0.0, 1.0 - flatness) / (flatness + 1e-5))
         
         # Derived metrics for mood
         features['brightness'] = features['avg_centroid'] / (sr/2)  # Normalize by Nyquist
         features['roughness'] = float(1.0 - features['avg_contrast'])
         
-        # Frequency band analysis
-        spec = np.abs(librosa.stft(y))
-        freqs = librosa.fft_frequencies(sr=sr)
-        
-        def get_band_indices(low, high):
-            return np.where((freqs >= low) & (freqs < high))[0]
-        
-        bands = {
-            "sub_bass": (20, 60),
-            "bass": (60, 250),
-            "low_mid": (250, 500),
-            "mid": (500, 2000),
-            "upper_mid": (2000, 4000),
-            "high": (4000, 20000)
-        }
+        # Frequency band analysis (energy per frequency bin, summed over frames)
+        bin_energy = np.sum(S, axis=1)
         
         # Total energy
-        total_energy = np.sum(spec)
+        total_energy = np.sum(bin_energy)
         
         if total_energy > 0:
             # Calculate energy ratio for each band
-            for band_name, (low, high) in bands.items():
-                indices = get_band_indices(low, high)
-                if len(indices) > 0:
-                    band_energy = np.sum(spec[:, indices])
+            for band_name, start, stop in band_bin_ranges(sr, 2 * (S.shape[0] - 1)):
+                if stop > start:
+                    band_energy = np.sum(bin_energy[start:stop])
                     features[f'{band_name}_ratio'] = float(band_energy / total_energy)
                 else:
                     features[f'{band_name}_ratio'] = 0.0
@@ -253,6 +395,157 @@ def extract_audio_features(file_path: str) -> Dict[str, Any]:
         logger.error(f"Error extracting features from {file_path}: {e}")
         return None
 
+# Features of analyzed files, cached across runs (and output directories)
+FEATURE_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                                 'sample_buddy')
+# Bump when extract_audio_features changes, so older cache entries are no longer used
+FEATURE_CACHE_VERSION = 2
+
+def feature_cache_path(file_path: str) -> Optional[str]:
+    """
+    Path of the cached features for an audio file, keyed by its path, modification
+    time and size.
+    
+    Args:
+        file_path: Path to audio file
+        
+    Returns:
+        Path to the .npz cache file, or None if the file can't be stat'ed
+    """
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        return None
+    key = f"{FEATURE_CACHE_VERSION}:{os.path.abspath(file_path)}:{file_stat.st_mtime_ns}:{file_stat.st_size}"
+    return os.path.join(FEATURE_CACHE_DIR, f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.npz")
+
+def cached_audio_features(file_path: str) -> Optional[Dict[str, Any]]:
+    """
+    extract_audio_features, reusing the cached result while the file is unchanged.
+    
+    Args:
+        file_path: Path to audio file
+        
+    Returns:
+        Dictionary of audio features or None if extraction fails
+    """
+    cache_path = feature_cache_path(file_path)
+    if cache_path:
+        features = load_cached_features(cache_path)
+        if features is not None:
+            return features
+    
+    features = extract_audio_features(file_path)
+    if features and cache_path:
+        save_cached_features(cache_path, features)
+    return features
+
+# Files per padded GPU batch
+GPU_BATCH_SIZE = 64
+
+def cuda_device() -> Optional[Any]:
+    """
+    Return a CUDA device for batched STFTs, or None if torch or a GPU is unavailable.
+    
+    torch is imported here rather than at module level, since importing it costs
+    more than analyzing a few files on the CPU.
+    """
+    try:
+        import torch
+    except ImportError:
+        return None
+    return torch.device('cuda') if torch.cuda.is_available() else None
+
+def load_analysis_audio(file_path: str) -> Optional[Tuple[np.ndarray, int]]:
+    """
+    Load the analyzed part of an audio file for gpu_cache_features (runs in a worker process).
+    
+    Args:
+        file_path: Path to audio file
+        
+    Returns:
+        Tuple of (audio_data, sample_rate), or None if the file can't be loaded
+    """
+    try:
+        return load_audio(file_path, max_duration=MAX_ANALYSIS_SECONDS)
+    except Exception:
+        # process_one reports the error when it analyzes the file again
+        return None
+
+def cache_features_from_magnitude(file_path: str, cache_path: str, y: np.ndarray, sr: int, S: np.ndarray) -> None:
+    """
+    Extract features from loaded audio and its STFT magnitude into the feature cache
+    (runs in a worker process).
+    
+    Args:
+        file_path: Path to audio file
+        cache_path: Path to the file's .npz cache entry
+        y: Audio signal
+        sr: Sample rate
+        S: STFT magnitude of y
+    """
+    features = extract_audio_features(file_path, (y, sr), S)
+    if features:
+        save_cached_features(cache_path, features)
+
+def gpu_cache_features(input_files: List[str], device: Any, map_fn: Any, fast: bool = False) -> None:
+    """
+    Deep analyze the files that need it with their STFTs on a GPU, storing the results
+    in the feature cache.
+    
+    Files go through in batches of GPU_BATCH_SIZE: the workers load a batch, the GPU
+    transforms it, and the workers extract the rest of the features from the magnitudes.
+    Clips are zero-padded to the longest clip in their batch; since the STFT pads with
+    zeros too, a clip's first 1 + len // hop_length frames are exactly its own STFT.
+    process_one then finds every analyzed file in the cache; files that fail here are
+    analyzed (and their errors reported) there as usual.
+    
+    Args:
+        input_files: List of file paths to process
+        device: torch CUDA device
+        map_fn: Order-preserving map to run the per-file steps with (executor.map, or map)
+        fast: Skip files confidently classified by filename, as process_one does
+    """
+    import torch
+    
+    # Files process_one would analyze, and that aren't cached yet
+    pending = []
+    for file_path in input_files:
+        if fast and classify_by_filename(file_path)['confidence'] == 'high':
+            continue
+        cache_path = feature_cache_path(file_path)
+        if cache_path and not os.path.exists(cache_path):
+            pending.append((file_path, cache_path))
+    
+    window = torch.hann_window(STFT_N_FFT, device=device)
+    for start in range(0, len(pending), GPU_BATCH_SIZE):
+        batch = pending[start:start + GPU_BATCH_SIZE]
+        loaded = [(file_path, cache_path, audio) for (file_path, cache_path), audio
+                  in zip(batch, map_fn(load_analysis_audio, [file_path for file_path, _ in batch]))
+                  if audio is not None]
+        if not loaded:
+            continue
+        
+        padded = np.zeros((len(loaded), max(len(y) for _, _, (y, _) in loaded)), dtype=np.float32)
+        for row, (_, _, (y, _)) in zip(padded, loaded):
+            row[:len(y)] = y
+        
+        with torch.no_grad():
+            spec = torch.stft(torch.from_numpy(padded).to(device), n_fft=STFT_N_FFT, hop_length=STFT_HOP_LENGTH,
+                              window=window, center=True, pad_mode='constant', return_complex=True)
+            magnitudes = spec.abs().cpu().numpy()
+        del padded, spec
+        
+        # Consume the map so the batch is cached before the next one is loaded
+        list(map_fn(
+            cache_features_from_magnitude,
+            [file_path for file_path, _, _ in loaded],
+            [cache_path for _, cache_path, _ in loaded],
+            [y for _, _, (y, _) in loaded],
+            [sr for _, _, (_, sr) in loaded],
+            [S[:, :1 + len(y) // STFT_HOP_LENGTH] for (_, _, (y, _)), S in zip(loaded, magnitudes)],
+        ))
+
 def determine_mood_from_features(features: Dict[str, Any]) -> Dict[str, Any]:
     """
     Determine mood characteristics from audio features.
@@ -333,121 +626,251 @@ def determine_mood_from_features(features: Dict[str, Any]) -> Dict[str, Any]:
     
     return mood
 
-def process_files(input_files: List[str], output_dir: Optional[str] = None, deep_analysis: bool = True) -> Dict[str, Any]:
+def process_one(file_path: str, deep_analysis: bool = True, fast: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Classify one audio file by filename and, optionally, by its audio features
+    (runs in a worker process).
+    
+    With fast set, files whose name confidently identifies the instrument only get
+    their header read.
+    
+    Args:
+        file_path: Path to audio file
+        deep_analysis: Whether to perform deep audio analysis
+        fast: Skip deep analysis of files confidently classified by filename
+        
+    Returns:
+        Sample metadata dictionary, or None if the file failed
+    """
+    try:
+        # Generate a unique ID for the sample
+        sample_id = f"sample_{os.path.splitext(os.path.basename(file_path))[0].replace(' ', '_').lower()}"
+        
+        # Initial classification by filename
+        classification = classify_by_filename(file_path)
+        
+        # Extract audio features if deep analysis is requested
+        features = None
+        mood_from_features = {}
+        
+        if deep_analysis and LIBROSA_AVAILABLE and fast and classification['confidence'] == 'high':
+            # The filename is conclusive: read only the header, and the mood stays from the filename
+            features = read_header_features(file_path)
+        elif deep_analysis and LIBROSA_AVAILABLE:
+            features = cached_audio_features(file_path)
+            if features:
+                # Determine mood from features
+                mood_from_features = determine_mood_from_features(features)
+                
+                # Override mood with the one determined from features
+                if mood_from_features.get('overall_mood'):
+                    classification['mood'] = mood_from_features.get('overall_mood')[0]
+            else:
+                logger.warning(f"Could not extract features from {file_path}")
+        
+        # Create sample metadata
+        sample = {
+            "id": sample_id,
+            "name": os.path.basename(file_path),
+            "path": file_path,
+            "category": classification["type"],
+            "subtype": classification["subtype"],
+            "mood": classification["mood"]
+        }
+        
+        # Add features and detailed mood if available
+        if features:
+            sample["features"] = features
+        
+        if mood_from_features:
+            sample["mood_details"] = mood_from_features
+        
+        return sample
+    
+    except Exception as e:
+        logger.error(f"Error processing file {file_path}: {e}")
+        return None
+
+def map_process(input_files: List[str], deep_analysis: bool = True, fast: bool = False,
+                max_workers: Optional[int] = None, gpu: bool = False) -> Iterator[Optional[Dict[str, Any]]]:
+    """
+    Run process_one over the input files on a process pool, yielding results in input order.
+    
+    Args:
+        input_files: List of file paths to process
+        deep_analysis: Whether to perform deep audio analysis
+        fast: Skip deep analysis of files confidently classified by filename
+        max_workers: Number of worker processes (default: one per CPU, at most one per file)
+        gpu: Compute the STFTs of deep analysis in batches on a CUDA GPU, if there is one
+        
+    Yields:
+        process_one results, as soon as each one (and those before it) is done
+    """
+    device = None
+    if gpu and deep_analysis and LIBROSA_AVAILABLE and input_files:
+        device = cuda_device()
+        if device is None:
+            logger.warning("No CUDA device available; analyzing on the CPU")
+    
+    max_workers = min(max_workers or os.cpu_count() or 1, len(input_files))
+    if max_workers <= 1:
+        # Not worth starting a pool for a single file
+        if device is not None:
+            gpu_cache_features(input_files, device, map, fast)
+        for file_path in input_files:
+            yield process_one(file_path, deep_analysis, fast)
+        return
+    
+    # spawn: workers start clean instead of inheriting the parent's threads/locks
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        if device is not None:
+            gpu_cache_features(input_files, device, executor.map, fast)
+        yield from executor.map(process_one, input_files, repeat(deep_analysis), repeat(fast), chunksize=4)
+
+def organize_sample(sample: Dict[str, Any], output_dir: str) -> Optional[Dict[str, Any]]:
+    """
+    Copy a classified sample into its category folder, next to a JSON file with its
+    classification and features, and record the destination in the sample.
+    
+    Args:
+        sample: Sample metadata dictionary from process_one
+        output_dir: Output directory for classified files
+        
+    Returns:
+        The data written to the sample's JSON file, or None if it wasn't copied
+    """
+    json_data = None
+    file_path = sample["path"]
+    category = sample["category"]
+    
+    # Create category directory (drums, bass, synth, etc.)
+    category_dir = os.path.join(output_dir, category)
+    os.makedirs(category_dir, exist_ok=True)
+    
+    # Destination path directly in the category folder
+    dest_path = os.path.join(category_dir, os.path.basename(file_path))
+    
+    # Also create a JSON file with the features data
+    json_path = os.path.join(category_dir, f"{os.path.splitext(os.path.basename(file_path))[0]}.json")
+    
+    # Copy the file
+    try:
+        if os.path.exists(file_path) and file_path != dest_path:
+            # Copy the audio file to the destination
+            shutil.copy2(file_path, dest_path)
+            
+            # Write the features and classification info to a JSON file
+            with open(json_path, 'w') as json_file:
+                json_data = {
+                    "file_name": os.path.basename(file_path),
+                    "category": category,
+                    "mood": sample["mood"],
+                    "features": sample.get("features", {}),
+                    "mood_details": sample.get("mood_details", {})
+                }
+                json.dump(json_data, json_file, indent=2)
+            
+            logger.info(f"Copied {os.path.basename(file_path)} to {category} and saved features")
+        else:
+            logger.info(f"Would copy {os.path.basename(file_path)} to {category}")
+    except Exception as copy_error:
+        error_msg = f"Error copying {os.path.basename(file_path)}: {str(copy_error)}"
+        logger.error(error_msg)
+        sample["copy_error"] = str(copy_error)
+    
+    # Add destination path to sample metadata
+    sample["dest_path"] = dest_path
+    return json_data
+
+# Consolidated features of every organized sample, written to the output directory's
+# root; find_similar_samples reads it instead of opening one JSON file per sample
+FEATURE_MANIFEST_NAME = 'features_manifest.json'
+
+def update_feature_manifest(output_dir: str, entries: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Add entries to the output directory's feature manifest (written atomically),
+    dropping the entries of files that are no longer in the output directory.
+    
+    Args:
+        output_dir: Output directory for classified files
+        entries: Per-file JSON data keyed by path relative to output_dir ('/'-separated)
+    """
+    manifest_path = os.path.join(output_dir, FEATURE_MANIFEST_NAME)
+    manifest = {}
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning(f"Rebuilding unreadable feature manifest {manifest_path}: {e}")
+    
+    manifest.update(entries)
+    
+    # Files removed (or moved) since an earlier run recorded them
+    manifest = {rel_path: data for rel_path, data in manifest.items()
+                if os.path.isfile(os.path.join(output_dir, *rel_path.split('/')))}
+    
+    # Per-process temporary name: another run may be writing to the same output directory
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+    except OSError as e:
+        logger.error(f"Could not write feature manifest {manifest_path}: {e}")
+    finally:
+        # Gone already if the replace succeeded
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+def process_files(input_files: List[str], output_dir: Optional[str] = None, deep_analysis: bool = True,
+                  fast: bool = False, gpu: bool = False) -> Dict[str, Any]:
     """
     Process audio files with feature extraction and classification.
     
+    Files are analyzed in parallel worker processes; copies are made here, in input order.
+    
     Args:
         input_files: List of file paths to process
         output_dir: Output directory for classified files (optional)
         deep_analysis: Whether to perform deep audio analysis
+        fast: Skip deep analysis of files confidently classified by filename
+        gpu: Compute the STFTs of deep analysis in batches on a CUDA GPU, if there is one
         
     Returns:
         Dictionary with processing results
     """
     results = {"success": True, "samples": []}
     total_files = len(input_files)
+    manifest_entries = {}
     
     logger.info(f"Processing {total_files} audio files")
     
     # Process each file
-    for i, file_path in enumerate(input_files):
-        try:
-            # Update progress with file count information for the renderer
-            progress = (i + 1) / total_files * 100
-            logger.info(f"Progress: {progress:.1f}% - Files processed: {i+1} of {total_files} - Processing file: {os.path.basename(file_path)}")
-            
-            # Generate a unique ID for the sample
-            sample_id = f"sample_{os.path.splitext(os.path.basename(file_path))[0].replace(' ', '_').lower()}"
-            
-            # Initial classification by filename
-            classification = classify_by_filename(file_path)
-            
-            # Extract audio features if deep analysis is requested
-            features = None
-            mood_from_features = {}
-            
-            if deep_analysis and LIBROSA_AVAILABLE:
-                features = extract_audio_features(file_path)
-                if features:
-                    # Determine mood from features
-                    mood_from_features = determine_mood_from_features(features)
-                    
-                    # Override mood with the one determined from features
-                    if mood_from_features.get('overall_mood'):
-                        classification['mood'] = mood_from_features.get('overall_mood')[0]
-                else:
-                    logger.warning(f"Could not extract features from {file_path}")
-            
-            # Create sample metadata
-            sample = {
-                "id": sample_id,
-                "name": os.path.basename(file_path),
-                "path": file_path,
-                "category": classification["type"],
-                "subtype": classification["subtype"],
-                "mood": classification["mood"]
-            }
-            
-            # Add features and detailed mood if available
-            if features:
-                sample["features"] = features
-            
-            if mood_from_features:
-                sample["mood_details"] = mood_from_features
-            
-            # Organize the file if output directory is provided
-            if output_dir:
-                # Use the organized-samples folder structure
-                organized_dir = output_dir
-                
-                # Create category directory (drums, bass, synth, etc.)
-                category_dir = os.path.join(organized_dir, classification["type"])
-                os.makedirs(category_dir, exist_ok=True)
-                
-                # Destination path directly in the category folder
-                dest_path = os.path.join(category_dir, os.path.basename(file_path))
-                
-                # Also create a JSON file with the features data
-                json_path = os.path.join(category_dir, f"{os.path.splitext(os.path.basename(file_path))[0]}.json")
-                
-                # Copy the file
-                try:
-                    import shutil
-                    if os.path.exists(file_path) and file_path != dest_path:
-                        # Copy the audio file to the destination
-                        shutil.copy2(file_path, dest_path)
-                        
-                        # Write the features and classification info to a JSON file
-                        with open(json_path, 'w') as json_file:
-                            json_data = {
-                                "file_name": os.path.basename(file_path),
-                                "category": classification["type"],
-                                "mood": classification["mood"],
-                                "features": features if features else {},
-                                "mood_details": mood_from_features if mood_from_features else {}
-                            }
-                            json.dump(json_data, json_file, indent=2)
-                        
-                        logger.info(f"Copied {os.path.basename(file_path)} to {classification['type']} and saved features")
-                    else:
-                        logger.info(f"Would copy {os.path.basename(file_path)} to {classification['type']}")
-                except Exception as copy_error:
-                    error_msg = f"Error copying {os.path.basename(file_path)}: {str(copy_error)}"
-                    logger.error(error_msg)
-                    sample["copy_error"] = str(copy_error)
-                
-                # Add destination path to sample metadata
-                sample["dest_path"] = dest_path
-            
-            # Add sample to results
-            results["samples"].append(sample)
-            
-            # Small delay to show progress in UI (for demo)
-            time.sleep(0.05)
-            
-        except Exception as e:
-            logger.error(f"Error processing file {file_path}: {e}")
+    for i, (file_path, sample) in enumerate(zip(input_files, map_process(input_files, deep_analysis, fast, gpu=gpu))):
+        # Update progress with file count information for the renderer
+        progress = (i + 1) / total_files * 100
+        logger.info(f"Progress: {progress:.1f}% - Files processed: {i+1} of {total_files} - Processed file: {os.path.basename(file_path)}")
+        
+        if sample is None:
+            continue
+        
+        # Organize the file if output directory is provided
+        if output_dir:
+            # Use the organized-samples folder structure
+            json_data = organize_sample(sample, output_dir)
+            if json_data is not None:
+                rel_path = os.path.relpath(sample["dest_path"], output_dir).replace(os.sep, '/')
+                manifest_entries[rel_path] = json_data
+        
+        # Add sample to results
+        results["samples"].append(sample)
+    
+    if manifest_entries:
+        update_feature_manifest(output_dir, manifest_entries)
     
     return results
 
@@ -456,6 +879,9 @@ def main():
     parser = argparse.ArgumentParser(description="Deep classify audio samples with feature extraction")
     parser.add_argument("config_file", help="JSON config file with input_files and output_dir")
     parser.add_argument("--quick", action="store_true", help="Skip deep audio analysis")
+    parser.add_argument("--fast", action="store_true",
+                        help="Skip deep analysis of files whose name clearly identifies the instrument")
+    parser.add_argument("--gpu", action="store_true", help="Batch deep analysis STFTs on a CUDA GPU if available")
     
     args = parser.parse_args()
     
@@ -465,7 +891,7 @@ def main():
     
     # Process files
     deep_analysis = not args.quick
-    results = process_files(config.get("files", []), config.get("outputDir"), deep_analysis)
+    results = process_files(config.get("files", []), config.get("outputDir"), deep_analysis, args.fast, args.gpu)
     
     # Print results as JSON
     print(json.dumps(results))
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Feature Cache
+-------------
+On-disk cache of extracted audio features, one compressed .npz file per entry.
+Shared by classify_audio.py and deep_classifier.py; each decides where its
+entries live and what keys them.
+"""
+
+import os
+import logging
+from typing import Dict, Any, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def load_cached_features(cache_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Load features saved by save_cached_features.
+    
+    A truncated or corrupt entry is removed and reported as a miss, so the
+    features are extracted (and cached) again.
+    
+    Args:
+        cache_path: Path to the .npz cache file
+    
+    Returns:
+        Features dictionary, or None if there is no (readable) cache entry
+    """
+    try:
+        with np.load(cache_path) as data:
+            # 0-d arrays come back as Python floats, ints and bools, 1-d arrays as lists
+            return {key: data[key].tolist() for key in data.files}
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        # e.g. zipfile.BadZipFile from a partially written file
+        logger.warning(f"Ignoring unreadable feature cache {cache_path}: {e}")
+        try:
+            os.remove(cache_path)
+        except OSError:
+            pass
+        return None
+
+def save_cached_features(cache_path: str, features: Dict[str, Any]) -> None:
+    """
+    Save a features dictionary as a compressed .npz file (written atomically).
+    
+    Args:
+        cache_path: Path to the .npz cache file (its directory is created if needed)
+        features: Features dictionary of scalars and lists
+    """
+    # Per-process temporary name: worker processes may be caching the same file
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **{key: np.asarray(value) for key, value in features.items()})
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        # e.g. ValueError from a value numpy can't store; the features are just not cached
+        logger.warning(f"Could not write feature cache {cache_path}: {e}")
+    finally:
+        # Gone already if the replace succeeded
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
@@ -12,7 +12,6 @@ import json
 import glob
 import numpy as np
 from pathlib import Path
-from scipy.spatial.distance import cosine
 
 
 def load_sample_features(sample_path):
@@ -42,6 +41,53 @@ def load_sample_features(sample_path):
         return None
 
 
+# Consolidated features file deep_classifier writes to the root of its output directory
+FEATURE_MANIFEST_NAME = 'features_manifest.json'
+
+
+def load_feature_manifest(samples_dir):
+    """
+    Load the consolidated feature manifest of a samples directory, if it has one.
+    
+    Args:
+        samples_dir: Directory containing processed samples
+        
+    Returns:
+        Dictionary of absolute sample path -> features, or None if there is no manifest
+    """
+    manifest_path = os.path.join(samples_dir, FEATURE_MANIFEST_NAME)
+    if not os.path.isfile(manifest_path):
+        return None
+    
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except Exception as e:
+        print(f"Error loading feature manifest {manifest_path}: {str(e)}", file=sys.stderr)
+        return None
+    
+    root = os.path.abspath(samples_dir)
+    return {os.path.join(root, *rel_path.split('/')): features for rel_path, features in manifest.items()}
+
+
+def lookup_sample_features(sample_path, manifest):
+    """
+    Features of a sample from the manifest, falling back to its own JSON file.
+    
+    Args:
+        sample_path: Path to the audio file
+        manifest: Result of load_feature_manifest (or None)
+        
+    Returns:
+        Dictionary of features or None if no features found
+    """
+    if manifest:
+        features = manifest.get(os.path.abspath(sample_path))
+        if features is not None:
+            return features
+    return load_sample_features(sample_path)
+
+
 def create_feature_vector(features):
     """
     Create a normalized feature vector from features dictionary.
@@ -98,8 +144,11 @@ def find_similar_samples(reference_path, samples_dir, max_results=5):
     Returns:
         List of dictionaries with similar samples info
     """
+    # One read for the whole directory when deep_classifier left a manifest
+    manifest = load_feature_manifest(samples_dir)
+    
     # Load reference sample features
-    reference_features = load_sample_features(reference_path)
+    reference_features = lookup_sample_features(reference_path, manifest)
     if not reference_features:
         print(f"No features found for reference sample: {reference_path}", file=sys.stderr)
         return []
@@ -113,38 +162,55 @@ def find_similar_samples(reference_path, samples_dir, max_results=5):
     for ext in audio_extensions:
         sample_files.extend(glob.glob(os.path.join(samples_dir, '**', f'*{ext}'), recursive=True))
     
-    # Calculate similarity scores for each sample
-    similarity_scores = []
+    # Load the features of every other sample
+    candidates = []
     for sample_path in sample_files:
         # Skip the reference sample itself
         if os.path.abspath(sample_path) == os.path.abspath(reference_path):
             continue
         
         # Load sample features
-        sample_features = load_sample_features(sample_path)
+        sample_features = lookup_sample_features(sample_path, manifest)
         if not sample_features:
             continue
         
-        # Create sample feature vector
-        sample_vector = create_feature_vector(sample_features)
-        
-        # Calculate cosine similarity (1 is most similar, 0 is least similar)
-        similarity = 1 - cosine(reference_vector, sample_vector)
-        
-        # Add to results if similarity is positive
-        if similarity > 0:
-            sample_name = os.path.basename(sample_path)
-            similarity_scores.append({
-                'path': sample_path,
-                'name': sample_name,
-                'similarity': float(similarity),
-                'category': sample_features.get('category', 'Unknown'),
-                'mood': sample_features.get('mood', 'Unknown')
-            })
-    
-    # Sort by similarity score (highest first) and limit to max_results
-    similarity_scores.sort(key=lambda x: x['similarity'], reverse=True)
-    return similarity_scores[:max_results]
+        candidates.append((sample_path, sample_features))
+    
+    if not candidates:
+        return []
+    
+    # Stack the (unit or zero) feature vectors into one matrix, zero-padded to a common length
+    vectors = [create_feature_vector(sample_features) for _, sample_features in candidates]
+    width = max(len(reference_vector), max(len(vector) for vector in vectors))
+    V = np.zeros((len(vectors), width))
+    for row, vector in zip(V, vectors):
+        row[:len(vector)] = vector
+    ref = np.zeros(width)
+    ref[:len(reference_vector)] = reference_vector
+    
+    # Cosine similarity of every sample at once (1 is most similar, 0 is least similar)
+    similarities = V @ ref
+    
+    # Keep positive similarities; select the top max_results before sorting them
+    # (ties keep directory order)
+    selected = np.flatnonzero(similarities > 0)
+    if 0 < max_results < len(selected):
+        kth = np.partition(similarities[selected], -max_results)[-max_results]
+        selected = selected[similarities[selected] >= kth]
+    selected = selected[np.lexsort((selected, -similarities[selected]))][:max_results]
+    
+    similarity_scores = []
+    for i in selected:
+        sample_path, sample_features = candidates[i]
+        similarity_scores.append({
+            'path': sample_path,
+            'name': os.path.basename(sample_path),
+            'similarity': float(similarities[i]),
+            'category': sample_features.get('category', 'Unknown'),
+            'mood': sample_features.get('mood', 'Unknown')
+        })
+    
+    return similarity_scores
 
 
 def main():
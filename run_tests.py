@@ -7,6 +7,8 @@ Usage:
     python run_tests.py basic             # Run basic functionality tests
     python run_tests.py web               # Run web app tests
     python run_tests.py similarity        # Run similarity search tests
+    python run_tests.py keyword           # Run keyword classification tests
+    python run_tests.py feature           # Run feature extraction tests
 """
 
 import os
@@ -40,10 +42,14 @@ def print_test_help():
     print("  python run_tests.py basic             # Run basic functionality tests")
     print("  python run_tests.py web               # Run web app tests")
     print("  python run_tests.py similarity        # Run similarity search tests")
+    print("  python run_tests.py keyword           # Run keyword classification tests")
+    print("  python run_tests.py feature           # Run feature extraction tests")
     print("\nAvailable test suites:")
     print("  basic      - Tests for basic classifier functionality")
     print("  web        - Tests for web application routes")
     print("  similarity - Tests for audio similarity search")
+    print("  keyword    - Tests for filename keyword classification")
+    print("  feature    - Tests for audio feature extraction")
 
 
 def create_test_sample():
@@ -0,0 +1,109 @@
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+import numpy as np
+
+# Import the feature extraction modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'electron-audio-manager', 'python')))
+import deep_classifier
+import feature_cache
+
+class TestFeatureExtraction(unittest.TestCase):
+    """
+    Tests for audio feature extraction helpers and the feature cache.
+    """
+    
+    @classmethod
+    def setUpClass(cls):
+        """Set up test resources that are used for all tests."""
+        # Create a temporary directory for cache entries
+        cls.temp_dir = tempfile.mkdtemp()
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Clean up resources after all tests have run."""
+        # Remove the temporary directory
+        if os.path.exists(cls.temp_dir):
+            shutil.rmtree(cls.temp_dir)
+    
+    def test_attack_frame_count(self):
+        """Test that the vectorized attack search matches a walk back from the peak."""
+        def reference_attack_frames(env_frames):
+            peak_idx = np.argmax(env_frames)
+            threshold = 0.8 * env_frames[peak_idx]
+            for i in range(min(peak_idx, len(env_frames))):
+                if env_frames[peak_idx - i] < threshold:
+                    return i
+            return 0
+        
+        # Edge cases: peak at the start or end, flat envelope, no drop before the peak
+        envelopes = [
+            np.array([1.0, 0.5, 0.2]),
+            np.array([0.1, 0.5, 1.0]),
+            np.ones(8),
+            np.array([0.9, 0.95, 1.0, 0.3]),
+            np.array([0.5]),
+        ]
+        rng = np.random.default_rng(0)
+        envelopes += [rng.random(rng.integers(1, 50)) for _ in range(200)]
+        
+        for env_frames in envelopes:
+            self.assertEqual(deep_classifier.attack_frame_count(env_frames), reference_attack_frames(env_frames))
+    
+    def test_feature_cache_hit_miss_and_corruption(self):
+        """Test that cached features round-trip and unreadable entries count as misses."""
+        cache_path = os.path.join(self.temp_dir, 'feature_cache', 'entry.npz')
+        features = {'avg_centroid': 1500.5, 'onset_rate': 2, 'has_transient': True, 'mfcc': [0.1, 0.2, 0.3]}
+        
+        # Miss: nothing cached yet
+        self.assertIsNone(feature_cache.load_cached_features(cache_path))
+        
+        # Hit: the same plain Python values come back
+        feature_cache.save_cached_features(cache_path, features)
+        self.assertEqual(feature_cache.load_cached_features(cache_path), features)
+        
+        # A truncated entry is a miss, and is removed so it gets rewritten
+        with open(cache_path, 'rb') as f:
+            data = f.read()
+        with open(cache_path, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        self.assertIsNone(feature_cache.load_cached_features(cache_path))
+        self.assertFalse(os.path.exists(cache_path))
+    
+    def test_feature_cache_unstorable_value(self):
+        """Test that features numpy can't store are skipped without leaving files behind."""
+        cache_dir = os.path.join(self.temp_dir, 'unstorable_cache')
+        cache_path = os.path.join(cache_dir, 'entry.npz')
+        
+        # A ragged list can't become an array
+        feature_cache.save_cached_features(cache_path, {'avg_centroid': 1500.5, 'mfcc': [[0.1], [0.2, 0.3]]})
+        self.assertIsNone(feature_cache.load_cached_features(cache_path))
+        self.assertEqual(os.listdir(cache_dir), [])
+    
+    def test_feature_manifest_update(self):
+        """Test that manifest updates keep existing entries and drop those of removed files."""
+        output_dir = os.path.join(self.temp_dir, 'organized')
+        for rel_path in ('drums/kick.wav', 'drums/snare.wav', 'bass/sub.wav'):
+            os.makedirs(os.path.join(output_dir, os.path.dirname(rel_path)), exist_ok=True)
+            with open(os.path.join(output_dir, rel_path), 'wb') as f:
+                f.write(b'RIFF\x00\x00\x00\x00WAVE')
+        
+        deep_classifier.update_feature_manifest(output_dir, {'drums/kick.wav': {'mood': 'punchy'},
+                                                             'drums/snare.wav': {'mood': 'tight'}})
+        
+        # A later run adds a file after the snare was removed
+        os.remove(os.path.join(output_dir, 'drums', 'snare.wav'))
+        deep_classifier.update_feature_manifest(output_dir, {'bass/sub.wav': {'mood': 'dark'}})
+        
+        with open(os.path.join(output_dir, deep_classifier.FEATURE_MANIFEST_NAME), 'r') as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest, {'drums/kick.wav': {'mood': 'punchy'}, 'bass/sub.wav': {'mood': 'dark'}})
+        
+        # No temporary files are left behind
+        self.assertEqual(sorted(os.listdir(output_dir)), ['bass', 'drums', deep_classifier.FEATURE_MANIFEST_NAME])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+import os
+import sys
+
+# Import the archived classifier, which imports its sibling modules by name
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'archive')))
+from classifier import (match_keyword_label, INSTRUMENT_PATTERN, INSTRUMENT_LOOKUP,
+                        MOOD_PATTERN, MOOD_LOOKUP)
+
+class TestKeywordClassification(unittest.TestCase):
+    """
+    Tests for classifying samples by keywords in their names.
+    """
+    
+    def test_instrument_keyword_priority(self):
+        """Test that the highest-priority instrument keyword wins, whole word or not."""
+        test_cases = [
+            ('vocals_bass', 'vocal'),
+            ('kick_hard_01', 'percussion'),
+            ('kickdrum', 'percussion'),
+            ('deep_bass_gtr', 'bass'),
+            ('field_recording', 'unknown'),
+        ]
+        
+        for name, expected in test_cases:
+            self.assertEqual(match_keyword_label(name, INSTRUMENT_PATTERN, INSTRUMENT_LOOKUP, 'unknown'), expected)
+    
+    def test_mood_keyword_priority(self):
+        """Test that exact mood names win over alternative terms, whole word or not."""
+        test_cases = [
+            ('darkness_heavy', 'dark'),
+            ('kick_hard_01', 'intense'),
+            ('dreamy_pad', 'dreamy'),
+            ('soft_keys', 'mellow'),
+            ('field_recording', 'neutral'),
+        ]
+        
+        for name, expected in test_cases:
+            self.assertEqual(match_keyword_label(name, MOOD_PATTERN, MOOD_LOOKUP, 'neutral'), expected)
+
+if __name__ == '__main__':
+    unittest.main()
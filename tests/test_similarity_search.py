@@ -2,6 +2,7 @@ import unittest
 import os
 import sys
 import json
+import glob
 import shutil
 import tempfile
 import numpy as np
@@ -12,7 +13,8 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 # Import our similarity search module
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'electron-audio-manager', 'python')))
-from find_similar_samples import load_sample_features, create_feature_vector, find_similar_samples
+from find_similar_samples import (load_sample_features, create_feature_vector, find_similar_samples,
+                                  load_feature_manifest, lookup_sample_features, FEATURE_MANIFEST_NAME)
 
 class TestSimilaritySearch(unittest.TestCase):
     """
@@ -141,5 +143,89 @@ class TestSimilaritySearch(unittest.TestCase):
         if kick_soft_idx != -1 and hihat_idx != -1:
             self.assertLess(kick_soft_idx, hihat_idx)
 
+    def test_feature_manifest_lookup(self):
+        """Test that manifest features are used, with the per-file JSON as a fallback."""
+        samples_dir = os.path.join(self.temp_dir, 'manifest_samples')
+        os.makedirs(os.path.join(samples_dir, 'drums'), exist_ok=True)
+        
+        # Only in the manifest, in both (the manifest wins), and only as a JSON file
+        kick_features = {'category': 'drums', 'mood': 'punchy', 'energy': 0.9, 'tempo': 120.0}
+        snare_features = {'category': 'drums', 'mood': 'tight', 'energy': 0.8, 'tempo': 120.0}
+        hat_features = {'category': 'drums', 'mood': 'bright', 'energy': 0.5, 'tempo': 125.0}
+        with open(os.path.join(samples_dir, FEATURE_MANIFEST_NAME), 'w') as f:
+            json.dump({'drums/kick.wav': kick_features, 'drums/snare.wav': snare_features}, f)
+        for filename, features in [('kick.wav', None), ('snare.wav', dict(snare_features, mood='stale')),
+                                   ('hat.wav', hat_features)]:
+            with open(os.path.join(samples_dir, 'drums', filename), 'wb') as f:
+                f.write(b'RIFF\x00\x00\x00\x00WAVE')
+            if features is not None:
+                with open(os.path.join(samples_dir, 'drums', filename.rsplit('.', 1)[0] + '.json'), 'w') as f:
+                    json.dump(features, f)
+        
+        # Manifest keys are absolute paths
+        manifest = load_feature_manifest(samples_dir)
+        kick_path = os.path.join(samples_dir, 'drums', 'kick.wav')
+        self.assertEqual(manifest[os.path.abspath(kick_path)], kick_features)
+        
+        self.assertEqual(lookup_sample_features(kick_path, manifest), kick_features)
+        self.assertEqual(lookup_sample_features(os.path.join(samples_dir, 'drums', 'snare.wav'), manifest),
+                         snare_features)
+        self.assertEqual(lookup_sample_features(os.path.join(samples_dir, 'drums', 'hat.wav'), manifest),
+                         hat_features)
+        
+        # Directories without a manifest use the JSON files alone
+        self.assertIsNone(load_feature_manifest(self.sample_dir))
+        self.assertEqual(lookup_sample_features(self.reference_sample, None)['mood'], 'punchy')
+        
+        # Both sources feed the search
+        similar_samples = find_similar_samples(kick_path, samples_dir)
+        self.assertEqual(sorted(sample['name'] for sample in similar_samples), ['hat.wav', 'snare.wav'])
+        self.assertIn('tight', [sample['mood'] for sample in similar_samples])
+    
+    def test_top_results_ordering_and_ties(self):
+        """Test that limited results are the top of the full ranking, with ties in directory order."""
+        samples_dir = os.path.join(self.temp_dir, 'tie_samples')
+        os.makedirs(samples_dir, exist_ok=True)
+        
+        reference_features = {'spectral_centroid': 0.3, 'energy': 0.9, 'tempo': 0.5}
+        tied_features = {'spectral_centroid': 0.8, 'energy': 0.5, 'tempo': 0.5}
+        sample_files = [
+            ('reference.wav', reference_features),
+            ('same.wav', reference_features),
+            ('tie_a.wav', tied_features),
+            ('tie_b.wav', tied_features),
+            ('tie_c.wav', tied_features),
+            ('far.wav', {'spectral_centroid': 0.9, 'energy': 0.05, 'tempo': 0.0}),
+            ('unrelated.wav', {'zero_crossing_rate': 0.7}),
+        ]
+        for filename, features in sample_files:
+            with open(os.path.join(samples_dir, filename), 'wb') as f:
+                f.write(b'RIFF\x00\x00\x00\x00WAVE')
+            with open(os.path.join(samples_dir, filename.rsplit('.', 1)[0] + '.json'), 'w') as f:
+                json.dump(features, f)
+        
+        reference_path = os.path.join(samples_dir, 'reference.wav')
+        full_ranking = find_similar_samples(reference_path, samples_dir, max_results=len(sample_files))
+        
+        # Orthogonal samples (zero similarity) are left out
+        names = [sample['name'] for sample in full_ranking]
+        self.assertNotIn('unrelated.wav', names)
+        self.assertEqual(names[0], 'same.wav')
+        self.assertEqual(names[-1], 'far.wav')
+        
+        # Tied samples keep the order they were found in
+        directory_order = [os.path.basename(path) for path in glob.glob(os.path.join(samples_dir, '**', '*.wav'),
+                                                                         recursive=True)]
+        ties = [name for name in names if name.startswith('tie_')]
+        self.assertEqual(ties, [name for name in directory_order if name.startswith('tie_')])
+        
+        similarities = [sample['similarity'] for sample in full_ranking]
+        self.assertEqual(similarities, sorted(similarities, reverse=True))
+        
+        # Every limit, including ones that cut through the ties, is a prefix of the full ranking
+        for max_results in range(1, len(full_ranking) + 1):
+            self.assertEqual(find_similar_samples(reference_path, samples_dir, max_results=max_results),
+                             full_ranking[:max_results])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file